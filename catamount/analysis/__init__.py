@@ -0,0 +1,16 @@
+from .checkpoint import StorageModel, calc_checkpoint_costs, \
+                         get_checkpoint_variables, shard_variables
+from .critical_path import WorkSpan, calc_work_span, COST_METRICS
+from .expected_cost import ExpectedCostAnalysis, SymbolHistogram
+from .fusion import FusionGroup, calc_fused_bytes, calc_fused_footprint, \
+                    collapse_fusion_groups, find_fusion_groups, fusion_report
+from .input_pipeline import InputPipelineModel, calc_input_bytes, \
+                             calc_input_pipeline, get_input_ops
+from .memory_plan import MemoryBuffer, MemoryPlan, MemoryPlanner, \
+                         MEMORY_PLAN_STRATEGIES
+from .precision import PrecisionPolicy, calc_precision_costs, \
+                       compare_precision_policies
+from .recompute import RecomputePlan, RecomputePlanner
+from .roles import calc_footprint_by_role, classify_tensor_roles, \
+                   TENSOR_ROLES
+from .schedule import get_op_schedule, is_backward_op
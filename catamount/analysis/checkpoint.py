@@ -0,0 +1,181 @@
+import heapq
+import sympy
+
+from catamount.api import utils
+from catamount.ops.variable import VariableOp
+from .roles import OPTIMIZER_STATE_ROLE, classify_tensor_roles
+
+
+# Name suffixes of TF optimizer slot variables (e.g., 'dense/kernel/Adam')
+SLOT_VARIABLE_SUFFIXES = ['Adam', 'Adam_1', 'Momentum', 'RMSProp',
+                          'RMSProp_1', 'Adagrad', 'Ftrl', 'Ftrl_1']
+
+
+class StorageModel:
+    ''' Checkpoint storage performance: Each shard is a file that one writer
+        (or reader) transfers concurrently with the other shards.
+
+        Args:
+          write_bandwidth: Aggregate storage write bandwidth (bytes/s)
+          read_bandwidth: Aggregate storage read bandwidth (bytes/s)
+          shard_bandwidth: Maximum bandwidth of one shard's writer or
+              reader (bytes/s), or None if only aggregate bandwidth limits
+          latency: Fixed time to open and commit each shard file (seconds)
+    '''
+    def __init__(self, write_bandwidth, read_bandwidth, shard_bandwidth=None,
+                 latency=0.0):
+        if write_bandwidth <= 0 or read_bandwidth <= 0:
+            raise ValueError('Storage bandwidths must be positive')
+        if shard_bandwidth is not None and shard_bandwidth <= 0:
+            raise ValueError('Shard bandwidth must be positive')
+        self._write_bandwidth = write_bandwidth
+        self._read_bandwidth = read_bandwidth
+        self._shard_bandwidth = shard_bandwidth
+        self._latency = latency
+
+    def __str__(self):
+        return 'StorageModel(write_bw: {}, read_bw: {}, shard_bw: {}, ' \
+               'latency: {})'.format(self._write_bandwidth,
+               self._read_bandwidth, self._shard_bandwidth, self._latency)
+
+    def _calcTransferTime(self, shard_bytes, bandwidth):
+        num_shards = max(len(shard_bytes), 1)
+        per_shard = bandwidth / num_shards
+        if self._shard_bandwidth is not None:
+            per_shard = min(per_shard, self._shard_bandwidth)
+        return max([self._latency + num_bytes / per_shard
+                    for num_bytes in shard_bytes], default=0.0)
+
+    def calcSaveTime(self, shard_bytes):
+        ''' Return the time to write shards of the given sizes (bytes). '''
+        return self._calcTransferTime(shard_bytes, self._write_bandwidth)
+
+    def calcRestoreTime(self, shard_bytes):
+        ''' Return the time to read shards of the given sizes (bytes). '''
+        return self._calcTransferTime(shard_bytes, self._read_bandwidth)
+
+
+def is_slot_variable(op, roles):
+    ''' Return whether the VariableOp holds optimizer state: It is an
+        optimizer op's state input (see classify_tensor_roles), or its name
+        ends with a TF slot variable suffix.
+    '''
+    if roles.get(op.outputs[0].name, None) == OPTIMIZER_STATE_ROLE:
+        return True
+    return op.name.split('/')[-1] in SLOT_VARIABLE_SUFFIXES
+
+def is_trainable_variable(op, roles):
+    ''' Return whether the op is a trainable VariableOp: It is not an
+        optimizer slot variable (see is_slot_variable), and it does not hold
+        integers (e.g., a global step counter).
+    '''
+    if not isinstance(op, VariableOp) or is_slot_variable(op, roles):
+        return False
+    return not _get_dtype_name(op.outputs[0]).startswith(
+        ('int', 'uint', 'bool'))
+
+def get_checkpoint_variables(graph, include_slots=True):
+    ''' Return the graph's VariableOps that a checkpoint saves, sorted by
+        name, optionally excluding optimizer slot variables.
+    '''
+    roles = classify_tensor_roles(graph)
+    variables = []
+    for op in graph.opsByName.values():
+        if not isinstance(op, VariableOp):
+            continue
+        if not include_slots and is_slot_variable(op, roles):
+            continue
+        variables.append(op)
+    return sorted(variables, key=lambda op: op.name)
+
+def shard_variables(variable_bytes, num_shards):
+    ''' Assign variables to shards, balancing shard sizes: Largest variables
+        first, each onto the currently smallest shard (ties to the lowest
+        shard index). Variables are not split across shards.
+
+        Args:
+          variable_bytes: A dictionary of variable name -> bytes
+          num_shards: The number of shards
+
+        Returns:
+          A list of num_shards lists of variable names
+    '''
+    if num_shards < 1:
+        raise ValueError('Checkpoints require at least one shard')
+    shards = [[] for _ in range(num_shards)]
+    shard_heap = [(0, idx) for idx in range(num_shards)]
+    for name in sorted(variable_bytes.keys(),
+                       key=lambda name: (-variable_bytes[name], name)):
+        shard_bytes, idx = heapq.heappop(shard_heap)
+        shards[idx].append(name)
+        heapq.heappush(shard_heap, (shard_bytes + variable_bytes[name], idx))
+    return shards
+
+def _get_dtype_name(tensor):
+    if tensor.dtype is None:
+        return 'unknown'
+    name = tensor.dtype.name
+    if name.endswith('_ref'):
+        name = name[:-len('_ref')]
+    return name
+
+def calc_checkpoint_costs(graph, num_shards=1, storage=None,
+                          include_slots=True, bindings=None):
+    ''' Estimate the size of a checkpoint of the graph's variables, its
+        layout across shards, and save and restore times.
+
+        Args:
+          graph: The Catamount graph
+          num_shards: The number of checkpoint shards (files)
+          storage: Optional StorageModel to estimate save and restore times
+          include_slots: Whether to save optimizer slot variables (e.g.,
+              momentum and Adam moments)
+          bindings: Optional dictionary of symbol (or symbol name) -> value
+              to evaluate sizes. Required for shard layouts and times if
+              variable sizes are symbolic
+
+        Returns:
+          A dictionary with keys 'num_parameters', 'total_bytes',
+          'slot_bytes', 'bytes_by_dtype' (dictionary of data type name ->
+          bytes), and 'variables' (dictionary of variable name -> bytes).
+          With numeric sizes, also 'shards' (list of dictionaries with keys
+          'variables' and 'bytes'), and with storage, 'save_time' and
+          'restore_time'
+    '''
+    roles = classify_tensor_roles(graph)
+    variables = get_checkpoint_variables(graph, include_slots)
+    names = [op.name for op in variables]
+    sizes = [op.outputs[0].size for op in variables]
+    num_params = [op.calcModelParameters() for op in variables]
+    if bindings is not None and len(variables) > 0:
+        values = utils.evaluateExpressions(sizes + num_params, bindings)
+        values = [float(value[0]) for value in values]
+        sizes = values[:len(variables)]
+        num_params = values[len(variables):]
+    costs = {'num_parameters': sum(num_params),
+             'total_bytes': sum(sizes),
+             'slot_bytes': sum(size for op, size in zip(variables, sizes)
+                               if is_slot_variable(op, roles)),
+             'bytes_by_dtype': {},
+             'variables': dict(zip(names, sizes))}
+    for op, size in zip(variables, sizes):
+        dtype_name = _get_dtype_name(op.outputs[0])
+        costs['bytes_by_dtype'][dtype_name] = \
+            costs['bytes_by_dtype'].get(dtype_name, 0) + size
+
+    if any(isinstance(size, sympy.Expr) and not size.is_number
+           for size in sizes):
+        if num_shards > 1 or storage is not None:
+            print('WARN: Specify bindings for checkpoint shard layout and '
+                  'times of symbolic variable sizes')
+        return costs
+    shards = shard_variables(costs['variables'], num_shards)
+    costs['shards'] = [{'variables': shard,
+                        'bytes': sum(costs['variables'][name]
+                                     for name in shard)}
+                       for shard in shards]
+    if storage is not None:
+        shard_bytes = [shard['bytes'] for shard in costs['shards']]
+        costs['save_time'] = storage.calcSaveTime(shard_bytes)
+        costs['restore_time'] = storage.calcRestoreTime(shard_bytes)
+    return costs
@@ -0,0 +1,135 @@
+from catamount.api import utils
+from catamount.graph.frozen import get_loop_iters
+from catamount.ops.subgraph_op import SubgraphOp
+
+
+# Named per-op cost metrics
+COST_METRICS = {
+    'flops': lambda op: op.calcAlgFlops(),
+    'bytes': lambda op: op.calcAlgBytes(),
+    'footprint': lambda op: op.calcAlgFootprint(),
+}
+
+
+class WorkSpan:
+    ''' The work-span (critical path) analysis of a graph.
+
+        Attributes:
+          work: The total cost of all ops
+          span: The cost of the longest dependency path (the critical path),
+              i.e., the cost with unlimited parallel streams
+          critical_path: Names of the (non-subgraph) ops on the critical
+              path, in order. Loop bodies contribute the ops on the critical
+              path of one iteration
+    '''
+    def __init__(self, work, span, critical_path):
+        self.work = work
+        self.span = span
+        self.critical_path = critical_path
+
+    def __str__(self):
+        return 'WorkSpan(work: {}, span: {}, parallelism: {}, ' \
+               'critical_path: {} ops)'.format(self.work, self.span,
+               self.parallelism, len(self.critical_path))
+
+    @property
+    def parallelism(self):
+        ''' Average parallelism (work / span): The most streams or cores
+            that the graph can keep busy on average
+        '''
+        if self.span == 0:
+            return 1.0
+        return self.work / self.span
+
+
+def _get_scope_op(scope, op):
+    ''' Return the op's ancestor (or the op itself) whose parent is scope,
+        or None if the op is outside of scope.
+    '''
+    while op is not None and op.parent is not scope:
+        op = op.parent
+    return op
+
+def _calc_scope_work_span(scope, values):
+    ''' Return (work, span, critical path) of one execution of the scope's
+        child ops.
+    '''
+    finish = {}
+    preds = {}
+    sub_paths = {}
+    work = 0.0
+    for op in scope.getTopologicalOpOrder(hierarchical=True):
+        start = 0.0
+        pred = None
+        for in_tensor in op.inputs:
+            producer = _get_scope_op(scope, in_tensor.producer)
+            if producer is None or producer.name not in finish:
+                continue
+            if pred is None or finish[producer.name] > start:
+                start = finish[producer.name]
+                pred = producer.name
+        if isinstance(op, SubgraphOp):
+            sub_work, sub_span, sub_path = _calc_scope_work_span(op, values)
+            # Loop iterations execute in sequence
+            work += values[op.name] * sub_work
+            duration = values[op.name] * sub_span
+            sub_paths[op.name] = sub_path
+        else:
+            duration = values[op.name]
+            work += duration
+        finish[op.name] = start + duration
+        preds[op.name] = pred
+    if len(finish) == 0:
+        return 0.0, 0.0, []
+    last = max(finish.keys(), key=lambda name: (finish[name], name))
+    span = finish[last]
+    path = []
+    while last is not None:
+        if last in sub_paths:
+            path.extend(reversed(sub_paths[last]))
+        else:
+            path.append(last)
+        last = preds[last]
+    return work, span, list(reversed(path))
+
+def calc_work_span(graph, cost='flops', bindings=None):
+    ''' Calculate the graph's total work, span (longest weighted dependency
+        path), average parallelism, and critical path for a per-op cost.
+        ControlBlockOp bodies count once per iteration ('::iters' symbols),
+        and iterations are sequential. A single pass over each subgraph's
+        topological order computes the op finish times.
+
+        Args:
+          graph: The Catamount graph
+          cost: A cost metric name ('flops', 'bytes', or 'footprint'), a
+              function op -> cost expression, or a dictionary of op name ->
+              cost for one execution (e.g., simulated op times; missing ops
+              cost 0)
+          bindings: A dictionary of symbol (or symbol name) -> value to
+              evaluate symbolic costs and loop iterations
+
+        Returns:
+          A WorkSpan
+    '''
+    if bindings is None:
+        bindings = {}
+    if isinstance(cost, str):
+        if cost not in COST_METRICS:
+            raise ValueError('Unknown cost metric: {} (available: {})'
+                             .format(cost, sorted(COST_METRICS)))
+        cost = COST_METRICS[cost]
+    names = []
+    exprs = []
+    for op in graph.opsByName.values():
+        names.append(op.name)
+        if isinstance(op, SubgraphOp):
+            exprs.append(get_loop_iters(op))
+        elif isinstance(cost, dict):
+            exprs.append(cost.get(op.name, 0))
+        else:
+            exprs.append(cost(op))
+    values = utils.evaluateExpressions(exprs, bindings)
+    # Loop iterations for subgraphs, and costs for other ops
+    values = {name: float(value[0]) for name, value in zip(names, values)}
+    work, span, path = _calc_scope_work_span(graph, values)
+    return WorkSpan(work, span, path)
@@ -0,0 +1,214 @@
+import numpy as np
+import sympy
+
+from catamount.api import utils
+from catamount.simulator.roofline import RooflineSimulator
+
+
+class SymbolHistogram:
+    ''' The distribution of a symbol's values (e.g., the sequence lengths or
+        subbatch sizes of production traffic).
+
+        Args:
+          symbol: The symbol (or symbol name), e.g., 'sequence_length' or a
+              loop's '<block>::iters' symbol
+          values: A list of the symbol's values
+          counts: A list of the number of occurrences (or probability) of
+              each value (default: uniform)
+    '''
+    def __init__(self, symbol, values, counts=None):
+        if isinstance(symbol, str):
+            symbol = utils.getIntSymbolFromString(symbol)
+        values = np.asarray(values, dtype=np.float64)
+        if counts is None:
+            counts = np.ones(len(values))
+        counts = np.asarray(counts, dtype=np.float64)
+        if len(values) == 0 or len(values) != len(counts):
+            raise ValueError('Histogram for {} needs one count per value'
+                             .format(symbol))
+        if np.any(counts < 0) or np.sum(counts) <= 0:
+            raise ValueError('Histogram for {} counts must be non-negative '
+                             'with a positive total'.format(symbol))
+        self._symbol = symbol
+        self._values = values
+        self._probabilities = counts / np.sum(counts)
+
+    def __str__(self):
+        return 'SymbolHistogram(symbol: {}, values: {})'.format(
+               self._symbol, len(self._values))
+
+    @staticmethod
+    def fromSamples(symbol, samples):
+        ''' Build a histogram from a list of observed values '''
+        values, counts = np.unique(np.asarray(samples), return_counts=True)
+        return SymbolHistogram(symbol, values, counts)
+
+    @property
+    def symbol(self):
+        return self._symbol
+
+    @property
+    def values(self):
+        return self._values
+
+    @property
+    def probabilities(self):
+        return self._probabilities
+
+    def mean(self):
+        return float(np.sum(self._values * self._probabilities))
+
+    def getPaddedValues(self, boundaries=None):
+        ''' Return each value padded up to its bucket boundary: The smallest
+            boundary at least as large as the value. Values larger than all
+            boundaries are not padded.
+        '''
+        if boundaries is None or len(boundaries) == 0:
+            return self._values.copy()
+        boundaries = np.sort(np.asarray(boundaries, dtype=np.float64))
+        idxs = np.searchsorted(boundaries, self._values, side='left')
+        padded = self._values.copy()
+        in_bucket = idxs < len(boundaries)
+        padded[in_bucket] = boundaries[idxs[in_bucket]]
+        return padded
+
+
+class ExpectedCostAnalysis:
+    ''' Expected costs of a graph over distributions of its symbols (e.g.,
+        sequence lengths and subbatch sizes) under a padding (bucketing)
+        policy: Each step pads its symbols up to bucket boundaries, so it
+        costs the graph's symbolic totals evaluated at the padded values,
+        while useful work is the cost at the actual values.
+
+        The graph's loops iterate per their '::iters' symbols, so either bind
+        the loops to sequence length symbols first (see
+        Graph.bindLoopIterations), or specify histograms for the '::iters'
+        symbols directly.
+
+        Args:
+          graph: The Catamount graph
+          hardware: Optional HardwareProfile to also evaluate the expected
+              step time with the RooflineSimulator
+    '''
+    METRICS = ['flops', 'bytes', 'footprint']
+
+    def __init__(self, graph, hardware=None):
+        self._compiled = utils.CompiledExpressions(
+            [graph.calcAlgFlops(), graph.calcAlgBytes(),
+             graph.calcAlgFootprint()])
+        self._roofline = None
+        if hardware is not None:
+            self._roofline = RooflineSimulator(graph, hardware).compile()
+
+    @property
+    def metrics(self):
+        if self._roofline is None:
+            return list(self.METRICS)
+        return self.METRICS + ['step_time']
+
+    @property
+    def symbols(self):
+        ''' The symbols that must be bound by histograms or bindings '''
+        symbols = set(self._compiled.symbols)
+        if self._roofline is not None:
+            symbols.update(self._roofline.symbols)
+        return sorted(symbols, key=lambda sym: sym.name)
+
+    def _evaluate(self, bindings):
+        values = self._compiled(bindings)
+        if self._roofline is not None:
+            values.append(self._roofline.calcStepTime(bindings))
+        return dict(zip(self.metrics, values))
+
+    def evaluate(self, histograms, boundaries=None, bindings=None):
+        ''' Evaluate the expected costs over the joint distribution of
+            independent symbol histograms. Costs of all combinations of
+            histogram values (buckets), padded and actual, evaluate in one
+            vectorized pass of the compiled expressions.
+
+            Args:
+              histograms: A list of SymbolHistograms
+              boundaries: A dictionary of symbol (or symbol name) -> list of
+                  bucket boundaries to pad values up to. Symbols without
+                  boundaries are not padded
+              bindings: A dictionary of symbol (or symbol name) -> value for
+                  the other symbols
+
+            Returns:
+              A dictionary with keys:
+                'expected': Metric -> expected cost per step (padded)
+                'useful': Metric -> expected cost at the actual values
+                'padding_waste': Metric -> fraction of the expected cost
+                    spent on padding (1 - useful / expected)
+                'buckets': List of (dictionary of symbol name -> padded
+                    value, probability) for the distinct padded buckets
+        '''
+        if boundaries is None:
+            boundaries = {}
+        boundaries = {key.name if isinstance(key, sympy.Symbol) else key:
+                      value for key, value in boundaries.items()}
+        for name in boundaries.keys():
+            if name not in [hist.symbol.name for hist in histograms]:
+                raise ValueError('Bucket boundaries for {} without a '
+                                 'histogram'.format(name))
+        # Cartesian product of the histogram values
+        grids = np.meshgrid(*[np.arange(len(hist.values))
+                              for hist in histograms], indexing='ij')
+        idxs = [grid.ravel() for grid in grids]
+        num_combos = len(idxs[0]) if len(idxs) > 0 else 1
+        probabilities = np.ones(num_combos)
+        actual = {}
+        padded = {}
+        for hist, hist_idxs in zip(histograms, idxs):
+            name = hist.symbol.name
+            probabilities *= hist.probabilities[hist_idxs]
+            actual[name] = hist.values[hist_idxs]
+            padded[name] = hist.getPaddedValues(
+                boundaries.get(name, None))[hist_idxs]
+        # Evaluate actual and padded costs together
+        all_bindings = {}
+        if bindings is not None:
+            for key, value in bindings.items():
+                name = key.name if isinstance(key, sympy.Symbol) else key
+                all_bindings[name] = np.full(2 * num_combos, value,
+                                             dtype=np.float64)
+        for name in actual.keys():
+            all_bindings[name] = np.concatenate([actual[name],
+                                                 padded[name]])
+        values = self._evaluate(all_bindings)
+
+        results = {'expected': {}, 'useful': {}, 'padding_waste': {}}
+        for metric, metric_values in values.items():
+            useful = float(np.sum(probabilities *
+                                  metric_values[:num_combos]))
+            expected = float(np.sum(probabilities *
+                                    metric_values[num_combos:]))
+            results['expected'][metric] = expected
+            results['useful'][metric] = useful
+            if expected == 0.0:
+                results['padding_waste'][metric] = 0.0
+            else:
+                results['padding_waste'][metric] = 1.0 - useful / expected
+        buckets = {}
+        for idx in range(num_combos):
+            key = tuple((name, float(padded[name][idx]))
+                        for name in sorted(padded.keys()))
+            buckets[key] = buckets.get(key, 0.0) + probabilities[idx]
+        results['buckets'] = [(dict(key), float(prob))
+                              for key, prob in sorted(buckets.items())]
+        return results
+
+    def compareBucketings(self, histograms, bucketings, bindings=None):
+        ''' Evaluate several bucketing policies.
+
+            Args:
+              histograms: A list of SymbolHistograms
+              bucketings: A dictionary of policy name -> boundaries (see
+                  evaluate)
+              bindings: A dictionary of symbol -> value for other symbols
+
+            Returns:
+              A dictionary of policy name -> evaluate results
+        '''
+        return {name: self.evaluate(histograms, boundaries, bindings)
+                for name, boundaries in bucketings.items()}
@@ -0,0 +1,290 @@
+from catamount.api import utils
+from catamount.graph.frozen import get_op_loop_multipliers
+from catamount.ops.fused_op import FusedOp
+from catamount.ops.math_ops import BasePointwiseOp, BatchMatMulOp, \
+                                   Conv2DOp, MatMulOp, ReduceOp, \
+                                   SigmoidGradOp, TanhGradOp
+from .schedule import get_op_schedule
+
+
+# Element-wise ops that fuse into producer-consumer chains
+POINTWISE_OP_TYPES = (BasePointwiseOp, SigmoidGradOp, TanhGradOp)
+# Ops whose pointwise consumers (e.g., bias-add and activation) fuse into
+# their epilogue
+ANCHOR_OP_TYPES = (MatMulOp, BatchMatMulOp, Conv2DOp)
+# Ops that fuse as the last op of a pointwise chain
+REDUCTION_OP_TYPES = (ReduceOp,)
+
+
+class FusionGroup:
+    ''' A group of producer-consumer ops that a runtime can execute as one
+        fused kernel: A pointwise chain, optionally led by a MatMulOp,
+        BatchMatMulOp, or Conv2DOp (anchor) and ended by a reduction.
+        Tensors produced and consumed only within the group (intermediate
+        tensors) are never written to or read from memory.
+
+        Args:
+          ops: The ops in the group, in schedule order
+    '''
+    def __init__(self, ops):
+        self._ops = list(ops)
+        self._op_names = set(op.name for op in self._ops)
+
+    def __str__(self):
+        return 'FusionGroup(name: {}, ops: {})'.format(self.name,
+                                                       self.opNames)
+
+    @property
+    def name(self):
+        return '{}/fused'.format(self._ops[0].name)
+
+    @property
+    def ops(self):
+        return self._ops
+
+    @property
+    def opNames(self):
+        return [op.name for op in self._ops]
+
+    def hasAnchor(self):
+        return any(isinstance(op, ANCHOR_OP_TYPES) for op in self._ops)
+
+    def getExternalInputs(self):
+        ''' Return the tensors that group ops read from outside the group
+        '''
+        inputs = []
+        seen = set()
+        for op in self._ops:
+            for in_tensor in op.inputs:
+                producer = in_tensor.producer
+                if in_tensor.name in seen or \
+                   (producer is not None and producer.name in self._op_names):
+                    continue
+                seen.add(in_tensor.name)
+                inputs.append(in_tensor)
+        return inputs
+
+    def getExternalOutputs(self):
+        ''' Return the tensors that group ops write for consumers outside
+            the group (or for no consumer, i.e., fetches)
+        '''
+        outputs = []
+        for op in self._ops:
+            for out_tensor in op.outputs:
+                consumers = out_tensor.consumers.keys()
+                if len(consumers) == 0 or \
+                   any(name not in self._op_names for name in consumers):
+                    outputs.append(out_tensor)
+        return outputs
+
+    def getIntermediateTensors(self):
+        external = set(tensor.name for tensor in self.getExternalOutputs())
+        return [out_tensor for op in self._ops for out_tensor in op.outputs
+                if out_tensor.name not in external]
+
+    def getLoopMultipliers(self):
+        ''' See get_op_loop_multipliers (group ops share a parent) '''
+        return get_op_loop_multipliers(self._ops[0])
+
+    def calcAlgFlops(self):
+        return sum(op.calcAlgFlops() for op in self._ops)
+
+    def calcUnfusedBytes(self):
+        return sum(op.calcAlgBytes() for op in self._ops)
+
+    def calcFusedBytes(self):
+        return sum(tensor.size for tensor in self.getExternalInputs()) + \
+               sum(tensor.size for tensor in self.getExternalOutputs())
+
+    def calcBytesSavings(self):
+        return self.calcUnfusedBytes() - self.calcFusedBytes()
+
+    def calcUnfusedFootprint(self):
+        return sum(op.calcAlgFootprint() for op in self._ops)
+
+    def calcFusedFootprint(self):
+        return self.calcUnfusedFootprint() - \
+               sum(tensor.size for tensor in self.getIntermediateTensors())
+
+
+def _depends_on(op, member_names, op_index, min_index):
+    ''' Return whether op transitively depends on any member op. Ops
+        scheduled before min_index (the first member) cannot.
+    '''
+    frontier = [op]
+    visited = set()
+    while len(frontier) > 0:
+        curr_op = frontier.pop()
+        if curr_op.name in member_names:
+            return True
+        if curr_op.name in visited or \
+           op_index.get(curr_op.name, -1) < min_index:
+            continue
+        visited.add(curr_op.name)
+        for in_tensor in curr_op.inputs:
+            if in_tensor.producer is not None:
+                frontier.append(in_tensor.producer)
+    return False
+
+def find_fusion_groups(graph):
+    ''' Find fusible producer-consumer groups in the graph: Each pointwise
+        op or reduction joins the groups of its pointwise or anchor
+        producers (with the same parent), if merging them keeps the graph
+        acyclic and the merged group has at most one anchor. Groups stop
+        growing after a reduction.
+
+        Returns:
+          A list of FusionGroups with at least two ops, in schedule order
+    '''
+    schedule = get_op_schedule(graph)
+    op_index = {op.name: idx for idx, op in enumerate(schedule)}
+    group_of = {}
+    members = {}
+    # Groups that end with a reduction, which no more consumers can join
+    closed = set()
+    next_group_id = 0
+    for op in schedule:
+        is_pointwise = isinstance(op, POINTWISE_OP_TYPES)
+        is_reduction = isinstance(op, REDUCTION_OP_TYPES)
+        if isinstance(op, ANCHOR_OP_TYPES) or is_pointwise:
+            group_of[op.name] = next_group_id
+            members[next_group_id] = [op]
+            next_group_id += 1
+        if not (is_pointwise or is_reduction):
+            continue
+        # Candidate producer groups to merge with this op
+        candidates = []
+        for in_tensor in op.inputs:
+            producer = in_tensor.producer
+            if producer is None:
+                continue
+            group_id = group_of.get(producer.name, None)
+            if group_id is None or group_id in candidates or \
+               group_id in closed or \
+               group_id == group_of.get(op.name, None) or \
+               producer.parent is not op.parent:
+                continue
+            candidates.append(group_id)
+        # Merge producer groups in order, skipping any that would add a
+        # second anchor or a cycle through ops outside the group
+        merged = [] if is_reduction else [group_of[op.name]]
+        for group_id in candidates:
+            trial_ops = [member for gid in merged + [group_id]
+                         for member in members[gid]]
+            if is_reduction:
+                trial_ops.append(op)
+            trial = FusionGroup(trial_ops)
+            if sum(isinstance(member, ANCHOR_OP_TYPES)
+                   for member in trial_ops) > 1:
+                continue
+            member_names = set(member.name for member in trial_ops)
+            min_index = min(op_index[member.name] for member in trial_ops)
+            if any(tensor.producer is not None and
+                   _depends_on(tensor.producer, member_names, op_index,
+                               min_index)
+                   for tensor in trial.getExternalInputs()):
+                continue
+            merged.append(group_id)
+        if is_reduction:
+            if len(merged) == 0:
+                continue
+            merged_id = merged[0]
+            group_of[op.name] = merged_id
+            members[merged_id] = members[merged_id] + [op]
+            closed.add(merged_id)
+        else:
+            merged_id = group_of[op.name]
+        for group_id in merged:
+            if group_id == merged_id:
+                continue
+            for member in members.pop(group_id):
+                group_of[member.name] = merged_id
+                members[merged_id].append(member)
+    groups = []
+    for group_ops in members.values():
+        if len(group_ops) < 2:
+            continue
+        group_ops = sorted(group_ops, key=lambda op: op_index[op.name])
+        groups.append(FusionGroup(group_ops))
+    return sorted(groups, key=lambda group: op_index[group.ops[0].name])
+
+def calc_fused_bytes(graph, groups=None):
+    ''' Return the graph's algorithmic bytes accessed if each fusion group
+        executes as a fused kernel.
+    '''
+    if groups is None:
+        groups = find_fusion_groups(graph)
+    savings = 0
+    for group in groups:
+        _, bytes_mult = group.getLoopMultipliers()
+        savings += bytes_mult * group.calcBytesSavings()
+    return graph.calcAlgBytes() - savings
+
+def calc_fused_footprint(graph, groups=None):
+    ''' Return the graph's algorithmic footprint if each fusion group
+        executes as a fused kernel.
+    '''
+    if groups is None:
+        groups = find_fusion_groups(graph)
+    savings = 0
+    for group in groups:
+        _, bytes_mult = group.getLoopMultipliers()
+        savings += bytes_mult * (group.calcUnfusedFootprint() -
+                                 group.calcFusedFootprint())
+    return graph.calcAlgFootprint() - savings
+
+def fusion_report(groups, bindings=None):
+    ''' Report the bytes savings of each fusion group (per execution).
+
+        Args:
+          groups: A list of FusionGroups
+          bindings: Optional dictionary of symbol (or symbol name) -> value
+              to evaluate the bytes
+
+        Returns:
+          A list of dictionaries with keys 'name', 'ops', 'unfused_bytes',
+          'fused_bytes', and 'savings'
+    '''
+    report = []
+    for group in groups:
+        report.append({'name': group.name,
+                       'ops': group.opNames,
+                       'unfused_bytes': group.calcUnfusedBytes(),
+                       'fused_bytes': group.calcFusedBytes(),
+                       'savings': group.calcBytesSavings()})
+    if bindings is not None:
+        keys = ['unfused_bytes', 'fused_bytes', 'savings']
+        values = utils.evaluateExpressions(
+            [entry[key] for entry in report for key in keys], bindings)
+        for idx, entry in enumerate(report):
+            for key_idx, key in enumerate(keys):
+                entry[key] = float(values[len(keys) * idx + key_idx][0])
+    return report
+
+def collapse_fusion_groups(graph, groups):
+    ''' Replace each fusion group in the graph with a FusedOp that reads
+        the group's external inputs and writes its external outputs. Groups
+        inside control blocks (e.g., loop bodies) are not collapsed.
+
+        Returns:
+          A list of the FusedOps added to the graph
+    '''
+    fused_ops = []
+    for group in groups:
+        if group.ops[0].parent is not graph:
+            print('WARN: Not collapsing fusion group {} inside {}'
+                  .format(group.name, group.ops[0].parent.name))
+            continue
+        fused_op = FusedOp(group.name, group.opNames, group.calcAlgFlops())
+        in_tensors = group.getExternalInputs()
+        out_tensors = group.getExternalOutputs()
+        for op in group.ops:
+            graph.removeOp(op)
+        for out_tensor in out_tensors:
+            out_tensor.resetProducer()
+            fused_op.addOutput(out_tensor)
+        graph.addOp(fused_op)
+        for in_tensor in in_tensors:
+            graph.addInputToOp(fused_op, in_tensor)
+        fused_ops.append(fused_op)
+    return fused_ops
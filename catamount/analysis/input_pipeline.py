@@ -0,0 +1,169 @@
+import sympy
+
+from catamount.api import utils
+from catamount.ops.placeholder import PlaceholderOp
+from catamount.ops.unknown_op import UnknownOp
+from catamount.simulator.roofline import RooflineSimulator
+
+
+# TF op types (see UnknownOp.opType) of ops that produce input data, e.g.,
+# from tf.data iterators
+INPUT_OP_TYPES = ['IteratorGetNext', 'IteratorGetNextSync',
+                  'MultiDeviceIteratorGetNextFromShard']
+INPUT_STAGES = ['storage', 'decode', 'transfer']
+
+
+def is_input_op(op):
+    ''' Return whether the op produces input data: PlaceholderOps and
+        iterator ops (e.g., TF IteratorGetNext, imported as UnknownOps).
+    '''
+    if isinstance(op, PlaceholderOp):
+        return True
+    if isinstance(op, UnknownOp):
+        return op.opType in INPUT_OP_TYPES
+    return False
+
+def get_input_ops(graph):
+    ''' Return the graph's input ops (see is_input_op), sorted by name. '''
+    return sorted([op for op in graph.opsByName.values() if is_input_op(op)],
+                  key=lambda op: op.name)
+
+def calc_input_bytes(graph):
+    ''' Return the bytes of input data per step: The sizes of the output
+        tensors of the graph's input ops.
+    '''
+    return sum(op.bytesAccessOutput() for op in get_input_ops(graph))
+
+
+class InputPipelineModel:
+    ''' A host input pipeline that reads samples from storage, decodes them
+        (e.g., JPEG or audio decoding, tokenization), and copies them to the
+        device. Stages are pipelined (prefetched), so the slowest stage
+        limits the input throughput.
+
+        Args:
+          storage_bandwidth: Storage read bandwidth (bytes/s)
+          host_device_bandwidth: Host-to-device link bandwidth (bytes/s)
+          decode_bandwidth: Decoded bytes per second per decode worker, or
+              None if inputs need no decoding
+          num_decode_workers: The number of parallel decode workers
+          storage_bytes_ratio: Stored bytes per input byte (e.g., less than
+              1 for compressed samples)
+    '''
+    def __init__(self, storage_bandwidth, host_device_bandwidth,
+                 decode_bandwidth=None, num_decode_workers=1,
+                 storage_bytes_ratio=1.0):
+        if storage_bandwidth <= 0 or host_device_bandwidth <= 0:
+            raise ValueError('Input pipeline bandwidths must be positive')
+        if decode_bandwidth is not None and decode_bandwidth <= 0:
+            raise ValueError('Decode bandwidth must be positive')
+        if num_decode_workers < 1:
+            raise ValueError('Input pipeline requires a decode worker')
+        self._storage_bandwidth = storage_bandwidth
+        self._host_device_bandwidth = host_device_bandwidth
+        self._decode_bandwidth = decode_bandwidth
+        self._num_decode_workers = num_decode_workers
+        self._storage_bytes_ratio = storage_bytes_ratio
+
+    def __str__(self):
+        return 'InputPipelineModel(storage_bw: {}, host_device_bw: {}, ' \
+               'decode_bw: {}, decode_workers: {})'.format(
+               self._storage_bandwidth, self._host_device_bandwidth,
+               self._decode_bandwidth, self._num_decode_workers)
+
+    def calcStageTimes(self, input_bytes):
+        ''' Return a dictionary of stage name (see INPUT_STAGES) -> time to
+            process input_bytes of (decoded) input data.
+        '''
+        decode_time = 0
+        if self._decode_bandwidth is not None:
+            decode_time = input_bytes / (self._decode_bandwidth *
+                                         self._num_decode_workers)
+        return {'storage': input_bytes * self._storage_bytes_ratio /
+                           self._storage_bandwidth,
+                'decode': decode_time,
+                'transfer': input_bytes / self._host_device_bandwidth}
+
+    def calcMaxSamplesPerSecond(self, bytes_per_sample):
+        ''' Return the maximum sustainable samples per second '''
+        stage_times = self.calcStageTimes(bytes_per_sample)
+        return 1.0 / max(stage_times.values())
+
+
+def calc_input_pipeline(graph, pipeline, batch_symbol=None, bindings=None,
+                        hardware=None):
+    ''' Model the graph's input pipeline: The per-step input bytes of its
+        input ops (see calc_input_bytes) through the InputPipelineModel
+        stages, compared to the roofline compute time of a step. With
+        prefetching, the input pipeline overlaps compute, so the step is
+        input-bound if the input time exceeds the compute time.
+
+        Args:
+          graph: The Catamount graph of one step
+          pipeline: An InputPipelineModel
+          batch_symbol: The graph's batch size symbol (or name) to report
+              per-sample bytes and samples/second (default: one sample per
+              step)
+          bindings: Optional dictionary of symbol (or symbol name) -> value
+              to evaluate the results
+          hardware: Optional HardwareProfile to compare to the roofline
+              compute time
+
+        Returns:
+          A dictionary with keys 'input_bytes' (per step), 'bytes_per_sample',
+          'stage_times' (dictionary of stage -> time per step), 'input_time'
+          (the slowest stage time per step), and 'max_samples_per_second'.
+          With bindings, also 'bottleneck' (the slowest stage). With hardware,
+          also 'compute_time', 'step_time' (maximum of the input and compute
+          times), and with bindings, 'input_bound'
+    '''
+    input_bytes = calc_input_bytes(graph)
+    samples = 1
+    if batch_symbol is not None:
+        if isinstance(batch_symbol, str):
+            batch_symbol = utils.getIntSymbolFromString(batch_symbol)
+        samples = batch_symbol
+    stage_times = pipeline.calcStageTimes(input_bytes)
+    results = {'input_bytes': input_bytes,
+               'bytes_per_sample': input_bytes / samples,
+               'stage_times': stage_times}
+    compiled = None
+    if hardware is not None:
+        simulator = RooflineSimulator(graph, hardware)
+        if bindings is None:
+            results['compute_time'] = simulator.calcStepTime()
+        else:
+            compiled = simulator.compile()
+    if bindings is not None:
+        keys = ['input_bytes', 'bytes_per_sample']
+        exprs = [results[key] for key in keys] + \
+                [stage_times[stage] for stage in INPUT_STAGES] + [samples]
+        values = [float(value[0]) for value in
+                  utils.evaluateExpressions(exprs, bindings)]
+        results.update(zip(keys, values[:len(keys)]))
+        stage_times = dict(zip(INPUT_STAGES,
+                               values[len(keys):len(keys) + 3]))
+        results['stage_times'] = stage_times
+        samples = values[-1]
+        results['input_time'] = max(stage_times.values())
+        results['bottleneck'] = max(INPUT_STAGES,
+                                    key=lambda stage: stage_times[stage])
+        if compiled is not None:
+            results['compute_time'] = \
+                float(compiled.calcStepTime(bindings)[0])
+            results['input_bound'] = \
+                results['input_time'] > results['compute_time']
+    else:
+        results['input_time'] = sympy.Max(*stage_times.values())
+    if results['input_time'] == 0:
+        results['max_samples_per_second'] = float('inf')
+    else:
+        results['max_samples_per_second'] = samples / results['input_time']
+    if 'compute_time' in results:
+        if bindings is not None:
+            results['step_time'] = max(results['input_time'],
+                                       results['compute_time'])
+        else:
+            results['step_time'] = sympy.Max(results['input_time'],
+                                              results['compute_time'])
+    return results
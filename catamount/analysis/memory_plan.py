@@ -0,0 +1,315 @@
+import bisect
+
+from catamount.api import utils
+from catamount.ops.math_ops import BasePointwiseOp
+from .schedule import NON_EXECUTING_OPS, get_op_schedule
+
+
+NAIVE_STRATEGY = 'naive'
+GREEDY_BY_SIZE_STRATEGY = 'greedy_by_size'
+BEST_FIT_STRATEGY = 'best_fit'
+MEMORY_PLAN_STRATEGIES = [NAIVE_STRATEGY, GREEDY_BY_SIZE_STRATEGY,
+                          BEST_FIT_STRATEGY]
+
+
+class MemoryBuffer:
+    ''' A buffer in the memory arena, shared by one or more tensors whose
+        lifetimes chain through in-place ops.
+
+        Attributes:
+          name: The name of the first tensor in the buffer
+          tensor_names: Names of the tensors that share the buffer
+          size: Aligned buffer size (bytes)
+          start: Schedule index at which the buffer is allocated
+          end: Schedule index of the buffer's last use
+          persistent: Whether the buffer lives for the whole schedule
+              (e.g., variables, placeholders, and constants)
+          offset: Offset of the buffer in the arena (set by planning)
+    '''
+    def __init__(self, name, size, start, end, persistent=False):
+        self.name = name
+        self.tensor_names = [name]
+        self.size = size
+        self.start = start
+        self.end = end
+        self.persistent = persistent
+        self.offset = None
+
+    def overlapsLifetime(self, other):
+        return self.start <= other.end and other.start <= self.end
+
+
+class MemoryPlan:
+    ''' The result of planning tensor offsets in a memory arena.
+
+        Attributes:
+          strategy: The name of the planning strategy
+          buffers: List of MemoryBuffers with assigned offsets
+          arena_size: Bytes of the arena (highest buffer end offset)
+          peak_live_bytes: Most (aligned) bytes live at one schedule index,
+              a lower bound on the arena size
+          tensor_bytes: Total (unaligned) bytes of all planned tensors
+    '''
+    def __init__(self, strategy, buffers, arena_size, peak_live_bytes,
+                 tensor_bytes):
+        self.strategy = strategy
+        self.buffers = buffers
+        self.arena_size = arena_size
+        self.peak_live_bytes = peak_live_bytes
+        self.tensor_bytes = tensor_bytes
+        self._tensor_offsets = {}
+        for buffer in buffers:
+            for tensor_name in buffer.tensor_names:
+                self._tensor_offsets[tensor_name] = buffer.offset
+
+    def __str__(self):
+        return 'MemoryPlan(strategy: {}, arena_size: {}, peak_live_bytes: ' \
+               '{}, fragmentation: {:.3f}, buffers: {})'.format(
+               self.strategy, self.arena_size, self.peak_live_bytes,
+               self.fragmentation, len(self.buffers))
+
+    @property
+    def tensorOffsets(self):
+        ''' A dictionary of tensor name -> arena offset '''
+        return self._tensor_offsets
+
+    @property
+    def fragmentation(self):
+        ''' Fraction of the arena that is unused at peak live memory '''
+        if self.arena_size == 0:
+            return 0.0
+        return 1.0 - self.peak_live_bytes / self.arena_size
+
+    @property
+    def inPlaceTensors(self):
+        ''' Names of tensors that reuse their input's buffer in place '''
+        in_place = []
+        for buffer in self.buffers:
+            in_place.extend(buffer.tensor_names[1:])
+        return in_place
+
+
+class MemoryPlanner:
+    ''' Plans a static memory arena for executing a graph's ops in a given
+        schedule: Each tensor is live from its producer's execution through
+        its last consumer's execution, and tensors without consumers in the
+        schedule (fetches) live until the end. Pointwise ops (e.g., ReluOp,
+        AddOp) may write their output in place into an input buffer of the
+        same size if that input dies at the op.
+
+        Tensors in loops are planned for a single iteration.
+
+        Args:
+          graph: The Catamount graph
+          schedule: Op names in execution order (default: a deterministic
+              topological order; see get_op_schedule)
+          alignment: Buffer size and offset alignment (bytes)
+          in_place: Whether to allow in-place pointwise ops
+          include_persistent: Whether to plan the outputs of variables,
+              placeholders, and constants (live for the whole schedule)
+    '''
+    def __init__(self, graph, schedule=None, alignment=64, in_place=True,
+                 include_persistent=True):
+        if schedule is None:
+            schedule = [op.name for op in get_op_schedule(graph)]
+        self._graph = graph
+        self._schedule = list(schedule)
+        self._alignment = alignment
+        self._in_place = in_place
+        self._include_persistent = include_persistent
+
+    @property
+    def schedule(self):
+        return self._schedule
+
+    def _alignSize(self, size):
+        align = self._alignment
+        return int((size + align - 1) // align * align)
+
+    def getBuffers(self, bindings):
+        ''' Evaluate tensor sizes and lifetimes, and group tensors that are
+            computed in place into buffers.
+
+            Returns:
+              A tuple of (list of MemoryBuffers, total tensor bytes)
+        '''
+        ops = [self._graph.opsByName[op_name] for op_name in self._schedule]
+        op_index = {op.name: idx for idx, op in enumerate(ops)}
+        end_index = len(ops) - 1
+        tensors = []
+        for op in ops:
+            if isinstance(op, NON_EXECUTING_OPS) and \
+               not self._include_persistent:
+                continue
+            tensors.extend(op.outputs)
+        sizes = utils.evaluateExpressions(
+            [tensor.size for tensor in tensors], bindings)
+        sizes = {tensor.name: float(size[0])
+                 for tensor, size in zip(tensors, sizes)}
+        tensor_bytes = sum(sizes.values())
+
+        buffers = []
+        tensor_buffers = {}
+        for idx, op in enumerate(ops):
+            persistent = isinstance(op, NON_EXECUTING_OPS)
+            if persistent and not self._include_persistent:
+                continue
+            reused = set()
+            for out_tensor in op.outputs:
+                consumer_idxs = [op_index[consumer.name] for consumer in
+                                 out_tensor.consumers.values()
+                                 if consumer.name in op_index]
+                last_use = max(consumer_idxs) if consumer_idxs else end_index
+                if persistent:
+                    start, last_use = 0, end_index
+                else:
+                    start = idx
+                size = sizes[out_tensor.name]
+                buffer = None
+                if self._in_place and isinstance(op, BasePointwiseOp):
+                    buffer = self._findInPlaceBuffer(op, idx, size, sizes,
+                                                     tensor_buffers, reused)
+                if buffer is not None:
+                    reused.add(buffer.name)
+                    buffer.tensor_names.append(out_tensor.name)
+                    buffer.end = max(buffer.end, last_use)
+                else:
+                    buffer = MemoryBuffer(out_tensor.name,
+                                          self._alignSize(size), start,
+                                          last_use, persistent)
+                    buffers.append(buffer)
+                tensor_buffers[out_tensor.name] = buffer
+        return buffers, tensor_bytes
+
+    def _findInPlaceBuffer(self, op, idx, size, sizes, tensor_buffers,
+                           reused):
+        for in_tensor in op.inputs:
+            buffer = tensor_buffers.get(in_tensor.name, None)
+            if buffer is None or buffer.persistent or \
+               buffer.name in reused:
+                continue
+            # The input must die at this op and be the same size
+            if buffer.end == idx and sizes[in_tensor.name] == size and \
+               buffer.tensor_names[-1] == in_tensor.name:
+                return buffer
+        return None
+
+    def plan(self, bindings, strategy=GREEDY_BY_SIZE_STRATEGY):
+        ''' Assign arena offsets to the graph's tensors.
+
+            Args:
+              bindings: A dictionary of symbol (or symbol name) -> value
+              strategy: 'naive' (no reuse), 'greedy_by_size' (place the
+                  largest buffers first, each in the smallest gap among
+                  buffers with overlapping lifetimes), or 'best_fit'
+                  (allocate in schedule order from the smallest free block
+                  that fits, as a runtime allocator would)
+
+            Returns:
+              A MemoryPlan
+        '''
+        if strategy not in MEMORY_PLAN_STRATEGIES:
+            raise ValueError('Unknown memory plan strategy: {} (available: '
+                             '{})'.format(strategy, MEMORY_PLAN_STRATEGIES))
+        buffers, tensor_bytes = self.getBuffers(bindings)
+        if strategy == NAIVE_STRATEGY:
+            offset = 0
+            for buffer in buffers:
+                buffer.offset = offset
+                offset += buffer.size
+        elif strategy == GREEDY_BY_SIZE_STRATEGY:
+            self._planGreedyBySize(buffers)
+        else:
+            self._planBestFit(buffers)
+        arena_size = max([buffer.offset + buffer.size for buffer in buffers],
+                         default=0)
+        return MemoryPlan(strategy, buffers, arena_size,
+                          self._calcPeakLiveBytes(buffers), tensor_bytes)
+
+    def _calcPeakLiveBytes(self, buffers):
+        deltas = {}
+        for buffer in buffers:
+            deltas[buffer.start] = deltas.get(buffer.start, 0) + buffer.size
+            deltas[buffer.end + 1] = deltas.get(buffer.end + 1, 0) - \
+                                     buffer.size
+        peak = 0
+        live = 0
+        for index in sorted(deltas.keys()):
+            live += deltas[index]
+            peak = max(peak, live)
+        return peak
+
+    def _planGreedyBySize(self, buffers):
+        placed = []
+        for buffer in sorted(buffers, key=lambda buf: (-buf.size, buf.start,
+                                                       buf.name)):
+            overlapping = sorted((other.offset, other.offset + other.size)
+                                 for other in placed
+                                 if buffer.overlapsLifetime(other))
+            best_offset = None
+            best_gap = None
+            prev_end = 0
+            for offset, end in overlapping:
+                gap = offset - prev_end
+                if gap >= buffer.size and (best_gap is None or gap < best_gap):
+                    best_offset = prev_end
+                    best_gap = gap
+                prev_end = max(prev_end, end)
+            if best_offset is None:
+                best_offset = prev_end
+            buffer.offset = best_offset
+            placed.append(buffer)
+
+    def _planBestFit(self, buffers):
+        # Free blocks as sorted (offset, size) lists, and the arena top
+        free_offsets = []
+        free_sizes = []
+        top = 0
+
+        def release(offset, size):
+            idx = bisect.bisect_left(free_offsets, offset)
+            free_offsets.insert(idx, offset)
+            free_sizes.insert(idx, size)
+            # Coalesce with the following and preceding free blocks
+            if idx + 1 < len(free_offsets) and \
+               free_offsets[idx] + free_sizes[idx] == free_offsets[idx + 1]:
+                free_sizes[idx] += free_sizes.pop(idx + 1)
+                free_offsets.pop(idx + 1)
+            if idx > 0 and \
+               free_offsets[idx - 1] + free_sizes[idx - 1] == free_offsets[idx]:
+                free_sizes[idx - 1] += free_sizes.pop(idx)
+                free_offsets.pop(idx)
+
+        by_start = sorted(buffers, key=lambda buf: (buf.start, buf.name))
+        live = []
+        for buffer in by_start:
+            # Free buffers whose last use precedes this allocation
+            still_live = []
+            for other in live:
+                if other.end < buffer.start:
+                    release(other.offset, other.size)
+                else:
+                    still_live.append(other)
+            live = still_live
+            best_idx = None
+            for idx, free_size in enumerate(free_sizes):
+                if free_size >= buffer.size and \
+                   (best_idx is None or free_size < free_sizes[best_idx]):
+                    best_idx = idx
+            if best_idx is not None:
+                buffer.offset = free_offsets[best_idx]
+                free_offsets[best_idx] += buffer.size
+                free_sizes[best_idx] -= buffer.size
+                if free_sizes[best_idx] == 0:
+                    free_offsets.pop(best_idx)
+                    free_sizes.pop(best_idx)
+            elif len(free_offsets) > 0 and \
+                 free_offsets[-1] + free_sizes[-1] == top:
+                # Grow the arena from the free block at its top
+                buffer.offset = free_offsets.pop()
+                free_sizes.pop()
+                top = buffer.offset + buffer.size
+            else:
+                buffer.offset = top
+                top += buffer.size
+            live.append(buffer)
@@ -0,0 +1,217 @@
+from catamount.api import utils
+from catamount.ops.variable import VariableOp
+from catamount.simulator.roofline import RooflineSimulator
+from catamount.tensors.tensor import DataType
+from .roles import WEIGHTS_ROLE, classify_tensor_roles
+
+
+class PrecisionPolicy:
+    ''' A mixed-precision or quantization recipe: The data types of a
+        graph's floating-point tensors, which determine their element sizes
+        (bytes and footprint) and the Flop rates the simulator uses for the
+        ops that produce them. Tensors with integer, boolean, or string
+        types (e.g., shapes and indices) keep their types.
+
+        A tensor's type comes from the first matching rule: tensor name,
+        name scope of its producer op (the longest matching scope), its
+        producer's op type, its role (see classify_tensor_roles), and then
+        the default. Tensors without a matching rule keep their imported
+        types.
+
+        Args:
+          name: The name of the recipe (e.g., 'fp16_mixed')
+          default: DataType for tensors without a matching rule
+          roles: A dictionary of tensor role (see TENSOR_ROLES, e.g.,
+              'weights' or 'activations') -> DataType
+          op_types: A dictionary of op type (class or class name) ->
+              DataType of the op's output tensors
+          scopes: A dictionary of name scope (e.g., 'tower0/lstm') ->
+              DataType of the output tensors of ops in the scope
+          tensors: A dictionary of tensor name -> DataType
+          master_weights: DataType of the master copy of the weights that
+              the optimizer updates when weights are stored in a smaller
+              type (e.g., float32 for fp16 mixed precision), or None
+    '''
+    def __init__(self, name, default=None, roles=None, op_types=None,
+                 scopes=None, tensors=None, master_weights=None):
+        self._name = name
+        self._default = default
+        self._roles = dict(roles) if roles is not None else {}
+        self._op_types = dict(op_types) if op_types is not None else {}
+        self._scopes = dict(scopes) if scopes is not None else {}
+        self._tensors = dict(tensors) if tensors is not None else {}
+        self._master_weights = master_weights
+
+    def __str__(self):
+        return 'PrecisionPolicy(name: {}, default: {}, roles: {}, ' \
+               'master_weights: {})'.format(self._name, self._default,
+               self._roles, self._master_weights)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def masterWeights(self):
+        return self._master_weights
+
+    def _getOpTypeDataType(self, op):
+        for op_type, dtype in self._op_types.items():
+            if isinstance(op_type, str):
+                if type(op).__name__ == op_type:
+                    return dtype
+            elif isinstance(op, op_type):
+                return dtype
+        return None
+
+    def _getScopeDataType(self, op):
+        best_scope = None
+        for scope in self._scopes.keys():
+            if op.name != scope and not op.name.startswith(scope + '/'):
+                continue
+            if best_scope is None or len(scope) > len(best_scope):
+                best_scope = scope
+        if best_scope is None:
+            return None
+        return self._scopes[best_scope]
+
+    def getDataType(self, tensor, role):
+        ''' Return the policy's DataType for the tensor with the role, or
+            None if the tensor keeps its type.
+        '''
+        if tensor.dtype is None or not DataType.isFloat(tensor.dtype):
+            return None
+        if tensor.name in self._tensors:
+            return self._tensors[tensor.name]
+        if tensor.producer is not None:
+            dtype = self._getScopeDataType(tensor.producer)
+            if dtype is not None:
+                return dtype
+            dtype = self._getOpTypeDataType(tensor.producer)
+            if dtype is not None:
+                return dtype
+        if role in self._roles:
+            return self._roles[role]
+        return self._default
+
+    def getTensorDataTypes(self, graph):
+        ''' Return a dictionary of tensor name -> DataType for the graph's
+            tensors that the policy changes.
+        '''
+        roles = classify_tensor_roles(graph)
+        dtypes = {}
+        for op in graph.opsByName.values():
+            for out_tensor in op.outputs:
+                dtype = self.getDataType(out_tensor, roles[out_tensor.name])
+                if dtype is not None and dtype != out_tensor.dtype:
+                    dtypes[out_tensor.name] = dtype
+        return dtypes
+
+    def apply(self, graph):
+        ''' Return a context manager that sets the policy's tensor types in
+            the graph, and restores the imported types on exit. For example:
+
+                with policy.apply(graph):
+                    bytes_accessed = graph.calcAlgBytes()
+        '''
+        return PrecisionContextManagerHelper(self, graph)
+
+    def calcMasterWeightBytes(self, graph):
+        ''' Return the bytes of master weight copies: Variables stored in a
+            type smaller than the master type also keep a master copy. Call
+            before applying the policy to the graph.
+        '''
+        if self._master_weights is None:
+            return 0
+        master_size = DataType.sizeof(self._master_weights)
+        roles = classify_tensor_roles(graph)
+        master_bytes = 0
+        for op in graph.opsByName.values():
+            if not isinstance(op, VariableOp):
+                continue
+            for out_tensor in op.outputs:
+                role = roles[out_tensor.name]
+                dtype = self.getDataType(out_tensor, role)
+                if role != WEIGHTS_ROLE or dtype is None:
+                    continue
+                if DataType.sizeof(dtype) < master_size:
+                    master_bytes += master_size * \
+                                    out_tensor.shape.numElements()
+        return master_bytes
+
+
+class PrecisionContextManagerHelper:
+    def __init__(self, policy, graph):
+        self._policy = policy
+        self._graph = graph
+        self._saved_dtypes = None
+
+    def __enter__(self):
+        assert self._saved_dtypes is None, \
+            'Precision policy {} already applied'.format(self._policy.name)
+        self._saved_dtypes = {}
+        dtypes = self._policy.getTensorDataTypes(self._graph)
+        for op in self._graph.opsByName.values():
+            for out_tensor in op.outputs:
+                if out_tensor.name in dtypes:
+                    self._saved_dtypes[out_tensor.name] = \
+                        (out_tensor, out_tensor.dtype)
+                    out_tensor.setDataType(dtypes[out_tensor.name])
+        return self._policy
+
+    def __exit__(self, type_arg, value_arg, traceback_arg):
+        for out_tensor, dtype in self._saved_dtypes.values():
+            out_tensor.setDataType(dtype)
+        self._saved_dtypes = None
+
+
+def calc_precision_costs(graph, policy, bindings=None, hardware=None):
+    ''' Calculate the graph's costs with a precision policy applied.
+
+        Args:
+          graph: The Catamount graph
+          policy: A PrecisionPolicy (or None for the imported types)
+          bindings: Optional dictionary of symbol (or symbol name) -> value
+              to evaluate the costs
+          hardware: Optional HardwareProfile to simulate the step time with
+              the RooflineSimulator (Flop rates by data type)
+
+        Returns:
+          A dictionary with keys 'policy' (name), 'flops', 'bytes',
+          'footprint' (including master weights), 'master_weight_bytes',
+          and, if hardware is specified, 'step_time'
+    '''
+    if policy is None:
+        policy = PrecisionPolicy('imported')
+    # Master weights depend on the imported types, so calculate them before
+    # applying the policy
+    costs = {'master_weight_bytes': policy.calcMasterWeightBytes(graph)}
+    with policy.apply(graph):
+        costs['flops'] = graph.calcAlgFlops()
+        costs['bytes'] = graph.calcAlgBytes()
+        costs['footprint'] = graph.calcAlgFootprint() + \
+                             costs['master_weight_bytes']
+        compiled = None
+        if hardware is not None:
+            simulator = RooflineSimulator(graph, hardware)
+            if bindings is None:
+                costs['step_time'] = simulator.calcStepTime()
+            else:
+                compiled = simulator.compile()
+    if bindings is not None:
+        keys = sorted(costs.keys())
+        values = utils.evaluateExpressions([costs[key] for key in keys],
+                                           bindings)
+        costs = {key: float(value[0]) for key, value in zip(keys, values)}
+        if compiled is not None:
+            costs['step_time'] = float(compiled.calcStepTime(bindings)[0])
+    costs['policy'] = policy.name
+    return costs
+
+def compare_precision_policies(graph, policies, bindings=None,
+                               hardware=None):
+    ''' Return a list of calc_precision_costs results for each policy, to
+        compare precision recipes for the same graph.
+    '''
+    return [calc_precision_costs(graph, policy, bindings, hardware)
+            for policy in policies]
@@ -0,0 +1,367 @@
+import math
+import numpy as np
+
+from catamount.api import utils
+from catamount.graph.frozen import get_op_loop_multipliers
+from catamount.ops.variable import VariableOp
+from .schedule import NON_EXECUTING_OPS, get_op_schedule, is_backward_op
+
+
+class RecomputePlan:
+    ''' An activation recomputation (gradient checkpointing) plan. The
+        outputs of checkpoint ops are kept from the forward pass until the
+        backward pass. Other forward ops run in segments between checkpoints:
+        Their activations are freed during the forward pass and recomputed
+        from the preceding checkpoint, one segment at a time, when the
+        backward pass needs them.
+
+        Attributes:
+          checkpoints: Names of the forward ops whose outputs are kept
+          segments: Lists of names of the forward ops recomputed together
+          stored_bytes: Bytes of checkpointed outputs
+          max_segment_bytes: Most activation bytes that one segment
+              recomputes (live at once during the backward pass)
+          extra_flops: Flops to recompute activations
+          baseline_activation_bytes: Bytes of all activations that the
+              backward pass reads, if every activation is kept
+          param_bytes: Bytes of model parameters (VariableOp outputs)
+    '''
+    def __init__(self, checkpoints, segments, stored_bytes,
+                 max_segment_bytes, extra_flops, baseline_activation_bytes,
+                 param_bytes):
+        self.checkpoints = checkpoints
+        self.segments = segments
+        self.stored_bytes = stored_bytes
+        self.max_segment_bytes = max_segment_bytes
+        self.extra_flops = extra_flops
+        self.baseline_activation_bytes = baseline_activation_bytes
+        self.param_bytes = param_bytes
+
+    def __str__(self):
+        return 'RecomputePlan(checkpoints: {}, segments: {}, ' \
+               'peak_activation_bytes: {}, baseline_activation_bytes: {}, ' \
+               'extra_flops: {})'.format(len(self.checkpoints),
+               len(self.segments), self.peakActivationBytes,
+               self.baseline_activation_bytes, self.extra_flops)
+
+    @property
+    def peakActivationBytes(self):
+        return self.stored_bytes + self.max_segment_bytes
+
+    @property
+    def peakFootprint(self):
+        ''' Parameters plus peak activation bytes with recomputation '''
+        return self.param_bytes + self.peakActivationBytes
+
+    @property
+    def baselineFootprint(self):
+        ''' Parameters plus activation bytes without recomputation '''
+        return self.param_bytes + self.baseline_activation_bytes
+
+    @property
+    def savedBytes(self):
+        return self.baselineFootprint - self.peakFootprint
+
+
+class RecomputePlanner:
+    ''' Plans which forward activations to keep versus recompute in a
+        training graph (Chen et al., "Training Deep Nets with Sublinear
+        Memory Cost"). Forward ops are the executing ops not in the backward
+        pass, in schedule order. A forward op's activation bytes are its
+        outputs that backward ops read; checkpointing an op keeps all of its
+        outputs. Ops in loops count once per iteration.
+
+        Args:
+          graph: The Catamount training graph
+          is_backward: A function op -> bool that identifies backward ops
+              (default: ops in a 'gradients' name scope)
+    '''
+    def __init__(self, graph, is_backward=None):
+        if is_backward is None:
+            is_backward = is_backward_op
+        self._graph = graph
+        self._is_backward = is_backward
+
+    def _getForwardItems(self, bindings):
+        ''' Return the forward op names, and arrays of their Flops,
+            activation bytes, and output bytes, and the parameter bytes.
+        '''
+        forward_ops = []
+        exprs = []
+        param_bytes = 0
+        for op in get_op_schedule(self._graph):
+            if isinstance(op, VariableOp):
+                param_bytes += op.outputs[0].size
+            if isinstance(op, NON_EXECUTING_OPS) or self._is_backward(op):
+                continue
+            flops_mult, _ = get_op_loop_multipliers(op)
+            act_bytes = 0
+            out_bytes = 0
+            for out_tensor in op.outputs:
+                out_bytes += out_tensor.size
+                for consumer in out_tensor.consumers.values():
+                    if self._is_backward(consumer):
+                        act_bytes += out_tensor.size
+                        break
+            forward_ops.append(op.name)
+            # Activations are stashed once per loop iteration
+            exprs.extend([flops_mult * op.calcAlgFlops(),
+                          flops_mult * act_bytes, flops_mult * out_bytes])
+        exprs.append(param_bytes)
+        values = [float(value[0]) for value in
+                  utils.evaluateExpressions(exprs, bindings)]
+        flops = values[0:-1:3]
+        act_bytes = values[1:-1:3]
+        out_bytes = values[2:-1:3]
+        return forward_ops, flops, act_bytes, out_bytes, values[-1]
+
+    def _makePlan(self, items, checkpoint_idxs):
+        forward_ops, flops, act_bytes, out_bytes, param_bytes = items
+        checkpoint_idxs = sorted(checkpoint_idxs)
+        segments = []
+        max_segment_bytes = 0.0
+        extra_flops = 0.0
+        bounds = [-1] + checkpoint_idxs + [len(forward_ops)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            segment = list(range(start + 1, end))
+            # Only ops up to the segment's last activation are recomputed
+            while len(segment) > 0 and act_bytes[segment[-1]] == 0:
+                segment.pop()
+            if len(segment) == 0:
+                continue
+            segments.append([forward_ops[idx] for idx in segment])
+            max_segment_bytes = max(max_segment_bytes,
+                                    sum(act_bytes[idx] for idx in segment))
+            extra_flops += sum(flops[idx] for idx in segment)
+        return RecomputePlan([forward_ops[idx] for idx in checkpoint_idxs],
+                             segments,
+                             sum(out_bytes[idx] for idx in checkpoint_idxs),
+                             max_segment_bytes, extra_flops, sum(act_bytes),
+                             param_bytes)
+
+    def planNoRecompute(self, bindings):
+        ''' Return the plan that keeps every activation. '''
+        items = self._getForwardItems(bindings)
+        act_bytes = items[2]
+        return self._makePlan(items, [idx for idx in range(len(act_bytes))
+                                      if act_bytes[idx] > 0])
+
+    def planSqrtN(self, bindings, num_segments=None):
+        ''' Split the forward ops into segments of roughly equal activation
+            bytes, checkpointing the last op of each segment. With
+            sqrt(N) segments (the default) for N forward ops, peak activation
+            memory is O(sqrt(N)) at the cost of one extra forward pass.
+
+            Args:
+              bindings: A dictionary of symbol (or symbol name) -> value
+              num_segments: The number of segments (default: ceil(sqrt(N)))
+        '''
+        items = self._getForwardItems(bindings)
+        act_bytes = items[2]
+        if num_segments is None:
+            num_segments = int(math.ceil(math.sqrt(len(act_bytes))))
+        total_bytes = sum(act_bytes)
+        checkpoint_idxs = []
+        curr_bytes = 0.0
+        for idx, op_bytes in enumerate(act_bytes[:-1]):
+            curr_bytes += op_bytes
+            target = total_bytes * (len(checkpoint_idxs) + 1) / num_segments
+            if len(checkpoint_idxs) < num_segments - 1 and \
+               op_bytes > 0 and curr_bytes >= target:
+                checkpoint_idxs.append(idx)
+        return self._makePlan(items, checkpoint_idxs)
+
+    def planMemoryBudget(self, bindings, memory_budget,
+                         num_segment_bounds=32, max_front_size=64,
+                         max_candidates=128):
+        ''' Choose checkpoints that minimize recomputation Flops while the
+            peak footprint (parameters, checkpoints, and the largest
+            recomputed segment) fits in memory_budget.
+
+            For each bound L on segment activation bytes (from a grid of
+            num_segment_bounds values), dynamic programming over candidate
+            checkpoints tracks the Pareto front of (checkpoint bytes,
+            recomputation Flops) for plans ending with a checkpoint at each
+            candidate. Fronts are thinned to max_front_size entries. With
+            more than max_candidates forward ops, candidates are restricted
+            to one op per segment of roughly equal activation bytes (see
+            _getCandidates), which bounds the work per L.
+
+            Raises:
+              ValueError if no plan fits in memory_budget
+        '''
+        items = self._getForwardItems(bindings)
+        _, flops, act_bytes, out_bytes, param_bytes = items
+        num_ops = len(act_bytes)
+        act_prefix = [0.0]
+        flops_prefix = [0.0]
+        for idx in range(num_ops):
+            act_prefix.append(act_prefix[-1] + act_bytes[idx])
+            flops_prefix.append(flops_prefix[-1] + flops[idx])
+        # last_act[idx]: The last op at or before idx with activation bytes
+        last_act = []
+        for idx in range(num_ops):
+            if act_bytes[idx] > 0:
+                last_act.append(idx)
+            else:
+                last_act.append(last_act[-1] if idx > 0 else -1)
+
+        def segmentCosts(start, end):
+            ''' Costs to recompute ops start..end-1 '''
+            if end <= start or last_act[end - 1] < start:
+                return 0.0, 0.0
+            last = last_act[end - 1]
+            return act_prefix[last + 1] - act_prefix[start], \
+                   flops_prefix[last + 1] - flops_prefix[start]
+
+        candidates = self._getCandidates(act_bytes, out_bytes,
+                                         max_candidates)
+        # Checkpoint positions: 0 is the start, candidate idx is at position
+        # idx + 1, and num_ops + 1 is the end. Segment costs between all
+        # pairs of positions are independent of the bound, so build them once
+        positions = [0] + [idx + 1 for idx in candidates] + [num_ops + 1]
+        seg_costs = [[segmentCosts(positions[prev], positions[pos] - 1)
+                      for prev in range(pos)]
+                     for pos in range(len(positions))]
+        stored = [0.0] + [out_bytes[idx] for idx in candidates] + [0.0]
+
+        total_bytes = act_prefix[-1]
+        bounds = sorted(set([0.0, max(act_bytes + [0.0])] +
+                            [total_bytes / count for count in
+                             range(1, num_segment_bounds + 1)]))
+        best = None
+        for bound in bounds:
+            stored_limit = memory_budget - param_bytes - bound
+            if stored_limit < 0:
+                continue
+            checkpoint_idxs = self._solveBounded(
+                candidates, stored, seg_costs, bound, stored_limit,
+                max_front_size)
+            if checkpoint_idxs is None:
+                continue
+            plan = self._makePlan(items, checkpoint_idxs)
+            if plan.peakFootprint > memory_budget:
+                continue
+            if best is None or \
+               (plan.extra_flops, plan.peakFootprint) < \
+               (best.extra_flops, best.peakFootprint):
+                best = plan
+        if best is None:
+            raise ValueError('No recomputation plan fits in memory budget {} '
+                             '(parameters: {} bytes)'.format(memory_budget,
+                                                             param_bytes))
+        return best
+
+    @staticmethod
+    def _getCandidates(act_bytes, out_bytes, max_candidates):
+        ''' Return the indices of the forward ops that may be checkpointed:
+            All ops, or if there are more than max_candidates, the ops split
+            into max_candidates contiguous segments of roughly equal
+            activation bytes (and op counts), and from each segment, the op
+            with activations that is cheapest to store (the latest on ties).
+        '''
+        num_ops = len(act_bytes)
+        if num_ops <= max_candidates:
+            return list(range(num_ops))
+        act_bytes = np.asarray(act_bytes)
+        weights = np.full(num_ops, 1.0 / num_ops)
+        if act_bytes.sum() > 0:
+            weights += act_bytes / act_bytes.sum()
+        weight_prefix = np.cumsum(weights)
+        targets = weight_prefix[-1] * np.arange(1, max_candidates) / \
+                  max_candidates
+        cuts = np.searchsorted(weight_prefix, targets, side='left') + 1
+        seg_bounds = [0] + sorted(set(int(cut) for cut in cuts
+                                      if 0 < cut < num_ops)) + [num_ops]
+        candidates = []
+        for start, end in zip(seg_bounds[:-1], seg_bounds[1:]):
+            seg_idxs = [idx for idx in range(start, end)
+                        if act_bytes[idx] > 0]
+            if len(seg_idxs) == 0:
+                seg_idxs = [end - 1]
+            candidates.append(min(reversed(seg_idxs),
+                                  key=lambda idx: out_bytes[idx]))
+        return candidates
+
+    def _solveBounded(self, candidates, stored, seg_costs, bound,
+                      stored_limit, max_front_size):
+        ''' Return the checkpoint indices that minimize recomputation Flops
+            with segments of at most bound activation bytes and at most
+            stored_limit checkpoint bytes, or None if infeasible.
+
+            Args:
+              candidates: Indices of the candidate checkpoint ops
+              stored: Checkpoint bytes at each position (0 for the start
+                  and end positions)
+              seg_costs: seg_costs[pos][prev]: (activation bytes, Flops) to
+                  recompute the ops between positions prev and pos
+        '''
+        # fronts[pos]: Arrays of stored bytes, Flops, previous position,
+        # and previous entry index for plans with a checkpoint at pos
+        num_positions = len(stored)
+        fronts = [None] * num_positions
+        fronts[0] = (np.zeros(1), np.zeros(1), np.full(1, -1),
+                     np.full(1, -1))
+        for pos in range(1, num_positions):
+            parts = []
+            for prev_pos in range(pos - 1, -1, -1):
+                seg_bytes, seg_flops = seg_costs[pos][prev_pos]
+                # Segments only grow for earlier previous positions
+                if seg_bytes > bound:
+                    break
+                prev_stored, prev_flops, _, _ = fronts[prev_pos]
+                if len(prev_stored) == 0:
+                    continue
+                parts.append((prev_stored + stored[pos],
+                              prev_flops + seg_flops,
+                              np.full(len(prev_stored), prev_pos),
+                              np.arange(len(prev_stored))))
+            if len(parts) == 0:
+                fronts[pos] = (np.zeros(0), np.zeros(0),
+                               np.zeros(0, dtype=np.int64),
+                               np.zeros(0, dtype=np.int64))
+                continue
+            front = [np.concatenate(arrays) for arrays in zip(*parts)]
+            fronts[pos] = self._paretoFront(front, stored_limit,
+                                            max_front_size)
+        end_stored, end_flops, _, _ = fronts[-1]
+        if len(end_stored) == 0:
+            return None
+        entry_idx = int(np.lexsort((end_stored, end_flops))[0])
+        checkpoint_idxs = []
+        pos = num_positions - 1
+        while fronts[pos][2][entry_idx] >= 0:
+            pos, entry_idx = int(fronts[pos][2][entry_idx]), \
+                             int(fronts[pos][3][entry_idx])
+            if pos > 0:
+                checkpoint_idxs.append(candidates[pos - 1])
+        return checkpoint_idxs
+
+    def _paretoFront(self, front, stored_limit, max_front_size):
+        ''' Return the entries of front (arrays of stored bytes, Flops,
+            previous position, and previous entry) within stored_limit that
+            are Pareto optimal in (stored bytes, Flops), thinned to
+            max_front_size entries.
+        '''
+        keep = front[0] <= stored_limit
+        front = [array[keep] for array in front]
+        order = np.lexsort((front[3], front[2], front[1], front[0]))
+        front = [array[order] for array in front]
+        flops = front[1]
+        prev_min = np.concatenate([[np.inf],
+                                   np.minimum.accumulate(flops)[:-1]])
+        front = [array[flops < prev_min] for array in front]
+        num_entries = len(front[0])
+        if num_entries > max_front_size:
+            step = (num_entries - 1) / (max_front_size - 1)
+            idxs = [int(round(idx * step)) for idx in range(max_front_size)]
+            front = [array[idxs] for array in front]
+        return tuple(front)
+
+    def plan(self, bindings, memory_budget=None):
+        ''' Return the sqrt(N) plan, or if memory_budget is specified, the
+            plan with the fewest recomputation Flops that fits in it.
+        '''
+        if memory_budget is None:
+            return self.planSqrtN(bindings)
+        return self.planMemoryBudget(bindings, memory_budget)
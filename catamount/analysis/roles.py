@@ -0,0 +1,199 @@
+import sympy
+
+from catamount.api import utils
+from catamount.graph.frozen import get_op_loop_multipliers
+from catamount.ops.constant import ConstantOp
+from catamount.ops.optimizer_ops import ApplyGradientDescentOp, \
+                                        ApplyMomentumOp
+from catamount.ops.variable import VariableOp
+from .schedule import get_op_schedule, is_backward_op
+
+
+WEIGHTS_ROLE = 'weights'
+ACTIVATIONS_ROLE = 'activations'
+GRADIENTS_ROLE = 'gradients'
+OPTIMIZER_STATE_ROLE = 'optimizer_state'
+CONSTANTS_ROLE = 'constants'
+WORKSPACE_ROLE = 'workspace'
+TENSOR_ROLES = [WEIGHTS_ROLE, ACTIVATIONS_ROLE, GRADIENTS_ROLE,
+                OPTIMIZER_STATE_ROLE, CONSTANTS_ROLE, WORKSPACE_ROLE]
+
+# Optimizer op type -> indices of inputs that are optimizer state (e.g.,
+# momentum accumulators)
+OPTIMIZER_STATE_INPUTS = {
+    ApplyGradientDescentOp: [],
+    ApplyMomentumOp: [1],
+}
+
+
+def classify_tensor_roles(graph):
+    ''' Classify each tensor in the graph by its role in training:
+        - optimizer_state: Optimizer op state inputs (e.g., ApplyMomentumOp
+          accumulators)
+        - weights: VariableOp outputs, and optimizer op outputs (the
+          updated weights)
+        - constants: ConstantOp outputs (e.g., shapes, loop bounds, and
+          hyperparameters)
+        - gradients: Outputs of ops in 'gradients' scopes
+        - activations: Other tensors that backward ops consume (i.e.,
+          forward activations saved for the backward pass), including
+          placeholder outputs
+        - workspace: Other (transient) tensors, e.g., all forward tensors
+          of inference graphs
+
+        Returns:
+          A dictionary of tensor name -> role
+    '''
+    roles = {}
+    optimizer_state = set()
+    for op in graph.opsByName.values():
+        for op_type, input_idxs in OPTIMIZER_STATE_INPUTS.items():
+            if not isinstance(op, op_type):
+                continue
+            for idx in input_idxs:
+                if idx < len(op.inputs):
+                    optimizer_state.add(op.inputs[idx].name)
+    optimizer_op_types = tuple(OPTIMIZER_STATE_INPUTS.keys())
+    for op in graph.opsByName.values():
+        for out_tensor in op.outputs:
+            if out_tensor.name in optimizer_state:
+                role = OPTIMIZER_STATE_ROLE
+            elif isinstance(op, (VariableOp,) + optimizer_op_types):
+                role = WEIGHTS_ROLE
+            elif isinstance(op, ConstantOp):
+                role = CONSTANTS_ROLE
+            elif is_backward_op(op):
+                role = GRADIENTS_ROLE
+            elif any(is_backward_op(consumer)
+                     for consumer in out_tensor.consumers.values()):
+                role = ACTIVATIONS_ROLE
+            else:
+                role = WORKSPACE_ROLE
+            roles[out_tensor.name] = role
+    return roles
+
+def get_op_role(op, roles):
+    ''' Return the role of the op's footprint: The role of its first output
+        tensor, or workspace for ops without outputs.
+    '''
+    if len(op.outputs) == 0:
+        return WORKSPACE_ROLE
+    return roles[op.outputs[0].name]
+
+
+
+class RoleFootprintTracker:
+    ''' Follows the tensors that a minimal footprint traversal (see
+        SubgraphOp.calcMinimalFootprint) allocates and frees, and tracks the
+        live bytes of each tensor role. The traversal calls:
+          - allocate(tensor) and free(tensor) as it allocates and frees
+            tensors
+          - observe() where it updates its maximum footprint
+          - enterSubgraph() and exitSubgraph(loop_iters) around subgraph
+            (loop) traversals, which repeat their change in live bytes for
+            each iteration
+
+        Args:
+          roles: A dictionary of tensor name -> role (see
+              classify_tensor_roles)
+          symbol_subs: Optional dictionary of symbol -> value to substitute,
+              as for the traversal
+    '''
+    def __init__(self, roles, symbol_subs=None):
+        self._roles = roles
+        self._symbol_subs = symbol_subs
+        self._curr_live = {role: 0 for role in TENSOR_ROLES}
+        self._peak_live = {role: 0 for role in TENSOR_ROLES}
+        self._subgraph_starts = []
+
+    @property
+    def peakLive(self):
+        ''' Dictionary of role -> peak live bytes of the role's tensors '''
+        return self._peak_live
+
+    def _subs(self, value):
+        if self._symbol_subs is not None and isinstance(value, sympy.Expr):
+            return value.subs(self._symbol_subs)
+        return value
+
+    def _getRole(self, tensor):
+        return self._roles.get(tensor.name, WORKSPACE_ROLE)
+
+    def allocate(self, tensor):
+        role = self._getRole(tensor)
+        self._curr_live[role] = self._subs(self._curr_live[role] +
+                                           tensor.size)
+
+    def free(self, tensor):
+        role = self._getRole(tensor)
+        self._curr_live[role] = self._subs(self._curr_live[role] -
+                                           tensor.size)
+
+    def observe(self):
+        for role in TENSOR_ROLES:
+            self._peak_live[role] = utils.getSymbolicMaximum(
+                self._peak_live[role], self._curr_live[role],
+                self._symbol_subs)
+
+    def enterSubgraph(self):
+        self._subgraph_starts.append(dict(self._curr_live))
+
+    def exitSubgraph(self, loop_iters):
+        start_live = self._subgraph_starts.pop()
+        for role in TENSOR_ROLES:
+            self._curr_live[role] = self._subs(start_live[role] +
+                (self._curr_live[role] - start_live[role]) * loop_iters)
+
+
+def calc_footprint_by_role(graph, bindings=None):
+    ''' Break down the graph's algorithmic footprint (see calcAlgFootprint)
+        and minimal footprint (see calcMinimalFootprint) by tensor role (see
+        classify_tensor_roles). Each op's algorithmic footprint, counted
+        once per loop iteration, accrues to the role of its outputs. The
+        minimal footprint traversal tracks the live bytes of each role (see
+        RoleFootprintTracker), so the breakdown follows the same schedule as
+        the graph's own minimal footprint.
+
+        Args:
+          graph: The Catamount graph
+          bindings: Optional dictionary of symbol (or symbol name) -> value
+              to evaluate the footprints. The graph's own iterations symbol
+              (see getLoopIters) is 1 (one step) unless bound
+
+        Returns:
+          A dictionary with keys:
+            'footprint': Dictionary of role (and 'total') -> algorithmic
+                footprint. The total equals graph.calcAlgFootprint()
+            'minimal_footprint': Dictionary of role -> peak live bytes of
+                the role's tensors, and 'total' -> the graph's minimal
+                footprint. Role peaks can occur at different times, so they
+                may sum to more than the total
+    '''
+    roles = classify_tensor_roles(graph)
+    footprint = {role: 0 for role in TENSOR_ROLES}
+    for op in get_op_schedule(graph):
+        _, bytes_mult = get_op_loop_multipliers(op)
+        footprint[get_op_role(op, roles)] += bytes_mult * op.calcAlgFootprint()
+    footprint['total'] = sum(footprint[role] for role in TENSOR_ROLES)
+
+    symbol_subs = {graph.getLoopIters(): 1}
+    if bindings is not None:
+        for key, value in bindings.items():
+            if isinstance(key, str):
+                key = utils.getIntSymbolFromString(key)
+            symbol_subs[key] = value
+    tracker = RoleFootprintTracker(roles, symbol_subs)
+    min_footprint = graph.calcMinimalFootprint(symbol_subs=symbol_subs,
+                                               footprint_tracker=tracker)
+    peak_live = dict(tracker.peakLive)
+    peak_live['total'] = min_footprint
+
+    keys = TENSOR_ROLES + ['total']
+    if bindings is not None:
+        values = utils.evaluateExpressions([footprint[key] for key in keys] +
+                                           [peak_live[key] for key in keys],
+                                           bindings)
+        values = [float(value[0]) for value in values]
+        footprint = dict(zip(keys, values[:len(keys)]))
+        peak_live = dict(zip(keys, values[len(keys):]))
+    return {'footprint': footprint, 'minimal_footprint': peak_live}
@@ -0,0 +1,34 @@
+from catamount.ops.constant import ConstantOp
+from catamount.ops.placeholder import PlaceholderOp
+from catamount.ops.subgraph_op import SubgraphOp
+from catamount.ops.variable import VariableOp
+
+
+# Ops that hold graph inputs or state rather than executing per step
+NON_EXECUTING_OPS = (ConstantOp, PlaceholderOp, VariableOp)
+
+
+def is_backward_op(op):
+    ''' Return whether the op is part of the backward pass: TensorFlow
+        places gradient ops in a 'gradients' name scope (possibly nested in
+        another scope, e.g., 'tower0/gradients/...').
+    '''
+    return 'gradients' in op.name.split('/')
+
+def get_op_schedule(graph):
+    ''' Return a deterministic execution schedule of the graph's (flat,
+        non-subgraph) ops: A topological order with ties broken by
+        dependency depth, then name.
+    '''
+    depths = {}
+    ops = []
+    for op in graph.getTopologicalOpOrder():
+        depth = 0
+        for in_tensor in op.inputs:
+            producer = in_tensor.producer
+            if producer is not None and producer.name in depths:
+                depth = max(depth, depths[producer.name] + 1)
+        depths[op.name] = depth
+        if not isinstance(op, SubgraphOp):
+            ops.append(op)
+    return sorted(ops, key=lambda op: (depths[op.name], op.name))
@@ -1,6 +1,42 @@
+import numpy as np
 import sympy
 
 
+class SymbolRegistry:
+    ''' Metadata about the symbols used in a graph's Catamount expressions:
+        Maps symbol name -> [lower bound, upper bound], where either bound
+        can be None if unknown. Registered ranges let symbolic comparisons
+        (e.g., to collapse symbolic maximums) reason about which expressions
+        dominate. Also caches dominance check results, which are cleared
+        when symbol ranges change.
+
+        Each Graph owns a registry, so symbol ranges and cached comparisons
+        do not leak between graphs. The registry of the graph that was most
+        recently created or made default is active.
+    '''
+    def __init__(self):
+        self.ranges = {}
+        self.dominance_cache = {}
+
+    def clear(self):
+        self.ranges.clear()
+        self.dominance_cache.clear()
+
+
+_symbol_registry = SymbolRegistry()
+
+def setActiveSymbolRegistry(registry):
+    ''' Set the SymbolRegistry that symbol ranges are registered in and
+        looked up from. Returns the previously active registry.
+    '''
+    global _symbol_registry
+    prev_registry = _symbol_registry
+    _symbol_registry = registry
+    return prev_registry
+
+def getActiveSymbolRegistry():
+    return _symbol_registry
+
 def getIntSymbolFromString(sym_name):
     assert isinstance(sym_name, str)
     # Integer symbols should specify explicitly (e.g., Dimensions)
@@ -8,10 +44,122 @@ def getIntSymbolFromString(sym_name):
 
 def getPositiveIntSymbolFromString(sym_name):
     assert isinstance(sym_name, str)
+    registerSymbol(sym_name, lower=1)
     # Integer symbols should specify explicitly (e.g., Dimensions)
     return sympy.Symbol(sym_name, integer=True, positive=True)
 
-def getSymbolicMaximum(expr_0, expr_1, symbol_subs=None):
+def registerSymbol(symbol_or_name, lower=None, upper=None):
+    ''' Register range metadata for a symbol. Bounds are inclusive, and
+        re-registering a symbol tightens its existing range.
+
+        Args:
+          symbol_or_name: A sympy.Symbol or the name of the symbol
+          lower: The smallest value the symbol can take (or None)
+          upper: The largest value the symbol can take (or None)
+    '''
+    if isinstance(symbol_or_name, sympy.Symbol):
+        sym_name = symbol_or_name.name
+    else:
+        assert isinstance(symbol_or_name, str)
+        sym_name = symbol_or_name
+    ranges = _symbol_registry.ranges
+    if sym_name not in ranges:
+        ranges[sym_name] = [None, None]
+    sym_range = ranges[sym_name]
+    changed = False
+    if lower is not None and (sym_range[0] is None or lower > sym_range[0]):
+        sym_range[0] = lower
+        changed = True
+    if upper is not None and (sym_range[1] is None or upper < sym_range[1]):
+        sym_range[1] = upper
+        changed = True
+    if changed:
+        _symbol_registry.dominance_cache.clear()
+
+def registerDimensionSymbols(expr):
+    ''' Register all free symbols in expr as tensor dimensions, which are
+        positive integers.
+    '''
+    if isinstance(expr, sympy.Symbol):
+        if expr.name not in _symbol_registry.ranges:
+            registerSymbol(expr, lower=1)
+    elif isinstance(expr, sympy.Expr):
+        for symbol in expr.free_symbols:
+            if symbol.name not in _symbol_registry.ranges:
+                registerSymbol(symbol, lower=1)
+
+def getSymbolRange(symbol):
+    ''' Return the (lower, upper) range of the symbol. Symbols that have not
+        been registered get default ranges by their naming convention:
+        Loop iteration counts ('::iters') are at least 1, and automatically
+        named tensor dimensions ('::dim_') are positive.
+    '''
+    sym_name = symbol.name
+    if sym_name in _symbol_registry.ranges:
+        lower, upper = _symbol_registry.ranges[sym_name]
+    else:
+        lower, upper = None, None
+        if sym_name.endswith('::iters') or '::dim_' in sym_name:
+            lower = 1
+    if lower is None and symbol.is_positive and symbol.is_integer:
+        lower = 1
+    elif lower is None and symbol.is_nonnegative:
+        lower = 0
+    return lower, upper
+
+def clearSymbolRegistry():
+    ''' Clear the active SymbolRegistry's ranges and cached comparisons. '''
+    _symbol_registry.clear()
+
+def symbolicDominates(expr_0, expr_1):
+    ''' Return whether expr_0 >= expr_1 for all values of the free symbols
+        within their registered ranges. This check is conservative: If it
+        returns False, expr_0 might still dominate expr_1.
+
+        The check substitutes each symbol, s, with (lower(s) + t) (or with
+        (upper(s) - t) if s has only an upper bound), where t >= 0, and
+        expands the difference (expr_0 - expr_1). If all polynomial
+        coefficients of the result are non-negative, then the difference is
+        non-negative everywhere in the symbol ranges.
+    '''
+    dominance_cache = _symbol_registry.dominance_cache
+    cache_key = (expr_0, expr_1)
+    if cache_key in dominance_cache:
+        return dominance_cache[cache_key]
+    diff = sympy.expand(expr_0 - expr_1)
+    dominates = False
+    if diff.is_number:
+        dominates = bool(diff >= 0)
+    else:
+        symbols = sorted(diff.free_symbols, key=lambda sym: sym.name)
+        shifts = {}
+        for symbol in symbols:
+            lower, upper = getSymbolRange(symbol)
+            if lower is not None:
+                if lower != 0:
+                    shifts[symbol] = symbol + lower
+            elif upper is not None:
+                shifts[symbol] = upper - symbol
+            else:
+                # Unbounded symbol, so polynomial terms cannot be compared
+                shifts = None
+                break
+        if shifts is not None:
+            try:
+                diff_poly = sympy.Poly(diff.xreplace(shifts), *symbols)
+                dominates = all(coeff >= 0 for coeff in diff_poly.coeffs())
+            except sympy.PolynomialError:
+                # Non-polynomial terms (e.g., floor, Max): Not comparable
+                dominates = False
+    dominance_cache[cache_key] = dominates
+    return dominates
+
+def _getMaximumCandidates(expr):
+    if isinstance(expr, sympy.Max):
+        return list(expr.args)
+    return [expr]
+
+def getSymbolicMaximum(expr_0, expr_1, symbol_subs=None, verbose=False):
     if symbol_subs is not None:
         if isinstance(expr_0, sympy.Expr):
             expr_0 = expr_0.subs(symbol_subs)
@@ -26,8 +174,233 @@ def getSymbolicMaximum(expr_0, expr_1, symbol_subs=None):
         expr_1 = int(expr_1)
     except:
         pass
-    if isinstance(expr_0, sympy.Expr) or isinstance(expr_1, sympy.Expr):
-        print('WARN: Symbolic maximum is slow! {} {}'.format(expr_0, expr_1))
-        return sympy.functions.Max(expr_0, expr_1)
-    else:
+    if not isinstance(expr_0, sympy.Expr) and \
+       not isinstance(expr_1, sympy.Expr):
         return max(expr_0, expr_1)
+
+    # Flatten both sides into a single list of Max candidates, and then
+    # only keep the candidates that are not dominated by any other
+    candidates = []
+    for cand in _getMaximumCandidates(expr_0) + \
+                _getMaximumCandidates(expr_1):
+        cand = sympy.sympify(cand)
+        if cand in candidates:
+            continue
+        if any(symbolicDominates(kept, cand) for kept in candidates):
+            continue
+        candidates = [kept for kept in candidates
+                      if not symbolicDominates(cand, kept)]
+        candidates.append(cand)
+    if len(candidates) == 1:
+        if candidates[0].is_Integer:
+            return int(candidates[0])
+        return candidates[0]
+    if verbose:
+        print('WARN: Symbolic maximum is slow! {}'.format(candidates))
+    return sympy.Max(*candidates, evaluate=False)
+
+
+class SymbolEquivalenceTable:
+    ''' A union-find (disjoint set) structure over symbols that have been
+        shown to be equal (e.g., by merging tensor shapes during shape
+        propagation). Each equivalence class has a canonical representative
+        symbol. User-specified symbols are preferred as representatives over
+        automatically named tensor dimension symbols ('::dim_'), and only
+        automatically named symbols get substituted, so user bindings of
+        any symbol in a class continue to apply.
+    '''
+    def __init__(self):
+        self._parents = {}
+        # Dimensions assigned a symbol while this table is active (by id)
+        self._assigned_dims = {}
+
+    def __len__(self):
+        return len(self._parents)
+
+    @staticmethod
+    def isAutomaticSymbol(symbol):
+        return '::dim_' in symbol.name
+
+    @staticmethod
+    def _priority(symbol):
+        return (SymbolEquivalenceTable.isAutomaticSymbol(symbol), symbol.name)
+
+    def markDimensionAssigned(self, dim):
+        ''' Record that dim was assigned a symbol. Returns whether it was
+            already assigned one while this table was active.
+        '''
+        if id(dim) in self._assigned_dims:
+            return True
+        self._assigned_dims[id(dim)] = dim
+        return False
+
+    def find(self, symbol):
+        ''' Return the canonical representative for the symbol's class.
+        '''
+        if symbol not in self._parents:
+            return symbol
+        root = symbol
+        while self._parents[root] != root:
+            root = self._parents[root]
+        # Path compression
+        while self._parents[symbol] != root:
+            next_symbol = self._parents[symbol]
+            self._parents[symbol] = root
+            symbol = next_symbol
+        return root
+
+    def union(self, symbol_0, symbol_1):
+        ''' Record that symbol_0 == symbol_1. Returns whether the classes of
+            the two symbols were previously distinct.
+        '''
+        assert isinstance(symbol_0, sympy.Symbol)
+        assert isinstance(symbol_1, sympy.Symbol)
+        for symbol in (symbol_0, symbol_1):
+            if symbol not in self._parents:
+                self._parents[symbol] = symbol
+        root_0 = self.find(symbol_0)
+        root_1 = self.find(symbol_1)
+        if root_0 == root_1:
+            return False
+        if self._priority(root_1) < self._priority(root_0):
+            root_0, root_1 = root_1, root_0
+        self._parents[root_1] = root_0
+        return True
+
+    def getSubstitutions(self):
+        ''' Return a dictionary mapping each non-canonical, automatically
+            named symbol to its canonical representative. User-specified
+            symbols are never substituted.
+        '''
+        subs = {}
+        for symbol in self._parents.keys():
+            root = self.find(symbol)
+            if root != symbol and self.isAutomaticSymbol(symbol):
+                subs[symbol] = root
+        return subs
+
+    def getClasses(self):
+        ''' Return a dictionary of canonical symbol -> set of equal symbols
+        '''
+        classes = {}
+        for symbol in self._parents.keys():
+            classes.setdefault(self.find(symbol), set()).add(symbol)
+        return classes
+
+    def canonicalize(self, expr, subs=None):
+        ''' Replace all symbols in expr with their canonical representatives
+        '''
+        if not isinstance(expr, sympy.Expr):
+            return expr
+        if subs is None:
+            subs = self.getSubstitutions()
+        if len(subs) == 0 or expr.free_symbols.isdisjoint(subs.keys()):
+            return expr
+        return expr.xreplace(subs)
+
+
+# The equivalence table that collects symbol equalities found during shape
+# propagation (set by the graph that is currently propagating shapes)
+_active_equivalence_table = None
+
+def setActiveEquivalenceTable(table):
+    ''' Set the table into which symbol equivalences get recorded. Returns
+        the previously active table, so the caller can restore it.
+    '''
+    global _active_equivalence_table
+    prev_table = _active_equivalence_table
+    _active_equivalence_table = table
+    return prev_table
+
+def recordSymbolEquivalence(expr_0, expr_1):
+    ''' Record that two dimension symbols are equal, if a table is active.
+        Only plain symbols are recorded (not compound expressions).
+    '''
+    if _active_equivalence_table is None:
+        return
+    if isinstance(expr_0, sympy.Symbol) and \
+       isinstance(expr_1, sympy.Symbol) and expr_0 != expr_1:
+        _active_equivalence_table.union(expr_0, expr_1)
+
+def recordDimensionAssignment(dim):
+    ''' Record that dim is being assigned a symbol. Returns whether dim was
+        already assigned a symbol during the active propagation, in which
+        case a differing new symbol is a genuine merge (rather than a
+        rebind of a symbol left over from an earlier propagation).
+    '''
+    if _active_equivalence_table is None:
+        return False
+    return _active_equivalence_table.markDimensionAssigned(dim)
+
+
+class CompiledExpressions:
+    ''' A list of symbolic expressions compiled (lambdified) into a single
+        numpy function for fast, vectorized evaluation. Compiled expressions
+        can be pickled (e.g., to send to worker processes), and recompile
+        lazily after unpickling.
+    '''
+    def __init__(self, exprs):
+        self._exprs = list(exprs)
+        symbols = set()
+        for expr in self._exprs:
+            if isinstance(expr, sympy.Expr):
+                symbols.update(expr.free_symbols)
+        self._symbols = sorted(symbols, key=lambda sym: sym.name)
+        self._func = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_func'] = None
+        return state
+
+    def __len__(self):
+        return len(self._exprs)
+
+    @property
+    def symbols(self):
+        return self._symbols
+
+    def __call__(self, bindings):
+        ''' Evaluate the expressions for vectors of symbol values.
+
+            Args:
+              bindings: A dictionary of symbol (or symbol name) -> value or
+                  1D array of values. All arrays must have the same length
+
+            Returns:
+              A list of float arrays, each with shape [num_bindings]
+        '''
+        named_bindings = {}
+        for key, value in bindings.items():
+            name = key.name if isinstance(key, sympy.Symbol) else key
+            named_bindings[name] = np.atleast_1d(
+                np.asarray(value, dtype=np.float64))
+        num_bindings = max([len(value) for value in named_bindings.values()],
+                           default=1)
+        for symbol in self._symbols:
+            if symbol.name not in named_bindings:
+                raise KeyError('Missing binding for symbol {}'
+                               .format(symbol.name))
+        if self._func is None:
+            self._func = sympy.lambdify(self._symbols, self._exprs,
+                                        modules='numpy')
+        results = self._func(*[named_bindings[sym.name]
+                               for sym in self._symbols])
+        return [np.broadcast_to(np.asarray(result, dtype=np.float64),
+                                (num_bindings,)).copy()
+                for result in results]
+
+
+def evaluateExpressions(exprs, bindings):
+    ''' Evaluate a list of symbolic expressions for vectors of symbol values
+        using a single compiled (lambdified) numpy function.
+
+        Args:
+          exprs: A list of sympy expressions or numbers
+          bindings: A dictionary of symbol (or symbol name) -> value or 1D
+              array of values. All arrays must have the same length
+
+        Returns:
+          A list of float arrays, each with shape [num_bindings]
+    '''
+    return CompiledExpressions(exprs)(bindings)
@@ -19,6 +19,7 @@ from tensorflow.core.framework import types_pb2
 
 import catamount
 from catamount.graph import *
+from catamount.graph.placement import canonicalize_device
 from catamount.ops import *
 from catamount.tensors.tensor import *
 
@@ -87,6 +88,7 @@ TF_OP_TO_CATAMOUNT = {
     'InTopKV2': InTopKOp,
     'InvertPermutation': InvertPermutationOp,
     'Less': LessOp,
+    'LessEqual': LessEqualOp,
     'ListDiff': ListDiffOp,
     'Log': LogOp,
     'Log1p': Log1pOp,
@@ -240,9 +242,12 @@ TF_OP_TO_CATAMOUNT_REDUCE = {
 
 TF_DTYPE_TO_CATAMOUNT = {
     tf.bool: DataType.bool,
+    tf.int8: DataType.int8,
     tf.int32: DataType.int32,
     tf.int64: DataType.int64,
     tf.uint8: DataType.uint8,
+    tf.bfloat16: DataType.bfloat16,
+    tf.float16: DataType.float16,
     tf.float32: DataType.float32,
     tf.float64: DataType.float64,
     tf.string: DataType.string,
@@ -468,6 +473,10 @@ def construct_catamount_graph(tf_sess, tf_graph):
 
         # Create the Catamount internal op
         op = catamount_type(tf_op.name)
+        op.setDevice(canonicalize_device(tf_op.device))
+
+        if catamount_type == UnknownOp:
+            op.setOpType(tf_op.type)
 
         if catamount_type == ReduceOp:
             reduce_op = None
@@ -1,7 +1,16 @@
+import numpy as np
+import sympy
+
+from catamount.api import utils
 from catamount.ops.base_op import Op
 from catamount.ops.subgraph_op import SubgraphOp
 from catamount.ops.placeholder import PlaceholderOp
 from catamount.ops.variable import VariableOp
+from .frozen import FrozenGraph
+from .loops import bind_loop_iters
+from .parallel import calc_sharded_costs
+from .placement import calc_device_costs, calc_transfer_bytes, get_devices
+from .symbolize import symbolize_dimensions_by_value
 
 
 class GraphContextManagerHelper:
@@ -21,6 +30,13 @@ class GraphContextManagerHelper:
 class Graph(SubgraphOp):
     def __init__(self):
         super(Graph, self).__init__('graph')
+        # Equivalence classes of dimension symbols that shape propagation
+        # has shown to be equal
+        self._symbol_equivalences = utils.SymbolEquivalenceTable()
+        # Ranges of this graph's symbols (activated when the graph is
+        # created or made default, so they do not leak between graphs)
+        self._symbol_registry = utils.SymbolRegistry()
+        utils.setActiveSymbolRegistry(self._symbol_registry)
 
     def __str__(self):
         # Dump the full graph definition
@@ -39,8 +55,13 @@ class Graph(SubgraphOp):
         global _catamount_default_graph
         ctx_mgr = GraphContextManagerHelper()
         _catamount_default_graph = self
+        utils.setActiveSymbolRegistry(self._symbol_registry)
         return ctx_mgr
 
+    @property
+    def symbolRegistry(self):
+        return self._symbol_registry
+
     def getPlaceholders(self):
         to_return = []
         for op in self._ops_by_name.values():
@@ -63,38 +84,76 @@ class Graph(SubgraphOp):
                   propagation process
         '''
         # Topologically traverse from sources to sinks. This can be a
-        # flattened topological traversal from all sources to all sinks
-        value_to_symbol_table = {}
-        symbol_to_value_table = {}
-        for op in self.getTopologicalOpOrder():
-            if verbose:
-                print('Before prop: {}'.format(op.debugString()))
-            op.propagateShapes(make_symbolic=make_symbolic)
-            if verbose:
-                print('After prop: {}'.format(op.debugString()))
-
-            if warn_if_ill_defined:
-                # Check all op outputs to see if there are ill-defined
-                # output shapes and warn if so:
-                if op.outputShapeIllDefined():
-                    print('WARN: Op out shape ill-defined: {} {}'
-                          .format(op.name, op))
-            for out_tensor in op.outputs:
-                if out_tensor.shape.dims is None:
-                    continue
-                for dim in out_tensor.shape.dims:
-                    if dim._value is not None and dim._symbol is not None:
-                        if dim._value not in value_to_symbol_table:
-                            value_to_symbol_table[dim._value] = set()
-                        value_to_symbol_table[dim._value].add(dim._symbol)
-                        if dim._symbol not in symbol_to_value_table:
-                            symbol_to_value_table[dim._symbol] = set()
-                        symbol_to_value_table[dim._symbol].add(dim._value)
+        # flattened topological traversal from all sources to all sinks.
+        # Dimension symbols get registered in this graph's symbol registry
+        utils.setActiveSymbolRegistry(self._symbol_registry)
+        # While propagating, collect equalities between dimension symbols
+        # into the graph's symbol equivalence table. Only this propagation's
+        # equalities hold for the current shapes, so start a fresh table.
+        self._symbol_equivalences = utils.SymbolEquivalenceTable()
+        prev_table = utils.setActiveEquivalenceTable(
+                         self._symbol_equivalences)
+        try:
+            for op in self.getTopologicalOpOrder():
+                if verbose:
+                    print('Before prop: {}'.format(op.debugString()))
+                op.propagateShapes(make_symbolic=make_symbolic)
+                if verbose:
+                    print('After prop: {}'.format(op.debugString()))
+
+                if warn_if_ill_defined:
+                    # Check all op outputs to see if there are ill-defined
+                    # output shapes and warn if so:
+                    if op.outputShapeIllDefined():
+                        print('WARN: Op out shape ill-defined: {} {}'
+                              .format(op.name, op))
+        finally:
+            utils.setActiveEquivalenceTable(prev_table)
+        self.canonicalizeTensorSymbols()
         if verbose:
             print('Propagate Tensor Shape Symbols Complete')
-            print('  Value to symbol table: {}'.format(value_to_symbol_table))
-            print('  Symbol to value table: {}'.format(symbol_to_value_table))
+            print('  Symbol equivalence classes: {}'
+                  .format(self._symbol_equivalences.getClasses()))
+
+    @property
+    def symbolEquivalences(self):
+        return self._symbol_equivalences
 
+    def canonicalizeSymbols(self, expr):
+        ''' Replace symbols in expr with the canonical representatives of
+            their equivalence classes (as found during shape propagation).
+        '''
+        return self._symbol_equivalences.canonicalize(expr)
+
+    def canonicalizeTensorSymbols(self):
+        ''' Substitute canonical symbol representatives into all tensor
+            shapes and symbolic tensor values in the graph, so that costs
+            calculated from the shapes use as few distinct symbols as
+            possible. Only automatically named dimension symbols are
+            substituted (see SymbolEquivalenceTable).
+
+            Returns:
+              The dictionary of symbol -> canonical symbol substitutions
+        '''
+        subs = self._symbol_equivalences.getSubstitutions()
+        if len(subs) == 0:
+            return subs
+        canonicalize = self._symbol_equivalences.canonicalize
+        for op in self._ops_by_name.values():
+            if isinstance(op, SubgraphOp):
+                continue
+            for out_tensor in op.outputs:
+                if out_tensor.shape.dims is not None:
+                    for dim in out_tensor.shape.dims:
+                        dim._symbol = canonicalize(dim._symbol, subs)
+                value = out_tensor.value
+                if isinstance(value, sympy.Expr):
+                    out_tensor._value = canonicalize(value, subs)
+                elif isinstance(value, np.ndarray) and value.dtype == object:
+                    out_tensor._value = np.vectorize(
+                        lambda val: canonicalize(val, subs),
+                        otypes=[object])(value)
+        return subs
 
     def bindTensorShapeDimensions(self, bind_dict, warn_if_ill_defined=False,
                                   make_symbolic=False):
@@ -127,6 +186,144 @@ class Graph(SubgraphOp):
         self.propagateTensorShapeNames(warn_if_ill_defined,
                                        make_symbolic=make_symbolic)
 
+    def calcAlgFlops(self, feed_dict=None, fetches_dict=None,
+                     verbose=False, num_workers=None):
+        ''' Calculate the algorithmic Flops for the compute graph. If
+            num_workers > 1, partition the graph and calculate partial
+            Flops in parallel worker processes.
+        '''
+        if num_workers is None or num_workers <= 1:
+            return super(Graph, self).calcAlgFlops(feed_dict, fetches_dict,
+                                                   verbose)
+        return self.calcShardedCosts(['calcAlgFlops'], num_workers,
+                                     feed_dict=feed_dict,
+                                     fetches_dict=fetches_dict,
+                                     verbose=verbose)['calcAlgFlops']
+
+    def calcAlgBytes(self, feed_dict=None, fetches_dict=None,
+                     verbose=False, num_workers=None):
+        ''' Calculate the algorithmic memory bytes accessed for the compute
+            graph. If num_workers > 1, partition the graph and calculate
+            partial bytes in parallel worker processes.
+        '''
+        if num_workers is None or num_workers <= 1:
+            return super(Graph, self).calcAlgBytes(feed_dict, fetches_dict,
+                                                   verbose)
+        return self.calcShardedCosts(['calcAlgBytes'], num_workers,
+                                     feed_dict=feed_dict,
+                                     fetches_dict=fetches_dict,
+                                     verbose=verbose)['calcAlgBytes']
+
+    def calcAlgFootprint(self, feed_dict=None, fetches_dict=None,
+                         verbose=False, num_workers=None):
+        ''' Calculate the algorithmic memory footprint for the compute
+            graph. If num_workers > 1, partition the graph and calculate
+            partial footprints in parallel worker processes.
+        '''
+        if num_workers is None or num_workers <= 1:
+            return super(Graph, self).calcAlgFootprint(feed_dict,
+                                                       fetches_dict, verbose)
+        return self.calcShardedCosts(['calcAlgFootprint'], num_workers,
+                                     feed_dict=feed_dict,
+                                     fetches_dict=fetches_dict,
+                                     verbose=verbose)['calcAlgFootprint']
+
+    def calcShardedCosts(self, cost_funcs, num_workers, num_shards=None,
+                         feed_dict=None, fetches_dict=None, verbose=False):
+        ''' Calculate multiple graph costs in one pass over a process pool.
+            The topological op order is partitioned into shards (keeping
+            ControlBlockOps whole), and each worker calculates the costs of
+            its shards' ops from detached copies of the ops.
+
+            Args:
+              cost_funcs: List of op cost function names (e.g.,
+                  ['calcAlgFlops', 'calcAlgBytes'])
+              num_workers (int): The number of worker processes
+              num_shards (int): Number of shards (default: num_workers)
+              feed_dict: Feeds for the topological op order
+              fetches_dict: Fetches for the topological op order
+              verbose (bool): Whether to print each top-level op's costs
+
+            Returns:
+              A dictionary of cost function name -> total cost
+        '''
+        return calc_sharded_costs(self, cost_funcs, num_workers,
+                                  num_shards=num_shards, feed_dict=feed_dict,
+                                  fetches_dict=fetches_dict, verbose=verbose)
+
+    def freeze(self):
+        ''' Return an immutable, array-backed FrozenGraph snapshot of this
+            graph's ops, edges, and cost coefficient tables. FrozenGraphs can
+            be exported to shared memory for parallel analysis workers.
+        '''
+        return FrozenGraph.fromGraph(self)
+
+    def symbolizeDimensionsByValue(self, base_values, verbose=False,
+                                   **kwargs):
+        ''' Rewrite static tensor dimensions and integer constant values to
+            symbolic expressions of hyperparameter symbols by matching their
+            values to combinations of the symbols' base values. Call before
+            binding and propagating tensor shapes. See
+            catamount.graph.symbolize for details and options.
+
+            Args:
+              base_values: A dictionary of symbol -> base integer value that
+                  the graph was constructed with (e.g., {hidden_dim: 2004})
+              verbose (bool): Whether to print each rewrite
+
+            Returns:
+              A dictionary of tensor name -> list of (old, new) rewrites
+        '''
+        return symbolize_dimensions_by_value(self, base_values,
+                                             verbose=verbose, **kwargs)
+
+    def bindLoopIterations(self, overrides=None, verbose=False):
+        ''' Bind the iterations of each while loop to its trip count, which
+            is inferred by tracing the loop condition to a loop counter and
+            bound (e.g., a sequence length). Call after binding and
+            propagating tensor shapes. See catamount.graph.loops for details.
+
+            Args:
+              overrides: A dictionary of loop block name (or '::iters'
+                  symbol name) -> iterations to use instead of inferring
+              verbose (bool): Whether to print loops that are not inferred
+
+            Returns:
+              A dictionary of loop block name -> bound iterations (or None)
+        '''
+        # Trip counts are compared using this graph's symbol ranges
+        utils.setActiveSymbolRegistry(self._symbol_registry)
+        return bind_loop_iters(self, overrides=overrides, verbose=verbose)
+
+    def getDevices(self, default_device=None):
+        ''' Return the sorted names of the devices the graph's ops are placed
+            on. Unplaced ops are on default_device (or 'unplaced').
+        '''
+        return get_devices(self, default_device=default_device)
+
+    def calcDeviceCosts(self, default_device=None):
+        ''' Aggregate the graph's algorithmic Flops, bytes, footprint, and
+            parameters by op device placement. See
+            catamount.graph.placement for details.
+
+            Args:
+              default_device: The device of unplaced ops (default:
+                  'unplaced')
+
+            Returns:
+              A dictionary of device -> dictionary of metric -> cost
+        '''
+        return calc_device_costs(self, default_device=default_device)
+
+    def calcDeviceTransferBytes(self, default_device=None):
+        ''' Calculate the bytes of tensors sent between devices (implicit
+            Send/Recv pairs for edges that cross device placements).
+
+            Returns:
+              A dictionary of (source device, destination device) -> bytes
+        '''
+        return calc_transfer_bytes(self, default_device=default_device)
+
 
 # The Catamount default graph is used throughout the API
 _catamount_default_graph = Graph()
@@ -0,0 +1,427 @@
+import numpy as np
+import pickle
+import sympy
+
+from multiprocessing import shared_memory
+
+from catamount.ops.ctrl_ops import ControlBlockOp, EnterOp, ExitOp, \
+                                   LoopConditionOp
+from catamount.ops.subgraph_op import SubgraphOp
+
+
+# The cost tables held by a frozen graph. The 'flops', 'bytes', and
+# 'footprint' tables have one row per op, and the 'tensor_size' table has
+# one row per tensor
+COST_TABLES = ['flops', 'bytes', 'footprint', 'tensor_size']
+
+# Byte alignment of arrays packed into a shared memory block
+_ARRAY_ALIGNMENT = 64
+
+
+def get_loop_iters(op):
+    if isinstance(op, ControlBlockOp) and \
+       isinstance(op._root_op, LoopConditionOp):
+        return op.getLoopIters()
+    return 1
+
+def get_op_loop_multipliers(op):
+    ''' Return the multipliers for the op's (Flops, bytes/footprint) when
+        its costs are counted from the top level graph. Ops in loops execute
+        once per iteration of each enclosing loop, except that EnterOps and
+        ExitOps access their bytes only once for their immediate loop.
+    '''
+    flops_mult = 1
+    bytes_mult = 1
+    parent = op.parent
+    first_parent = True
+    while parent is not None:
+        loop_iters = get_loop_iters(parent)
+        flops_mult *= loop_iters
+        if not first_parent or not isinstance(op, (EnterOp, ExitOp)):
+            bytes_mult *= loop_iters
+        first_parent = False
+        parent = parent.parent
+    return flops_mult, bytes_mult
+
+def _split_polynomial_terms(expr, symbol_index):
+    ''' Split an expression into a list of (coefficient, {symbol index:
+        exponent}) polynomial terms. Returns None if the expression is not a
+        polynomial in the symbols (e.g., it contains floor or Max).
+    '''
+    terms = []
+    expr = sympy.expand(expr)
+    for term in sympy.Add.make_args(expr):
+        coeff, factors = term.as_coeff_mul()
+        if not coeff.is_Number:
+            return None
+        exps = {}
+        for factor in factors:
+            base, exp = factor.as_base_exp()
+            if not isinstance(base, sympy.Symbol) or not exp.is_Integer or \
+               exp < 0:
+                return None
+            sym_idx = symbol_index[base.name]
+            exps[sym_idx] = exps.get(sym_idx, 0) + int(exp)
+        terms.append((float(coeff), exps))
+    return terms
+
+
+class FrozenGraph:
+    ''' An immutable, array-backed snapshot of a Catamount graph for fast,
+        vectorized cost evaluation. The snapshot holds:
+          - Op and tensor tables (names, types, parents, producers)
+          - CSR (compressed sparse row) edge arrays: op -> input tensors,
+            op -> output tensors, and op -> consumer ops
+          - Polynomial coefficient tables for each op's Flops, bytes, and
+            footprint (including enclosing loop iteration multipliers), and
+            for each tensor's size, over a list of symbols
+
+        Each cost table is stored as CSR term arrays: '{table}_indptr' maps
+        rows to their terms, '{table}_coeffs' holds term coefficients, and
+        '{table}_exps' holds the [num_terms, num_symbols] exponent matrix.
+        Expressions that are not polynomials in the symbols are kept as
+        sympy expressions in per-table residuals.
+
+        FrozenGraphs can be exported into shared memory (toSharedMemory), so
+        that analysis workers can attach to a single copy of the graph.
+    '''
+    def __init__(self, arrays, metadata):
+        self._arrays = arrays
+        self._metadata = metadata
+        self._symbols = None
+        self._residual_exprs = {}
+
+    @staticmethod
+    def fromGraph(graph):
+        ''' Freeze the graph's ops, tensors, and costs into arrays.
+        '''
+        ops = [graph._ops_by_name[name]
+               for name in sorted(graph._ops_by_name.keys())]
+        op_index = {op.name: idx for idx, op in enumerate(ops)}
+        tensors = []
+        tensor_index = {}
+        for op in ops:
+            if isinstance(op, SubgraphOp):
+                continue
+            for tensor in op.inputs + op.outputs:
+                if tensor.name not in tensor_index:
+                    tensor_index[tensor.name] = len(tensors)
+                    tensors.append(tensor)
+
+        # Collect the cost expressions for each table
+        exprs = {table: [] for table in COST_TABLES}
+        for op in ops:
+            if isinstance(op, SubgraphOp):
+                # Subgraph costs are the sums of their children's costs
+                for table in ['flops', 'bytes', 'footprint']:
+                    exprs[table].append(0)
+                continue
+            flops_mult, bytes_mult = get_op_loop_multipliers(op)
+            exprs['flops'].append(flops_mult * op.calcAlgFlops())
+            exprs['bytes'].append(bytes_mult * op.calcAlgBytes())
+            exprs['footprint'].append(bytes_mult * op.calcAlgFootprint())
+        for tensor in tensors:
+            exprs['tensor_size'].append(tensor.size)
+
+        symbol_set = set()
+        for table in COST_TABLES:
+            for expr in exprs[table]:
+                if isinstance(expr, sympy.Expr):
+                    symbol_set.update(expr.free_symbols)
+        symbols = sorted(symbol_set, key=lambda sym: sym.name)
+        symbol_index = {sym.name: idx for idx, sym in enumerate(symbols)}
+
+        arrays = {}
+        metadata = {
+            'op_names': [op.name for op in ops],
+            'op_types': [type(op).__name__ for op in ops],
+            'tensor_names': [tensor.name for tensor in tensors],
+            'symbols': [sympy.srepr(sym) for sym in symbols],
+            'residuals': {},
+        }
+
+        # Op and tensor tables
+        arrays['op_parent'] = np.array(
+            [op_index.get(op.parent.name, -1)
+             if op.parent is not None and op.parent is not graph else -1
+             for op in ops], dtype=np.int32)
+        arrays['op_is_subgraph'] = np.array(
+            [isinstance(op, SubgraphOp) for op in ops], dtype=np.bool_)
+        arrays['tensor_producer'] = np.array(
+            [op_index.get(tensor.producer.name, -1)
+             if tensor.producer is not None else -1
+             for tensor in tensors], dtype=np.int32)
+
+        # CSR edge arrays
+        def build_csr(prefix, rows):
+            indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum([len(row) for row in rows])
+            indices = [idx for row in rows for idx in row]
+            arrays['{}_indptr'.format(prefix)] = indptr
+            arrays['{}_indices'.format(prefix)] = \
+                np.array(indices, dtype=np.int32)
+
+        in_rows = []
+        out_rows = []
+        succ_rows = []
+        for op in ops:
+            if isinstance(op, SubgraphOp):
+                in_rows.append([])
+                out_rows.append([])
+                succ_rows.append([])
+                continue
+            in_rows.append([tensor_index[tensor.name]
+                            for tensor in op.inputs])
+            out_rows.append([tensor_index[tensor.name]
+                             for tensor in op.outputs])
+            succs = set()
+            for tensor in op.outputs:
+                for consumer in tensor.consumers.values():
+                    if consumer.name in op_index:
+                        succs.add(op_index[consumer.name])
+            succ_rows.append(sorted(succs))
+        build_csr('op_inputs', in_rows)
+        build_csr('op_outputs', out_rows)
+        build_csr('op_succs', succ_rows)
+
+        # Polynomial cost tables
+        for table in COST_TABLES:
+            indptr = np.zeros(len(exprs[table]) + 1, dtype=np.int64)
+            coeffs = []
+            exps = []
+            residuals = {}
+            for row, expr in enumerate(exprs[table]):
+                terms = None
+                if isinstance(expr, sympy.Expr):
+                    terms = _split_polynomial_terms(expr, symbol_index)
+                elif expr != 0:
+                    terms = [(float(expr), {})]
+                else:
+                    terms = []
+                if terms is None:
+                    residuals[row] = sympy.srepr(expr)
+                    terms = []
+                for coeff, term_exps in terms:
+                    coeffs.append(coeff)
+                    exp_row = np.zeros(len(symbols), dtype=np.int16)
+                    for sym_idx, exp in term_exps.items():
+                        exp_row[sym_idx] = exp
+                    exps.append(exp_row)
+                indptr[row + 1] = len(coeffs)
+            arrays['{}_indptr'.format(table)] = indptr
+            arrays['{}_coeffs'.format(table)] = \
+                np.array(coeffs, dtype=np.float64)
+            if len(exps) > 0:
+                arrays['{}_exps'.format(table)] = np.stack(exps)
+            else:
+                arrays['{}_exps'.format(table)] = \
+                    np.zeros((0, len(symbols)), dtype=np.int16)
+            metadata['residuals'][table] = residuals
+        return FrozenGraph(arrays, metadata)
+
+    @property
+    def arrays(self):
+        return self._arrays
+
+    @property
+    def opNames(self):
+        return self._metadata['op_names']
+
+    @property
+    def opTypes(self):
+        return self._metadata['op_types']
+
+    @property
+    def tensorNames(self):
+        return self._metadata['tensor_names']
+
+    @property
+    def numOps(self):
+        return len(self._metadata['op_names'])
+
+    @property
+    def numTensors(self):
+        return len(self._metadata['tensor_names'])
+
+    @property
+    def symbols(self):
+        if self._symbols is None:
+            self._symbols = [sympy.sympify(sym_repr)
+                             for sym_repr in self._metadata['symbols']]
+        return self._symbols
+
+    def getSuccessors(self, op_idx):
+        ''' Return the indices of the ops that consume the op's outputs '''
+        indptr = self._arrays['op_succs_indptr']
+        return self._arrays['op_succs_indices'][indptr[op_idx]:
+                                                indptr[op_idx + 1]]
+
+    def _getResidualExprs(self, table):
+        if table not in self._residual_exprs:
+            residuals = self._metadata['residuals'][table]
+            self._residual_exprs[table] = \
+                { row: sympy.sympify(expr_repr)
+                  for row, expr_repr in residuals.items() }
+        return self._residual_exprs[table]
+
+    def _getSymbolValues(self, bindings):
+        ''' Return a [num_symbols, num_bindings] array of symbol values and
+            the number of bindings. Bindings map symbols or symbol names to
+            scalars or 1D arrays (all arrays must have the same length).
+        '''
+        named_bindings = {}
+        for key, value in bindings.items():
+            name = key.name if isinstance(key, sympy.Symbol) else key
+            named_bindings[name] = np.atleast_1d(
+                np.asarray(value, dtype=np.float64))
+        num_bindings = max([len(value) for value in named_bindings.values()],
+                           default=1)
+        sym_vals = np.zeros((len(self._metadata['symbols']), num_bindings))
+        for idx, sym in enumerate(self.symbols):
+            if sym.name not in named_bindings:
+                raise KeyError('Missing binding for symbol {}'
+                               .format(sym.name))
+            sym_vals[idx] = np.broadcast_to(named_bindings[sym.name],
+                                            (num_bindings,))
+        return sym_vals, num_bindings
+
+    def evaluate(self, table, bindings, per_row=False):
+        ''' Evaluate a cost table for the symbol bindings.
+
+            Args:
+              table: The cost table name (e.g., 'flops', 'bytes')
+              bindings: A dictionary of symbol (or name) -> value or array
+                  of values to evaluate the table over
+              per_row: Whether to return the costs of each row (op or
+                  tensor) rather than the total
+
+            Returns:
+              An array of shape [num_bindings] (total) or [num_rows,
+              num_bindings] (per_row)
+        '''
+        assert table in COST_TABLES, 'Unknown cost table: {}'.format(table)
+        sym_vals, num_bindings = self._getSymbolValues(bindings)
+        indptr = self._arrays['{}_indptr'.format(table)]
+        coeffs = self._arrays['{}_coeffs'.format(table)]
+        exps = self._arrays['{}_exps'.format(table)]
+        num_rows = len(indptr) - 1
+
+        term_vals = np.repeat(coeffs[:, None], num_bindings, axis=1)
+        for sym_idx in range(exps.shape[1]):
+            sym_exps = exps[:, sym_idx]
+            mask = sym_exps > 0
+            if np.any(mask):
+                term_vals[mask] *= sym_vals[sym_idx][None, :] ** \
+                                   sym_exps[mask][:, None]
+        residuals = self._getResidualExprs(table)
+        if not per_row:
+            total = term_vals.sum(axis=0)
+            for expr in residuals.values():
+                total += self._evaluateExpr(expr, sym_vals, num_bindings)
+            return total
+        row_ids = np.repeat(np.arange(num_rows), np.diff(indptr))
+        row_vals = np.zeros((num_rows, num_bindings))
+        np.add.at(row_vals, row_ids, term_vals)
+        for row, expr in residuals.items():
+            row_vals[row] += self._evaluateExpr(expr, sym_vals, num_bindings)
+        return row_vals
+
+    def _evaluateExpr(self, expr, sym_vals, num_bindings):
+        free_syms = sorted(expr.free_symbols, key=lambda sym: sym.name)
+        sym_index = {sym.name: idx for idx, sym in enumerate(self.symbols)}
+        func = sympy.lambdify(free_syms, expr, modules='numpy')
+        args = [sym_vals[sym_index[sym.name]] for sym in free_syms]
+        return np.broadcast_to(np.asarray(func(*args), dtype=np.float64),
+                               (num_bindings,))
+
+    def toSharedMemory(self, name=None):
+        ''' Export the frozen graph into a single shared memory block.
+
+            Returns:
+              A SharedFrozenGraph handle that can be passed (pickled) to
+              worker processes, which call attach() to get a read-only view.
+              The creating process must call unlink() when done.
+        '''
+        meta_bytes = np.frombuffer(
+            pickle.dumps(self._metadata, protocol=pickle.HIGHEST_PROTOCOL),
+            dtype=np.uint8)
+        layout = {}
+        offset = 0
+        all_arrays = dict(self._arrays)
+        all_arrays['__metadata__'] = meta_bytes
+        for array_name, array in all_arrays.items():
+            offset = -(-offset // _ARRAY_ALIGNMENT) * _ARRAY_ALIGNMENT
+            layout[array_name] = (offset, array.dtype.str, array.shape)
+            offset += array.nbytes
+        shm = shared_memory.SharedMemory(name=name, create=True,
+                                         size=max(offset, 1))
+        for array_name, array in all_arrays.items():
+            arr_offset, dtype, shape = layout[array_name]
+            view = np.ndarray(shape, dtype=dtype, buffer=shm.buf,
+                              offset=arr_offset)
+            view[...] = array
+            del view
+        return SharedFrozenGraph(shm, layout)
+
+
+class SharedFrozenGraph:
+    ''' A small, picklable handle to a FrozenGraph exported into shared
+        memory. Pickling the handle only sends the shared memory block name
+        and the array layout, so workers do not copy the graph.
+    '''
+    def __init__(self, shm, layout):
+        self._shm = shm
+        self._name = shm.name
+        self._layout = layout
+
+    def __getstate__(self):
+        return {'_name': self._name, '_layout': self._layout}
+
+    def __setstate__(self, state):
+        self._shm = None
+        self._name = state['_name']
+        self._layout = state['_layout']
+
+    @property
+    def name(self):
+        return self._name
+
+    def attach(self):
+        ''' Attach to the shared memory block and return a FrozenGraph
+            whose arrays are read-only views into the block.
+        '''
+        if self._shm is None:
+            try:
+                # Attaching processes should not manage the block lifetime
+                self._shm = shared_memory.SharedMemory(name=self._name,
+                                                       track=False)
+            except TypeError:
+                self._shm = shared_memory.SharedMemory(name=self._name)
+        arrays = {}
+        metadata = None
+        for array_name, (offset, dtype, shape) in self._layout.items():
+            view = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf,
+                              offset=offset)
+            view.flags.writeable = False
+            if array_name == '__metadata__':
+                metadata = pickle.loads(view.tobytes())
+            else:
+                arrays[array_name] = view
+        return FrozenGraph(arrays, metadata)
+
+    def close(self):
+        ''' Detach this process from the shared memory block. All
+            FrozenGraphs returned by attach() must be released first.
+        '''
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        ''' Free the shared memory block (call once, from the creator). '''
+        shm = self._shm
+        if shm is None:
+            shm = shared_memory.SharedMemory(name=self._name)
+        shm.close()
+        shm.unlink()
+        self._shm = None
@@ -0,0 +1,268 @@
+import numpy as np
+import sympy
+
+from catamount.api import utils
+from catamount.ops.ctrl_ops import ControlBlockOp, EnterOp, ExitOp, \
+                                   LoopConditionOp, MergeOp, \
+                                   NextIterationOp, SwitchOp
+from catamount.ops.init_ops import IdentityOp
+from catamount.ops.math_ops import AddOp, GreaterEqualOp, GreaterOp, \
+                                   LessEqualOp, LessOp, LogicalAndOp, \
+                                   MaximumOp, MinimumOp, SubOp
+from catamount.ops.tensor_array_ops import TensorArrayOp
+from catamount.ops.unknown_op import UnknownOp
+
+
+# Ops that forward their (first) input tensor value
+_FORWARDING_OPS = (EnterOp, IdentityOp, SwitchOp)
+# Comparison op type -> the equivalent type with swapped operands
+_SWAPPED_COMPARISONS = {LessOp: GreaterOp, GreaterOp: LessOp,
+                        LessEqualOp: GreaterEqualOp,
+                        GreaterEqualOp: LessEqualOp}
+# TF op types (see UnknownOp.opType) that return a TensorArray's size
+TENSOR_ARRAY_SIZE_OP_TYPES = ['TensorArraySize', 'TensorArraySizeV2',
+                              'TensorArraySizeV3']
+
+
+def _as_scalar(value):
+    ''' Return the value as a sympy scalar, or None if it is not a scalar.
+    '''
+    if isinstance(value, np.ndarray):
+        if value.size != 1:
+            return None
+        value = value.item()
+    elif isinstance(value, (list, tuple)):
+        if len(value) != 1:
+            return None
+        value = value[0]
+    try:
+        return sympy.sympify(value)
+    except (sympy.SympifyError, TypeError):
+        return None
+
+def _get_forwarded_producer(tensor):
+    ''' Return the producer of the tensor, skipping ops that forward their
+        input tensors (e.g., EnterOps and IdentityOps).
+    '''
+    producer = tensor.producer
+    while isinstance(producer, _FORWARDING_OPS):
+        producer = producer.inputs[0].producer
+    return producer
+
+def _get_counter(merge_op, loop_iters):
+    ''' If the MergeOp is a loop counter, initialized by an EnterOp and
+        updated by adding or subtracting a scalar, return (initial value,
+        step). Otherwise, return None.
+    '''
+    if not isinstance(merge_op, MergeOp) or len(merge_op.inputs) != 2:
+        return None
+    init = None
+    update_op = None
+    for in_tensor in merge_op.inputs:
+        producer = in_tensor.producer
+        if isinstance(producer, NextIterationOp):
+            update_op = producer.inputs[0].producer
+        else:
+            init = _trace_value(in_tensor, loop_iters)
+    if init is None or not isinstance(update_op, (AddOp, SubOp)):
+        return None
+    step = None
+    for idx, in_tensor in enumerate(update_op.inputs):
+        if _get_forwarded_producer(in_tensor) is merge_op:
+            other = update_op.inputs[1 - idx]
+            step = _trace_value(other, loop_iters)
+            if isinstance(update_op, SubOp):
+                if idx != 0 or step is None:
+                    return None
+                step = -step
+    if step is None or step == 0:
+        return None
+    return init, step
+
+def _trace_value(tensor, loop_iters):
+    ''' Return the scalar value of the tensor as an expression, tracing
+        through forwarding ops, TensorArray sizes, simple arithmetic, and
+        loop counters that exit loops. Returns None if unknown.
+    '''
+    if tensor.value is not None:
+        return _as_scalar(tensor.value)
+    producer = tensor.producer
+    if isinstance(producer, _FORWARDING_OPS):
+        return _trace_value(producer.inputs[0], loop_iters)
+    if isinstance(producer, UnknownOp) and \
+       producer.opType in TENSOR_ARRAY_SIZE_OP_TYPES:
+        # The size of a TensorArray is the TensorArrayOp's size input
+        array_op = producer.inputs[0].producer
+        if isinstance(array_op, TensorArrayOp) and len(array_op.inputs) > 0:
+            return _trace_value(array_op.inputs[0], loop_iters)
+        return None
+    if isinstance(producer, ExitOp):
+        # A loop counter's value on exit: init + step * iterations
+        merge_op = _get_forwarded_producer(producer.inputs[0])
+        if merge_op is None:
+            return None
+        counter = _get_counter(merge_op, loop_iters)
+        if counter is None:
+            return None
+        init, step = counter
+        return init + step * _get_block_iters(merge_op.parent, loop_iters)
+    if isinstance(producer, (AddOp, SubOp, MaximumOp, MinimumOp)) and \
+       len(producer.inputs) == 2:
+        values = [_trace_value(in_tensor, loop_iters)
+                  for in_tensor in producer.inputs]
+        if any(value is None for value in values):
+            return None
+        if isinstance(producer, AddOp):
+            return values[0] + values[1]
+        if isinstance(producer, SubOp):
+            return values[0] - values[1]
+        if isinstance(producer, MaximumOp):
+            return sympy.Max(*values)
+        return sympy.Min(*values)
+    return None
+
+def _get_block_iters(block, loop_iters):
+    ''' Return the iterations of the block: The inferred trip count if
+        known, or else the block's loop iterations (e.g., '::iters' symbol).
+    '''
+    if not isinstance(block, ControlBlockOp):
+        return 1
+    if block.name not in loop_iters:
+        # Mark the block to avoid cycles through its own counters
+        loop_iters[block.name] = None
+        loop_iters[block.name] = _infer_block_iters(block, loop_iters)
+    if loop_iters[block.name] is not None:
+        return loop_iters[block.name]
+    return block.getLoopIters()
+
+def _calc_trip_count(predicate, loop_iters):
+    ''' Return the number of iterations for which the loop predicate
+        tensor is true, or None if unknown.
+    '''
+    producer = predicate.producer
+    if isinstance(producer, _FORWARDING_OPS):
+        return _calc_trip_count(producer.inputs[0], loop_iters)
+    if isinstance(producer, LogicalAndOp):
+        counts = [_calc_trip_count(in_tensor, loop_iters)
+                  for in_tensor in producer.inputs]
+        counts = [count for count in counts if count is not None]
+        if len(counts) == 0:
+            return None
+        return sympy.Min(*counts)
+    if not isinstance(producer, tuple(_SWAPPED_COMPARISONS.keys())) or \
+       len(producer.inputs) != 2:
+        return None
+    comparison = type(producer)
+    lhs, rhs = producer.inputs
+    counter = _get_counter(_get_forwarded_producer(lhs), loop_iters)
+    bound_tensor = rhs
+    if counter is None:
+        # The counter may be the right operand: bound < counter
+        counter = _get_counter(_get_forwarded_producer(rhs), loop_iters)
+        comparison = _SWAPPED_COMPARISONS[comparison]
+        bound_tensor = lhs
+    if counter is None:
+        return None
+    bound = _trace_value(bound_tensor, loop_iters)
+    if bound is None:
+        return None
+    init, step = counter
+    if comparison in (LessOp, LessEqualOp) and step.is_positive:
+        distance = bound - init
+    elif comparison in (GreaterOp, GreaterEqualOp) and step.is_negative:
+        distance = init - bound
+    else:
+        return None
+    if comparison in (LessOp, GreaterOp):
+        trip_count = sympy.ceiling(distance / abs(step))
+    else:
+        trip_count = sympy.floor(distance / abs(step)) + 1
+    if utils.symbolicDominates(distance, 0):
+        return trip_count
+    # Loops whose predicate may be initially false might never iterate
+    return sympy.Max(0, trip_count)
+
+def _infer_block_iters(block, loop_iters):
+    if not isinstance(block.rootOp, LoopConditionOp):
+        return None
+    return _calc_trip_count(block.rootOp.inputs[0], loop_iters)
+
+def get_loop_blocks(graph):
+    ''' Return the graph's loop ControlBlockOps, sorted by name.
+    '''
+    return sorted([op for op in graph.opsByName.values()
+                   if isinstance(op, ControlBlockOp) and
+                      isinstance(op.rootOp, LoopConditionOp)],
+                  key=lambda op: op.name)
+
+def infer_loop_iters(graph, overrides=None):
+    ''' Infer the trip count of each while loop in the graph by tracing its
+        LoopConditionOp input back through comparisons (LessOp, LessEqualOp,
+        GreaterOp, GreaterEqualOp with the counter as either operand, and
+        LogicalAndOp of comparisons) to a loop counter
+        (a MergeOp of an initial value and a NextIterationOp of the counter
+        plus or minus a step) and a bound: A tensor value (e.g., constant
+        or placeholder dimension propagated from shapes), a TensorArray
+        size, or the exit value of another loop's counter (e.g., gradient
+        loops count down the forward loop's iterations). Trip counts are
+        non-negative: Unless the graph's symbol ranges show that the
+        counter starts on the near side of the bound (see
+        utils.symbolicDominates), the count is clamped to Max(0, ...).
+
+        Args:
+          graph: The Catamount graph
+          overrides: A dictionary of loop block name -> known iterations,
+              which other loops' trip counts may depend on
+
+        Returns:
+          A dictionary of loop block name -> trip count expression, or None
+          if the trip count cannot be inferred
+    '''
+    loop_iters = dict(overrides) if overrides is not None else {}
+    for block in get_loop_blocks(graph):
+        _get_block_iters(block, loop_iters)
+    return {block.name: loop_iters[block.name]
+            for block in get_loop_blocks(graph)}
+
+def bind_loop_iters(graph, overrides=None, verbose=False):
+    ''' Bind the iterations of each while loop in the graph to its inferred
+        trip count (see infer_loop_iters), so that costs use the trip count
+        rather than the loop's '::iters' symbol. Loops whose trip counts
+        cannot be inferred are left untouched, keeping any iterations set
+        previously (e.g., with ControlBlockOp.setLoopIters).
+
+        Args:
+          graph: The Catamount graph
+          overrides: A dictionary of loop block name (or its '::iters'
+              symbol name) -> iterations that take priority over inferred
+              trip counts (e.g., for data-dependent loops)
+          verbose: Whether to print the loops that cannot be inferred
+
+        Returns:
+          A dictionary of loop block name -> bound iterations: The inferred
+          trip count or override, else the previously set iterations, or
+          None for loops that remain unbound
+    '''
+    if overrides is None:
+        overrides = {}
+    overrides = {name[:-len('::iters')] if name.endswith('::iters')
+                 else name: value for name, value in overrides.items()}
+    loop_names = set(block.name for block in get_loop_blocks(graph))
+    for name in overrides.keys():
+        if name not in loop_names:
+            raise ValueError('Unknown loop for iterations override: {}'
+                             .format(name))
+    inferred = infer_loop_iters(graph, overrides)
+    bound = {}
+    for block in get_loop_blocks(graph):
+        iters = inferred[block.name]
+        if iters is None:
+            if verbose:
+                print('WARN: Unable to infer iterations for loop {}'
+                      .format(block.name))
+            if block.isLoopItersBound():
+                iters = block.getLoopIters()
+        else:
+            block.setLoopIters(iters)
+        bound[block.name] = iters
+    return bound
@@ -0,0 +1,171 @@
+import copy
+import sympy
+
+from concurrent.futures import ProcessPoolExecutor
+
+from catamount.ops.subgraph_op import SubgraphOp
+from .frozen import get_op_loop_multipliers
+
+
+# Op cost functions that can be sharded -> label for verbose output
+SHARDED_COST_FUNCS = {
+    'calcAlgFlops': 'alg_flops',
+    'calcAlgBytes': 'alg_bytes',
+    'calcAlgFootprint': 'alg_foot',
+}
+
+
+def _op_weight(op):
+    # Estimate the work to calculate an op's costs by the number of ops it
+    # contains (for subgraphs) or 1 (for regular ops)
+    if isinstance(op, SubgraphOp):
+        return max(1, len(op.opsByName))
+    return 1
+
+def partition_op_order(ops, num_shards):
+    ''' Split a hierarchical topological op order into at most num_shards
+        contiguous shards of approximately equal weight. Subgraph ops (e.g.,
+        ControlBlockOps) are never split, because their costs are counted
+        as a whole (e.g., multiplied by loop iterations).
+
+        Returns:
+          A list of lists of ops
+    '''
+    assert num_shards >= 1
+    total_weight = sum(_op_weight(op) for op in ops)
+    shards = []
+    curr_shard = []
+    curr_weight = 0
+    weight_left = total_weight
+    for op in ops:
+        curr_shard.append(op)
+        curr_weight += _op_weight(op)
+        shards_left = num_shards - len(shards)
+        # Close the shard once it holds its share of the remaining weight
+        if shards_left > 1 and curr_weight * shards_left >= weight_left:
+            shards.append(curr_shard)
+            weight_left -= curr_weight
+            curr_shard = []
+            curr_weight = 0
+    if len(curr_shard) > 0:
+        shards.append(curr_shard)
+    return shards
+
+def _detach_tensor(tensor):
+    # Copy the tensor without its producer and consumers, so that pickling
+    # it does not pull in the rest of the graph
+    detached = copy.copy(tensor)
+    detached._producer = None
+    detached._consumers = {}
+    detached._shape = copy.copy(tensor.shape)
+    detached._shape._tensor = detached
+    return detached
+
+def detach_op(op):
+    ''' Return a copy of the (non-subgraph) op with detached copies of its
+        input and output tensors and no parent. The copy holds everything
+        its cost functions (e.g., calcAlgFlops) need, but no references to
+        other ops, so it pickles in constant depth.
+    '''
+    assert not isinstance(op, SubgraphOp), \
+        'Cannot detach subgraph op {}'.format(op.name)
+    detached = copy.copy(op)
+    detached._inputs = [_detach_tensor(tensor) for tensor in op.inputs]
+    detached._outputs = [_detach_tensor(tensor) for tensor in op.outputs]
+    detached._parent = None
+    return detached
+
+def _get_leaf_ops(op):
+    # The op itself, or a subgraph op's (nested) non-subgraph descendants
+    if not isinstance(op, SubgraphOp):
+        return [op]
+    leaf_ops = []
+    for child in op.opsByName.values():
+        leaf_ops.extend(_get_leaf_ops(child))
+    return leaf_ops
+
+def _calc_shard_costs(shard, cost_funcs, verbose=False):
+    ''' Worker function: Calculate the costs of a shard's ops for each of
+        the cost functions (e.g., 'calcAlgFlops') and sum them.
+
+        Args:
+          shard: A list of (top-level op name, list of (detached op, Flops
+              loop multiplier, bytes loop multiplier)). The detached ops of
+              a subgraph op are its descendant ops
+    '''
+    partials = {}
+    for cost_func in cost_funcs:
+        op_costs = []
+        for op_name, leaf_ops in shard:
+            op_cost = 0
+            for op, flops_mult, bytes_mult in leaf_ops:
+                mult = flops_mult if cost_func == 'calcAlgFlops' \
+                       else bytes_mult
+                op_cost += mult * getattr(op, cost_func)()
+            if verbose:
+                print('{} {}: {}'.format(SHARDED_COST_FUNCS[cost_func],
+                                         op_name, op_cost))
+            op_costs.append(op_cost)
+        partials[cost_func] = sum(op_costs)
+    return partials
+
+def calc_sharded_costs(graph, cost_funcs, num_workers, num_shards=None,
+                       feed_dict=None, fetches_dict=None, verbose=False):
+    ''' Calculate graph costs in parallel using a process pool. The graph's
+        hierarchical topological op order is partitioned into shards, and
+        each shard's ops are sent to the workers as detached copies (see
+        detach_op) with their loop iteration multipliers, rather than
+        pickling the whole graph. Workers calculate and sum the costs of
+        their shards' ops, and the partial sums are combined here.
+
+        Args:
+          graph: The graph to analyze
+          cost_funcs: List of op cost function names to evaluate (see
+              SHARDED_COST_FUNCS, e.g., ['calcAlgFlops', 'calcAlgBytes'])
+          num_workers (int): The number of worker processes
+          num_shards (int): The number of shards to partition the op order
+              into (default: num_workers)
+          feed_dict: Feeds for the topological op order, as for serial
+              cost calculations
+          fetches_dict: Fetches for the topological op order, as for
+              serial cost calculations
+          verbose (bool): Whether workers print each top-level op's costs
+
+        Returns:
+          A dictionary of cost function name -> total cost
+    '''
+    for cost_func in cost_funcs:
+        if cost_func not in SHARDED_COST_FUNCS:
+            raise ValueError('Cannot calculate sharded costs for {}: Choose '
+                             'from {}'.format(cost_func,
+                                              sorted(SHARDED_COST_FUNCS)))
+    if num_shards is None:
+        num_shards = num_workers
+    ops = graph.getTopologicalOpOrder(feed_dict=feed_dict,
+                                      fetches_dict=fetches_dict,
+                                      hierarchical=True)
+    shards = []
+    for shard_ops in partition_op_order(ops, num_shards):
+        shard = []
+        for op in shard_ops:
+            leaf_ops = [(detach_op(leaf_op),) +
+                        get_op_loop_multipliers(leaf_op)
+                        for leaf_op in _get_leaf_ops(op)]
+            shard.append((op.name, leaf_ops))
+        shards.append(shard)
+    partials = {cost_func: [] for cost_func in cost_funcs}
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(_calc_shard_costs, shard, cost_funcs,
+                                   verbose)
+                   for shard in shards]
+        for future in futures:
+            shard_partials = future.result()
+            for cost_func in cost_funcs:
+                partials[cost_func].append(shard_partials[cost_func])
+    totals = {}
+    for cost_func in cost_funcs:
+        total = sympy.Add(*partials[cost_func])
+        if total.is_Integer:
+            total = int(total)
+        totals[cost_func] = total
+    return totals
@@ -0,0 +1,142 @@
+from catamount.ops.subgraph_op import SubgraphOp
+from catamount.ops.variable import VariableOp
+from .frozen import get_op_loop_multipliers
+
+
+# Device of ops without a placement when no default device is specified
+UNPLACED_DEVICE = 'unplaced'
+DEVICE_COST_METRICS = ['flops', 'bytes', 'footprint', 'parameters']
+# Device string fields that precede the device type and index
+_DEVICE_SCOPE_FIELDS = ['job', 'replica', 'task']
+
+
+def canonicalize_device(device):
+    ''' Return the canonical form of a TF device string, so that equivalent
+        placements compare equal: Job, replica, and task fields (if any) in
+        order, then '/device:<TYPE>:<index>'. For example, '/gpu:1' and
+        '/device:GPU:1' both become '/device:GPU:1'. Returns None for empty
+        device strings.
+    '''
+    if device is None or device == '':
+        return None
+    fields = {}
+    for part in device.strip('/').split('/'):
+        if part == '':
+            continue
+        if part.startswith('device:'):
+            part = part[len('device:'):]
+        key, _, value = part.partition(':')
+        if key.lower() in _DEVICE_SCOPE_FIELDS:
+            fields[key.lower()] = value
+        else:
+            fields['device'] = key.upper() if value == '' else \
+                               '{}:{}'.format(key.upper(), value)
+    canonical = ''.join('/{}:{}'.format(field, fields[field])
+                        for field in _DEVICE_SCOPE_FIELDS if field in fields)
+    if 'device' in fields:
+        canonical += '/device:{}'.format(fields['device'])
+    return canonical
+
+def get_op_device(op, default_device=None):
+    ''' Return the op's device: Its own placement, or else the placement of
+        its closest placed parent (e.g., the ControlBlockOp of a loop,
+        which takes the placement of its loop condition op), or
+        else the default device (UNPLACED_DEVICE if None).
+    '''
+    while op is not None:
+        if op.device is not None:
+            return op.device
+        op = op.parent
+    if default_device is None:
+        return UNPLACED_DEVICE
+    return default_device
+
+def get_devices(graph, default_device=None):
+    ''' Return the sorted names of the devices that the graph's ops are
+        placed on.
+    '''
+    return sorted(set(get_op_device(op, default_device)
+                      for op in graph.opsByName.values()
+                      if not isinstance(op, SubgraphOp)))
+
+def calc_device_costs(graph, default_device=None):
+    ''' Aggregate the graph's algorithmic costs by device placement. Each
+        (non-subgraph) op's Flops, bytes, and footprint count toward its
+        device (see get_op_device), once per loop iteration, and variables'
+        parameters count toward their devices.
+
+        Args:
+          graph: The Catamount graph
+          default_device: The device of unplaced ops (default:
+              UNPLACED_DEVICE)
+
+        Returns:
+          A dictionary of device -> dictionary of metric (see
+          DEVICE_COST_METRICS) -> symbolic cost
+    '''
+    costs = {}
+    for op in graph.opsByName.values():
+        if isinstance(op, SubgraphOp):
+            continue
+        device = get_op_device(op, default_device)
+        if device not in costs:
+            costs[device] = {metric: 0 for metric in DEVICE_COST_METRICS}
+        flops_mult, bytes_mult = get_op_loop_multipliers(op)
+        costs[device]['flops'] += flops_mult * op.calcAlgFlops()
+        costs[device]['bytes'] += bytes_mult * op.calcAlgBytes()
+        costs[device]['footprint'] += bytes_mult * op.calcAlgFootprint()
+        if isinstance(op, VariableOp):
+            costs[device]['parameters'] += op.calcModelParameters()
+    return costs
+
+def get_device_transfers(graph, default_device=None):
+    ''' Find the tensors that cross devices. As TF does when it partitions
+        a placed graph, each tensor is sent once to each other device that
+        consumes it (an implicit Send/Recv pair). The receive executes with
+        the tensor's first consumer (by name) on the receiving device, so it
+        repeats per iteration of that consumer's loops.
+
+        Args:
+          graph: The Catamount graph
+          default_device: The device of unplaced ops (default:
+              UNPLACED_DEVICE)
+
+        Returns:
+          A list of (tensor, source device, destination device, receiving
+          op), sorted by tensor name and destination device
+    '''
+    transfers = []
+    for op in graph.opsByName.values():
+        if isinstance(op, SubgraphOp):
+            continue
+        src_device = get_op_device(op, default_device)
+        for out_tensor in op.outputs:
+            receivers = {}
+            for consumer in out_tensor.consumers.values():
+                if isinstance(consumer, SubgraphOp):
+                    continue
+                dst_device = get_op_device(consumer, default_device)
+                if dst_device == src_device:
+                    continue
+                if dst_device not in receivers or \
+                   consumer.name < receivers[dst_device].name:
+                    receivers[dst_device] = consumer
+            for dst_device, consumer in receivers.items():
+                transfers.append((out_tensor, src_device, dst_device,
+                                  consumer))
+    return sorted(transfers, key=lambda transfer: (transfer[0].name,
+                                                   transfer[2]))
+
+def calc_transfer_bytes(graph, default_device=None):
+    ''' Return a dictionary of (source device, destination device) ->
+        symbolic bytes transferred between the devices in one graph
+        execution (see get_device_transfers).
+    '''
+    transfer_bytes = {}
+    for tensor, src_device, dst_device, consumer in \
+        get_device_transfers(graph, default_device):
+        _, bytes_mult = get_op_loop_multipliers(consumer)
+        key = (src_device, dst_device)
+        transfer_bytes[key] = transfer_bytes.get(key, 0) + \
+                              bytes_mult * tensor.size
+    return transfer_bytes
@@ -0,0 +1,207 @@
+import itertools
+import numpy as np
+import sympy
+
+from catamount.ops.array_ops import FillOp, OneHotOp, ReshapeOp, SliceOp, \
+                                   TileOp
+from catamount.ops.constant import ConstantOp
+from catamount.ops.ctrl_ops import EnterOp
+from catamount.ops.init_ops import IdentityOp, RandomInitializerOp
+from catamount.ops.math_ops import RangeOp
+from catamount.ops.placeholder import PlaceholderOp
+from catamount.ops.tensor_array_ops import TensorArrayOp
+from catamount.ops.variable import VariableOp
+from catamount.tensors.tensor import DataType
+
+
+# Op type -> indices of inputs that hold shapes or sizes (rather than axes,
+# permutations, or indices), which may be symbolized by value
+SHAPE_INPUT_INDICES = {
+    FillOp: [0],
+    OneHotOp: [1],
+    RandomInitializerOp: [0],
+    RangeOp: [1],
+    ReshapeOp: [1],
+    SliceOp: [2],
+    TensorArrayOp: [0],
+    TileOp: [1],
+}
+# Ops that forward their input tensor unchanged to consumers
+_FORWARDING_OPS = (IdentityOp, EnterOp)
+
+
+class DimensionValueMatcher:
+    ''' Matches integer values to small polynomial combinations of
+        hyperparameter symbols, given the base values of the symbols. For
+        example, with base values {hidden_dim: 2004, vocab_size: 10004},
+        the value 8016 matches 4 * hidden_dim, and the value 20048008
+        matches hidden_dim * vocab_size.
+
+        Candidate expressions are single terms, c * m, where m is a monomial
+        of the symbols up to max_degree and c <= max_coefficient, or sums of
+        two such terms with coefficients up to max_sum_coefficient. When a
+        value matches multiple expressions, the simplest is chosen (fewest
+        terms, then smallest coefficients, then lowest degree). Values with
+        multiple equally simple matches are ambiguous and are not matched.
+    '''
+    def __init__(self, base_values, max_degree=2, max_coefficient=256,
+                 max_sum_coefficient=4, max_terms=2):
+        self._base_values = {}
+        for symbol, value in base_values.items():
+            assert isinstance(symbol, sympy.Symbol), \
+                'Base value keys must be symbols: {}'.format(symbol)
+            assert isinstance(value, int) and value > 1, \
+                'Base value for {} must be an int > 1: {}' \
+                .format(symbol, value)
+            self._base_values[symbol] = value
+        # Table of value -> (priority, expression or None if ambiguous)
+        self._table = {}
+
+        monomials = []
+        symbols = sorted(self._base_values.keys(), key=lambda sym: sym.name)
+        for degree in range(1, max_degree + 1):
+            for combo in itertools.combinations_with_replacement(symbols,
+                                                                 degree):
+                mono_expr = sympy.Mul(*combo)
+                mono_value = int(np.prod([self._base_values[sym]
+                                          for sym in combo], dtype=object))
+                monomials.append((mono_expr, mono_value, degree))
+
+        for mono_expr, mono_value, degree in monomials:
+            for coeff in range(1, max_coefficient + 1):
+                self._addCandidate(coeff * mono_value, coeff * mono_expr,
+                                   (1, coeff, degree))
+        if max_terms >= 2:
+            for (expr_0, value_0, deg_0), (expr_1, value_1, deg_1) in \
+                itertools.combinations(monomials, 2):
+                for coeff_0 in range(1, max_sum_coefficient + 1):
+                    for coeff_1 in range(1, max_sum_coefficient + 1):
+                        self._addCandidate(
+                            coeff_0 * value_0 + coeff_1 * value_1,
+                            coeff_0 * expr_0 + coeff_1 * expr_1,
+                            (2, coeff_0 + coeff_1, max(deg_0, deg_1)))
+
+    def _addCandidate(self, value, expr, priority):
+        if value not in self._table or priority < self._table[value][0]:
+            self._table[value] = (priority, expr)
+        elif priority == self._table[value][0] and \
+             self._table[value][1] != expr:
+            # Equally simple, different expressions: Ambiguous value
+            self._table[value] = (priority, None)
+
+    def match(self, value):
+        ''' Return the symbolic expression that matches value, or None if
+            no unambiguous match exists.
+        '''
+        if isinstance(value, (bool, np.bool_)):
+            return None
+        if not isinstance(value, (int, np.integer)) or value <= 1:
+            return None
+        entry = self._table.get(int(value), None)
+        if entry is None:
+            return None
+        return entry[1]
+
+
+def is_shape_tensor(tensor):
+    ''' Return whether the tensor is consumed as a shape or size (see
+        SHAPE_INPUT_INDICES), possibly through Identity or Enter ops.
+    '''
+    for consumer in tensor.consumers.values():
+        if isinstance(consumer, _FORWARDING_OPS):
+            if is_shape_tensor(consumer.outputs[0]):
+                return True
+            continue
+        for op_type, in_idxs in SHAPE_INPUT_INDICES.items():
+            if not isinstance(consumer, op_type):
+                continue
+            for in_idx in in_idxs:
+                if in_idx < len(consumer.inputs) and \
+                   consumer.inputs[in_idx] is tensor:
+                    return True
+    return False
+
+def symbolize_dimensions_by_value(graph, base_values,
+                                  op_types=(ConstantOp, PlaceholderOp,
+                                            VariableOp),
+                                  symbolize_values=True, min_value=16,
+                                  verbose=False, **matcher_kwargs):
+    ''' Rewrite static tensor dimensions and integer constant values in the
+        graph to symbolic expressions of hyperparameter symbols by matching
+        their values (see DimensionValueMatcher). This pass should run before
+        binding and propagating shapes, so the symbols propagate downstream.
+
+        Only constant values that are consumed as shapes or sizes (see
+        is_shape_tensor) are symbolized, so axes, permutations, and indices
+        keep their values. Tensors that hold values keep their static
+        shapes, so constant values are never dropped.
+
+        Args:
+          graph: The Catamount graph to rewrite
+          base_values: A dictionary of symbol -> base integer value that the
+              graph was constructed with (e.g., {hidden_dim: 2004})
+          op_types: Types of ops whose output tensor shapes to symbolize
+          symbolize_values: Whether to also symbolize the values of integer
+              ConstantOp output tensors (e.g., shape vectors, sizes)
+          min_value: The smallest value to symbolize. Smaller values are
+              more likely to coincidentally match hyperparameters
+          verbose: Whether to print each rewrite
+          matcher_kwargs: Arguments for constructing the value matcher
+
+        Returns:
+          A dictionary of tensor name -> list of (old, new) rewrites
+    '''
+    matcher = DimensionValueMatcher(base_values, **matcher_kwargs)
+    rewrites = {}
+
+    def match(value):
+        if isinstance(value, (int, np.integer)) and value < min_value:
+            return None
+        return matcher.match(value)
+
+    def addRewrite(tensor, old, new):
+        if verbose:
+            print('Symbolize {}: {} -> {}'.format(tensor.name, old, new))
+        rewrites.setdefault(tensor.name, []).append((old, new))
+
+    for op in graph.opsByName.values():
+        if not isinstance(op, op_types):
+            continue
+        for out_tensor in op.outputs:
+            # First, symbolize the tensor's static shape. Values must match
+            # their shapes, so tensors with values keep static shapes.
+            if out_tensor.shape.dims is not None and \
+               out_tensor.value is None:
+                for idx, dim in enumerate(out_tensor.shape.dims):
+                    if dim.value is None:
+                        continue
+                    expr = match(dim.value)
+                    if expr is not None:
+                        addRewrite(out_tensor, dim.value, expr)
+                        out_tensor.shape.setDimension(idx, expr,
+                                                      make_symbolic=True)
+
+            # Then, symbolize integer values used as shapes or sizes
+            if not symbolize_values or not isinstance(op, ConstantOp) or \
+               out_tensor.value is None or \
+               out_tensor.dtype not in (DataType.int32, DataType.int64) or \
+               not is_shape_tensor(out_tensor):
+                continue
+            value = out_tensor.value
+            if isinstance(value, np.ndarray):
+                new_value = value.astype(object)
+                value_changed = False
+                for idx, elt in np.ndenumerate(value):
+                    expr = match(elt)
+                    if expr is not None:
+                        addRewrite(out_tensor, int(elt), expr)
+                        new_value[idx] = expr
+                        value_changed = True
+                if value_changed:
+                    out_tensor.setValue(new_value)
+            else:
+                expr = match(value)
+                if expr is not None:
+                    addRewrite(out_tensor, value, expr)
+                    out_tensor.setValue(expr)
+    return rewrites
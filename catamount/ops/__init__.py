@@ -3,6 +3,7 @@ from .array_ops import *
 from .collective_ops import *
 from .constant import *
 from .ctrl_ops import *
+from .fused_op import *
 from .init_ops import *
 from .loss_ops import *
 from .math_ops import *
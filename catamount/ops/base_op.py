@@ -8,6 +8,7 @@ class Op:
         self._inputs = []
         self._outputs = []
         self._parent = None
+        self._device = None
 
     def debugString(self):
         to_return = 'In op {} of type {}:'.format(self._name, type(self))
@@ -52,6 +53,12 @@ class Op:
     def setParent(self, parent):
         self._parent = parent
 
+    def setDevice(self, device):
+        ''' Set the device on which the op executes (e.g., a canonical TF
+            device string, '/device:GPU:0'), or None if unplaced.
+        '''
+        self._device = device
+
     def addInput(self, tensor):
         assert(isinstance(tensor, Tensor))
         self._inputs.append(tensor)
@@ -104,6 +111,14 @@ class Op:
         self.notImplemented('Op calcAlgBytes not implemented! {}'
                             .format(type(self)))
 
+    def calcTiledBytes(self, cache_bytes, tile_strategy='square',
+                       line_bytes=64):
+        ''' Estimate the off-chip bytes accessed with a cache of
+            cache_bytes. Ops that can reuse data in cache (e.g., MatMulOp and
+            Conv2DOp) override this; others access their algorithmic bytes.
+        '''
+        return self.calcAlgBytes()
+
     def calcAlgFootprint(self):
         # NOTE: Maybe take argument for training vs. inference (to decide
         # whether or not to save activations, respectively)
@@ -139,6 +154,10 @@ class Op:
         '''
         return self._parent
 
+    @property
+    def device(self):
+        return self._device
+
     def outputShapeIllDefined(self):
         for out_tensor in self.outputs:
             if not out_tensor.shape.isFullySymbolic():
@@ -159,9 +178,12 @@ class Op:
 
     def calcMinimalFootprintSub(self, max_footprint, curr_footprint,
                                 tensors_to_consume, visited_ops,
-                                symbol_subs=None):
+                                symbol_subs=None, footprint_tracker=None):
         # print('  Traversing {}, starting foot {}, max foot {}'
         #       .format(self.name, curr_footprint, max_footprint))
+        # If specified, footprint_tracker follows the tensors that the
+        # traversal allocates and frees (e.g., to break down the footprint
+        # by tensor role; see analysis.roles.RoleFootprintTracker)
         if self.calcAlgFootprint() == 0:
             visited_ops.add(self)
             return max_footprint, curr_footprint
@@ -172,6 +194,8 @@ class Op:
             self.debugAssert(out_tensor not in tensors_to_consume.keys())
             tensors_to_consume[out_tensor] = out_tensor
             my_added_footprint += out_tensor.size
+            if footprint_tracker is not None:
+                footprint_tracker.allocate(out_tensor)
 
         # The maximum footprint grows if the current footprint plus the
         # additional footprint for this op exceed the maximum
@@ -181,6 +205,8 @@ class Op:
         max_footprint = utils.getSymbolicMaximum(my_curr_footprint,
                                                  max_footprint,
                                                  symbol_subs)
+        if footprint_tracker is not None:
+            footprint_tracker.observe()
 
         # Execute the op: This op has now been visited
         visited_ops.add(self)
@@ -195,6 +221,8 @@ class Op:
             if tensor_can_be_freed:
                 tensors_to_consume.pop(in_tensor, None)
                 my_curr_footprint -= in_tensor.size
+                if footprint_tracker is not None:
+                    footprint_tracker.free(in_tensor)
         if symbol_subs is not None and \
            isinstance(my_curr_footprint, sympy.Expr):
             my_curr_footprint = my_curr_footprint.subs(symbol_subs)
@@ -1,6 +1,5 @@
 from .base_op import Op
 from .subgraph_op import SubgraphOp
-from ..api import utils
 
 
 class ControlBlockOp(SubgraphOp):
@@ -16,6 +15,35 @@ class ControlBlockOp(SubgraphOp):
         # The op that controls the execution of the children ops and
         # designation of the type of the control block
         self._root_op = root_op
+        # The block executes on its control op's device (e.g., the TF
+        # LoopCondOp's placement), so unplaced children inherit it
+        self.setDevice(root_op.device)
+        # Bound loop iterations (e.g., inferred trip counts), or None to use
+        # the '<name>::iters' symbol
+        self._loop_iters = None
+
+    @property
+    def rootOp(self):
+        return self._root_op
+
+    def getLoopIters(self):
+        ''' Return the number of loop iterations: The bound value, or the
+            '<name>::iters' symbol if unbound.
+        '''
+        if self._loop_iters is not None:
+            return self._loop_iters
+        return super(ControlBlockOp, self).getLoopIters()
+
+    def setLoopIters(self, loop_iters):
+        ''' Bind the number of loop iterations to a value or expression
+            (e.g., a sequence length symbol), or None to unbind.
+        '''
+        self._loop_iters = loop_iters
+
+    def isLoopItersBound(self):
+        ''' Return whether the loop iterations are bound (see setLoopIters).
+        '''
+        return self._loop_iters is not None
 
     def calcAlgFlops(self):
         if not isinstance(self._root_op, LoopConditionOp):
@@ -23,8 +51,7 @@ class ControlBlockOp(SubgraphOp):
                 ' {} has unknown _root_op type {}'
                 .format(type(self), self.name, type(self._root_op)))
 
-        loop_iter_name = '{}::iters'.format(self.name)
-        loop_iters = utils.getIntSymbolFromString(loop_iter_name)
+        loop_iters = self.getLoopIters()
         return loop_iters * super(ControlBlockOp, self).calcAlgFlops()
 
     def calcAlgBytes(self):
@@ -51,10 +78,35 @@ class ControlBlockOp(SubgraphOp):
                 # print('Op: {}, alg_bytes: {}'.format(op.name, op_alg_bytes))
                 alg_bytes_one_iter += op_alg_bytes
 
-        loop_iter_name = '{}::iters'.format(self.name)
-        loop_iters = utils.getIntSymbolFromString(loop_iter_name)
+        loop_iters = self.getLoopIters()
         return loop_iters * alg_bytes_one_iter + enter_exit_op_bytes
 
+    def calcTiledBytes(self, cache_bytes, tile_strategy='square',
+                       line_bytes=64):
+        ''' Calculate the estimated off-chip memory bytes accessed with a
+        cache of cache_bytes (see Op.calcTiledBytes).
+        '''
+        if not isinstance(self._root_op, LoopConditionOp):
+            raise NotImplementedError(
+                ' {} has unknown _root_op type {}'
+                .format(type(self), self.name, type(self._root_op)))
+
+        ops_to_execute = self.getTopologicalOpOrder(hierarchical=True)
+        tiled_bytes_one_iter = 0
+        enter_exit_op_bytes = 0
+        for op in ops_to_execute:
+            assert op.parent == self, \
+                'Incorrect parent for op {}: {}'.format(op.name, op.parent)
+            op_tiled_bytes = op.calcTiledBytes(cache_bytes, tile_strategy,
+                                               line_bytes)
+            if isinstance(op, (EnterOp, ExitOp)):
+                enter_exit_op_bytes += op_tiled_bytes
+            else:
+                tiled_bytes_one_iter += op_tiled_bytes
+
+        loop_iters = self.getLoopIters()
+        return loop_iters * tiled_bytes_one_iter + enter_exit_op_bytes
+
     def calcAlgFootprint(self):
         ''' Calculate the algorithmic memory footprint to perform the compute
         graph computation.
@@ -79,8 +131,7 @@ class ControlBlockOp(SubgraphOp):
                 # print('Op: {}, alg_bytes: {}'.format(op.name, op_alg_bytes))
                 alg_foot_one_iter += op_alg_bytes
 
-        loop_iter_name = '{}::iters'.format(self.name)
-        loop_iters = utils.getIntSymbolFromString(loop_iter_name)
+        loop_iters = self.getLoopIters()
         return loop_iters * alg_foot_one_iter + enter_exit_op_foot
 
 
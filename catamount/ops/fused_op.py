@@ -0,0 +1,37 @@
+from .base_op import Op
+
+
+class FusedOp(Op):
+    ''' A group of producer-consumer ops that execute as one fused kernel.
+        Intermediate tensors between the fused ops stay on chip, so the
+        fused op only accesses its external inputs and outputs.
+
+        Args:
+          name: The name of the fused op
+          fused_op_names: The names of the ops that were fused, in order
+          flops: The total Flops of the fused ops
+    '''
+    def __init__(self, name, fused_op_names=None, flops=0):
+        super(FusedOp, self).__init__(name)
+        if fused_op_names is None:
+            fused_op_names = []
+        self._fused_op_names = list(fused_op_names)
+        self._flops = flops
+
+    @property
+    def fusedOpNames(self):
+        return self._fused_op_names
+
+    def propagateShapes(self, make_symbolic=False):
+        # Output shapes were resolved before the ops were fused
+        pass
+
+    def calcAlgFlops(self):
+        return self._flops
+
+    def calcAlgBytes(self):
+        return self.bytesAccessInput() + self.bytesAccessOutput()
+
+    def calcAlgFootprint(self):
+        # Return the size of the output tensors, which must be accessed
+        return self.bytesAccessOutput()
@@ -18,6 +18,64 @@ def as_int(value):
         raise TypeError('Unknown int type ({}) for value {}'
                         .format(type(value), value))
 
+# Tile strategies for the cache-aware (tiled) bytes model of GEMM-like ops:
+#   'square': Square tiles of the A, B, and C operands share the cache
+#   'output_stationary': A C tile fills the cache while A and B stream
+#       through as cache-line-wide slivers along the reduction dimension
+TILE_STRATEGIES = ['square', 'output_stationary']
+
+def calc_gemm_tile_size(cache_bytes, elt_size, tile_strategy='square'):
+    ''' Return the tile size (elements per side) of a blocked GEMM whose
+        working set fits in cache_bytes.
+    '''
+    if tile_strategy == 'square':
+        resident_tiles = 3
+    elif tile_strategy == 'output_stationary':
+        resident_tiles = 1
+    else:
+        raise ValueError('Unknown tile strategy: {} (available: {})'
+                         .format(tile_strategy, TILE_STRATEGIES))
+    return max(1, int(np.sqrt(cache_bytes / (resident_tiles * elt_size))))
+
+def calc_tiled_pass_bytes(rows, cols, elt_size, chunk, line_bytes):
+    ''' Return the off-chip bytes to read (or write) a rows x cols tensor
+        (cols contiguous in memory) once, in chunks of at most chunk
+        contiguous elements that each occupy whole cache lines.
+    '''
+    chunk_bytes = sympy.ceiling(sympy.Min(chunk, cols) * elt_size /
+                                line_bytes) * line_bytes
+    return rows * sympy.ceiling(cols / chunk) * chunk_bytes
+
+def calc_tiled_gemm_bytes(m_dim, n_dim, operands, cache_bytes,
+                          tile_strategy='square', line_bytes=64):
+    ''' Estimate the off-chip bytes of a blocked GEMM, C[M, N] = A[M, K] *
+        B[K, N], with a cache of cache_bytes: A is read once per column of
+        C tiles, B once per row of C tiles, and C is written once.
+
+        Args:
+          m_dim, n_dim: The output dimensions M and N
+          operands: A list of three tuples (rows, cols, elt_size,
+              reduction_contiguous) for the A, B, and C tensors as stored in
+              memory (cols contiguous), where reduction_contiguous
+              indicates whether the contiguous dimension is part of K
+          cache_bytes: The on-chip cache capacity (bytes)
+          tile_strategy: See TILE_STRATEGIES
+          line_bytes: The cache line size (bytes)
+    '''
+    elt_size = max(operand[2] for operand in operands)
+    tile = calc_gemm_tile_size(cache_bytes, elt_size, tile_strategy)
+    passes = [sympy.ceiling(n_dim / tile), sympy.ceiling(m_dim / tile), 1]
+    total_bytes = 0
+    for num_passes, (rows, cols, op_elt_size, reduction_contiguous) in \
+            zip(passes, operands):
+        chunk = tile
+        if tile_strategy == 'output_stationary' and reduction_contiguous:
+            chunk = max(1, line_bytes // op_elt_size)
+        total_bytes += num_passes * calc_tiled_pass_bytes(
+            rows, cols, op_elt_size, chunk, line_bytes)
+    return total_bytes
+
+
 class BasePointwiseOp(Op):
     def __init__(self, name):
         super(BasePointwiseOp, self).__init__(name)
@@ -199,6 +257,22 @@ class LessOp(BasePointwiseOp):
         self._outputs[0].setValue(out_val)
 
 
+class LessEqualOp(BasePointwiseOp):
+    def __init__(self, name):
+        super(LessEqualOp, self).__init__(name)
+
+    def propagateShapes(self, make_symbolic=False):
+        super(LessEqualOp, self).propagateShapes(make_symbolic=make_symbolic)
+        self.debugAssert(len(self._inputs) == 2)
+        if self._inputs[0].value is None or \
+           self._inputs[1].value is None:
+            return
+        in_0_val = self._inputs[0].value
+        in_1_val = self._inputs[1].value
+        out_val = in_0_val <= in_1_val
+        self._outputs[0].setValue(out_val)
+
+
 class LogOp(BasePointwiseOp):
     def __init__(self, name):
         super(LogOp, self).__init__(name)
@@ -677,6 +751,40 @@ class Conv2DOp(Conv2DBaseOp):
         flops = self.calcConv2DFlops(filter_shape, output_shape)
         return flops
 
+    def calcTiledBytes(self, cache_bytes, tile_strategy='square',
+                       line_bytes=64):
+        ''' Estimate off-chip bytes for an implicit-GEMM convolution with
+            a cache of cache_bytes (see calc_tiled_gemm_bytes): M is the
+            number of output pixels, N the output channels, and K the filter
+            size. Each pass over the input reads it once (tiles reuse
+            overlapping filter windows in cache).
+        '''
+        self.debugAssert(len(self._inputs) == 2)
+        self.debugAssert(len(self._outputs) == 1)
+        in_tensor, filter_tensor = self._inputs
+        out_tensor = self._outputs[0]
+        if self._format == 'NCHW':
+            # Width is contiguous: An output pixel (M) dimension
+            reduction_contiguous = False
+        elif self._format == 'NHWC':
+            # Channels are contiguous: A filter (K) dimension
+            reduction_contiguous = True
+        else:
+            self.notImplemented('Unknown data format: {}'
+                                .format(self._format))
+        out_chans = filter_tensor.shape.getDimension(3).symbol
+        operands = []
+        # Filters are stored [height, width, in_chans, out_chans]
+        for tensor, reduction in [(in_tensor, reduction_contiguous),
+                                  (filter_tensor, False),
+                                  (out_tensor, False)]:
+            cols = tensor.shape.getDimension(3).symbol
+            operands.append((tensor.shape.numElements() / cols, cols,
+                             DataType.sizeof(tensor.dtype), reduction))
+        return calc_tiled_gemm_bytes(out_tensor.shape.numElements() /
+                                     out_chans, out_chans, operands,
+                                     cache_bytes, tile_strategy, line_bytes)
+
 
 class MatMulOp(Op):
     def __init__(self, name):
@@ -694,6 +802,13 @@ class MatMulOp(Op):
             assert input_idx == 0 or input_idx == 1, \
                 'Unknown input index {}'.format(input_idx)
 
+    def isInputTransposed(self, input_idx):
+        assert input_idx == 0 or input_idx == 1, \
+            'Unknown input index {}'.format(input_idx)
+        if input_idx == 0:
+            return self._transpose_a
+        return self._transpose_b
+
     def propagateShapes(self, make_symbolic=False):
         # Verify that shapes can be correctly resolved
         self.debugAssert(len(self._inputs) == 2)
@@ -758,6 +873,29 @@ class MatMulOp(Op):
     def calcAlgBytes(self):
         return self.bytesAccessInput() + self.bytesAccessOutput()
 
+    def calcTiledBytes(self, cache_bytes, tile_strategy='square',
+                       line_bytes=64):
+        ''' Estimate off-chip bytes for a blocked GEMM with a cache of
+            cache_bytes (see calc_tiled_gemm_bytes).
+        '''
+        self.debugAssert(len(self._inputs) == 2)
+        tensor_a, tensor_b = self._inputs
+        tensor_c = self._outputs[0]
+        # Tensors are stored row-major, so the contiguous dimension of A is
+        # in K unless A is transposed, and of B is in K if B is transposed
+        operands = []
+        for tensor, reduction_contiguous in \
+                [(tensor_a, not self._transpose_a),
+                 (tensor_b, self._transpose_b), (tensor_c, False)]:
+            operands.append((tensor.shape.getDimension(0).symbol,
+                             tensor.shape.getDimension(1).symbol,
+                             DataType.sizeof(tensor.dtype),
+                             reduction_contiguous))
+        return calc_tiled_gemm_bytes(tensor_c.shape.getDimension(0).symbol,
+                                     tensor_c.shape.getDimension(1).symbol,
+                                     operands, cache_bytes, tile_strategy,
+                                     line_bytes)
+
     def calcAlgFootprint(self):
         # Return the size of the output tensor, which must be accessed
         return self.bytesAccessOutput()
@@ -776,6 +914,14 @@ class BatchMatMulOp(Op):
     def setAdjointY(self, adjoint_y):
         self._adjoint_y = adjoint_y
 
+    def isInputTransposed(self, input_idx):
+        ''' Whether the input's (last two) matrix dimensions are adjointed '''
+        assert input_idx == 0 or input_idx == 1, \
+            'Unknown input index {}'.format(input_idx)
+        if input_idx == 0:
+            return self._adjoint_x
+        return self._adjoint_y
+
     def propagateShapes(self, make_symbolic=False):
         # Verify that shapes can be correctly resolved
         self.debugAssert(len(self._inputs) == 2)
@@ -859,6 +1005,34 @@ class BatchMatMulOp(Op):
     def calcAlgBytes(self):
         return self.bytesAccessInput() + self.bytesAccessOutput()
 
+    def calcTiledBytes(self, cache_bytes, tile_strategy='square',
+                       line_bytes=64):
+        ''' Estimate off-chip bytes for a blocked GEMM per batch matrix
+            with a cache of cache_bytes (see calc_tiled_gemm_bytes).
+        '''
+        self.debugAssert(len(self._inputs) == 2)
+        self.debugAssert(len(self._outputs) == 1)
+        tensor_x, tensor_y = self._inputs
+        tensor_out = self._outputs[0]
+        # The contiguous dimension of x is in K unless x is adjoint, and of
+        # y is in K if y is adjoint
+        operands = []
+        for tensor, reduction_contiguous in \
+                [(tensor_x, not self._adjoint_x), (tensor_y, self._adjoint_y),
+                 (tensor_out, False)]:
+            rank = tensor.shape.rank
+            operands.append((tensor.shape.getDimension(rank - 2).symbol,
+                             tensor.shape.getDimension(rank - 1).symbol,
+                             DataType.sizeof(tensor.dtype),
+                             reduction_contiguous))
+        out_rank = tensor_out.shape.rank
+        m_dim = tensor_out.shape.getDimension(out_rank - 2).symbol
+        n_dim = tensor_out.shape.getDimension(out_rank - 1).symbol
+        num_batches = tensor_out.shape.numElements() / (m_dim * n_dim)
+        return num_batches * calc_tiled_gemm_bytes(m_dim, n_dim, operands,
+                                                   cache_bytes,
+                                                   tile_strategy, line_bytes)
+
     def calcAlgFootprint(self):
         # Return the size of the output tensor, which must be accessed
         return self.bytesAccessOutput()
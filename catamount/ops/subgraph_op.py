@@ -23,6 +23,12 @@ class SubgraphOp(Op):
             self.addOp(op)
         self.findAllSourcesSinks()
 
+    def getLoopIters(self):
+        ''' Return the symbol for the number of times the subgraph executes
+            ('<name>::iters').
+        '''
+        return utils.getIntSymbolFromString('{}::iters'.format(self.name))
+
     def debugString(self):
         to_return = 'In op {} of type {}:'.format(self._name, type(self))
         for op_name in sorted(self._ops_by_name.keys()):
@@ -205,9 +211,10 @@ class SubgraphOp(Op):
         # Continually visit frontier ops until none left
         while len(frontier_ops) > 0:
             next_op = frontier_ops.pop()
-            self.debugAssert(next_op.canVisit(visited_ops),
-                             'Next op {} cannot visit. Visited: {}'
-                             .format(next_op.name, visited_ops))
+            # Only format the (large) visited set message on failure
+            if not next_op.canVisit(visited_ops):
+                self.debugAssert(False, 'Next op {} cannot visit. Visited: {}'
+                                 .format(next_op.name, visited_ops))
             if not hierarchical or next_op.parent == self:
                 topo_ordered_ops.append(next_op)
             visited_ops.add(next_op)
@@ -325,6 +332,23 @@ class SubgraphOp(Op):
             total_alg_bytes += op_alg_bytes
         return total_alg_bytes
 
+    def calcTiledBytes(self, cache_bytes, tile_strategy='square',
+                       line_bytes=64, verbose=False):
+        ''' Calculate the estimated off-chip memory bytes accessed for the
+        compute graph with a cache of cache_bytes (see Op.calcTiledBytes).
+        '''
+        ops_to_execute = self.getTopologicalOpOrder(hierarchical=True)
+        total_tiled_bytes = 0
+        for op in ops_to_execute:
+            assert op.parent == self, \
+                'Incorrect parent for op {}: {}'.format(op.name, op.parent)
+            op_tiled_bytes = op.calcTiledBytes(cache_bytes, tile_strategy,
+                                               line_bytes)
+            if verbose:
+                print('tiled_bytes {}: {}'.format(op.name, op_tiled_bytes))
+            total_tiled_bytes += op_tiled_bytes
+        return total_tiled_bytes
+
     # [_] TODO (Joel): Only traverse feeds to fetches and count along path
     def calcAlgFootprint(self, feed_dict=None, fetches_dict=None,
                          verbose=False):
@@ -348,9 +372,12 @@ class SubgraphOp(Op):
 
     # [_] TODO (Joel): Only traverse feeds to fetches and count along path
     def calcMinimalFootprint(self, feed_dict=None, fetches_dict=None,
-                             verbose=False, symbol_subs=None):
+                             verbose=False, symbol_subs=None,
+                             footprint_tracker=None):
         ''' Calculate the minimal memory footprint accessed during a
-        traversal of the compute graph.
+        traversal of the compute graph. If specified, footprint_tracker
+        follows the tensors that the traversal allocates and frees (see
+        Op.calcMinimalFootprintSub).
         '''
         max_footprint = 0
         curr_footprint = 0
@@ -360,12 +387,12 @@ class SubgraphOp(Op):
         max_footprint, curr_footprint = self.calcMinimalFootprintSub(
                                             max_footprint, curr_footprint,
                                             tensors_to_consume, visited_ops,
-                                            symbol_subs)
+                                            symbol_subs, footprint_tracker)
         return max_footprint
 
     def calcMinimalFootprintSub(self, max_footprint, curr_footprint,
                                 tensors_to_consume, visited_ops,
-                                symbol_subs=None):
+                                symbol_subs=None, footprint_tracker=None):
         # NOTE: This function is currently an approximation for subgraphs!
         # TODO (Joel): Figure out how to pass feeds and fetches?
         # TODO (Joel): Move this out to the loop control block op!
@@ -388,6 +415,8 @@ class SubgraphOp(Op):
                     my_visited_ops.add(in_tensor.producer)
         my_max_footprint = max_footprint
         my_curr_footprint = curr_footprint
+        if footprint_tracker is not None:
+            footprint_tracker.enterSubgraph()
         for op in ops_to_execute:
             self.debugAssert(op.canVisit(my_visited_ops),
                              'Unable to visit op {}, visited_ops: {}'
@@ -400,7 +429,8 @@ class SubgraphOp(Op):
                                                       my_curr_footprint,
                                                       tensors_to_consume,
                                                       visited_ops,
-                                                      symbol_subs)
+                                                      symbol_subs,
+                                                      footprint_tracker)
             if op.calcAlgFootprint() != 0:
                 # If the op receives some inputs from outside the subgraph,
                 # restore those inputs into the footprint to ensure that they
@@ -409,12 +439,16 @@ class SubgraphOp(Op):
                 for in_tensor in op.inputs:
                     if in_tensor.producer.parent != self:
                         readd_input_sizes += in_tensor.size
+                        if footprint_tracker is not None:
+                            footprint_tracker.allocate(in_tensor)
                 if readd_input_sizes != 0:
                     my_curr_footprint += readd_input_sizes
                     my_max_footprint = utils.getSymbolicMaximum(
                                            my_curr_footprint,
                                            my_max_footprint,
                                            symbol_subs)
+                    if footprint_tracker is not None:
+                        footprint_tracker.observe()
             my_visited_ops.add(op)
             if isinstance(op, SubgraphOp):
                 for out_tensor in op.outputs:
@@ -422,12 +456,14 @@ class SubgraphOp(Op):
         # TODO (Joel): THIS IS THE CALCULATION FOR A LOOP SUBGRAPH. MUST
         # MOVE TO LOOP CONDITION OP AND CHANGE THIS FUNCTION TO A
         # NOTIMPLEMENTED ERROR
-        loop_iter_name = '{}::iters'.format(self.name)
-        loop_iters = utils.getIntSymbolFromString(loop_iter_name)
+        loop_iters = self.getLoopIters()
         my_curr_footprint = curr_footprint + \
                             (my_curr_footprint - curr_footprint) * loop_iters
         my_max_footprint = utils.getSymbolicMaximum(my_max_footprint,
                                                     my_curr_footprint,
                                                     symbol_subs)
+        if footprint_tracker is not None:
+            footprint_tracker.exitSubgraph(loop_iters)
+            footprint_tracker.observe()
         return my_max_footprint, my_curr_footprint
 
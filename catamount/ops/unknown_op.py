@@ -6,6 +6,16 @@ class UnknownOp(Op):
 
     def __init__(self, name):
         super(UnknownOp, self).__init__(name)
+        # The framework's type for the op (e.g., TF 'TensorArraySizeV3'),
+        # if known, so analyses can recognize ops without Catamount types
+        self._op_type = None
+
+    @property
+    def opType(self):
+        return self._op_type
+
+    def setOpType(self, op_type):
+        self._op_type = op_type
 
     def checkAndWarn(self):
         if not UnknownOp._warned_once:
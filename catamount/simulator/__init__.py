@@ -0,0 +1,17 @@
+from .bucketing import bucket_allreduce_ops, bucket_messages, \
+                       simulate_bucketed_allreduce, sweep_bucket_sizes
+from .collectives import CollectiveAlgorithm, CommunicationModel, \
+                         HierarchicalCollective, LinkModel, \
+                         RecursiveHalvingDoublingCollective, RingCollective, \
+                         TreeCollective, COLLECTIVE_ALGORITHMS
+from .events import EventSimulator, OpEvent, SimulationResult
+from .hardware import HardwareProfile, list_hardware_profiles, \
+                      load_hardware_profile
+from .pipeline import PipelinePartition, PipelinePartitioner
+from .roofline import RooflineSimulator
+from .search import ClusterSpec, ParallelismModel, ParallelismSearch, \
+                    calc_recompute_factors, calc_tp_comm_fraction, \
+                    pareto_front
+from .serving import ServingResult, ServingSimulator, calc_batch_times, \
+                      generate_arrivals, ARRIVAL_PROCESSES
+from .tensor_parallel import ShardGroup, TensorParallelSharding
@@ -0,0 +1,126 @@
+from catamount.api import utils
+from catamount.ops.collective_ops import AllreduceOp
+
+
+def get_allreduce_ops(graph):
+    ''' Return the graph's AllreduceOps in reverse topological order: The
+        order in which backpropagation produces the gradients to reduce.
+        Ties are broken deterministically by dependency depth, then name.
+    '''
+    depths = {}
+    allreduce_ops = []
+    for op in graph.getTopologicalOpOrder():
+        depth = 0
+        for in_tensor in op.inputs:
+            producer = in_tensor.producer
+            if producer is not None and producer.name in depths:
+                depth = max(depth, depths[producer.name] + 1)
+        depths[op.name] = depth
+        if isinstance(op, AllreduceOp):
+            allreduce_ops.append(op)
+    return sorted(allreduce_ops, key=lambda op: (depths[op.name], op.name),
+                  reverse=True)
+
+def get_allreduce_bytes(graph, bindings):
+    ''' Return a dictionary of AllreduceOp name -> message bytes for the
+        symbol bindings.
+    '''
+    ops = get_allreduce_ops(graph)
+    values = utils.evaluateExpressions([op.bytesAccessInput() for op in ops],
+                                       bindings)
+    return {op.name: float(value[0]) for op, value in zip(ops, values)}
+
+def bucket_messages(message_bytes, bucket_bytes):
+    ''' Group messages, in order, into buckets of at most bucket_bytes. A
+        message larger than bucket_bytes gets its own bucket. This is the
+        gradient fusion strategy of Horovod's tensor fusion and PyTorch DDP.
+
+        Args:
+          message_bytes: A list of (name, bytes) in communication order
+          bucket_bytes: The maximum bucket size (bytes). None or 0 disables
+              bucketing (one message per bucket)
+
+        Returns:
+          A list of buckets, each a list of message names
+    '''
+    buckets = []
+    curr_bucket = []
+    curr_bytes = 0
+    for name, num_bytes in message_bytes:
+        if len(curr_bucket) > 0 and \
+           (not bucket_bytes or curr_bytes + num_bytes > bucket_bytes):
+            buckets.append(curr_bucket)
+            curr_bucket = []
+            curr_bytes = 0
+        curr_bucket.append(name)
+        curr_bytes += num_bytes
+    if len(curr_bucket) > 0:
+        buckets.append(curr_bucket)
+    return buckets
+
+def bucket_allreduce_ops(graph, bucket_bytes, bindings):
+    ''' Group the graph's AllreduceOps into size-bounded buckets in reverse
+        topological order.
+
+        Returns:
+          A list of (bucket name, list of op names, bucket bytes)
+    '''
+    op_bytes = get_allreduce_bytes(graph, bindings)
+    order = [(op.name, op_bytes[op.name]) for op in get_allreduce_ops(graph)]
+    buckets = []
+    for idx, bucket in enumerate(bucket_messages(order, bucket_bytes)):
+        buckets.append(('allreduce_bucket_{}'.format(idx), bucket,
+                        sum(op_bytes[name] for name in bucket)))
+    return buckets
+
+def simulate_bucketed_allreduce(event_simulator, bindings, bucket_bytes):
+    ''' What-if transform: Simulate the graph with its AllreduceOps fused
+        into buckets of at most bucket_bytes. Each bucket is allreduced as
+        one message once all of its gradients are ready.
+
+        Args:
+          event_simulator: An EventSimulator with a communication model
+          bindings: A dictionary of symbol (or symbol name) -> value
+          bucket_bytes: The maximum bucket size (bytes)
+
+        Returns:
+          A tuple of (SimulationResult, list of buckets)
+    '''
+    comm_model = event_simulator.roofline.commModel
+    if comm_model is None:
+        raise ValueError('Allreduce bucketing requires a communication model')
+    graph = event_simulator.roofline.graph
+    buckets = bucket_allreduce_ops(graph, bucket_bytes, bindings)
+    overhead = event_simulator.roofline.hardware.launchOverhead
+    bucket_times = []
+    for bucket_name, op_names, num_bytes in buckets:
+        num_workers = comm_model.getNumWorkers(graph.opsByName[op_names[0]])
+        bucket_times.append(overhead +
+            comm_model.algorithm.allreduceTime(num_bytes, num_workers))
+    bucket_times = utils.evaluateExpressions(bucket_times, bindings)
+    fused_ops = []
+    for (bucket_name, op_names, _), bucket_time in zip(buckets,
+                                                      bucket_times):
+        fused_ops.append((bucket_name, op_names, float(bucket_time[0]),
+                          'communication'))
+    result = event_simulator.simulate(bindings, fused_ops=fused_ops)
+    return result, buckets
+
+def sweep_bucket_sizes(event_simulator, bindings, bucket_sizes):
+    ''' Simulate step time as a function of allreduce bucket size.
+
+        Returns:
+          A dictionary of bucket size -> dictionary with keys 'step_time',
+          'comm_time' (total communication time, not counting overlap), and
+          'num_buckets'
+    '''
+    sweep = {}
+    for bucket_bytes in bucket_sizes:
+        result, buckets = simulate_bucketed_allreduce(event_simulator,
+                                                      bindings, bucket_bytes)
+        comm_time = sum(event.duration for event in result.events.values()
+                        if event.bound == 'communication')
+        sweep[bucket_bytes] = {'step_time': result.stepTime,
+                               'comm_time': comm_time,
+                               'num_buckets': len(buckets)}
+    return sweep
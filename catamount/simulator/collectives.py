@@ -0,0 +1,332 @@
+import sympy
+
+from catamount.analysis.checkpoint import is_trainable_variable
+from catamount.analysis.roles import classify_tensor_roles
+from catamount.api import utils
+from catamount.ops.collective_ops import AllgatherOp, AllreduceOp
+from .bucketing import bucket_messages
+
+
+def _log2_ceil(value):
+    return sympy.ceiling(sympy.log(value, 2))
+
+
+class LinkModel:
+    ''' An alpha-beta model of a communication link: Sending a message of n
+        bytes takes (latency + n / bandwidth) seconds.
+
+        Args:
+          latency: Per-message latency, alpha (seconds)
+          bandwidth: Link bandwidth, 1 / beta (bytes/s)
+    '''
+    def __init__(self, latency, bandwidth):
+        assert bandwidth > 0
+        self._latency = latency
+        self._bandwidth = bandwidth
+
+    def __str__(self):
+        return 'LinkModel(latency: {}, bandwidth: {})' \
+               .format(self._latency, self._bandwidth)
+
+    @staticmethod
+    def fromDict(link_dict):
+        return LinkModel(link_dict['latency'], link_dict['bandwidth'])
+
+    @property
+    def latency(self):
+        return self._latency
+
+    @property
+    def bandwidth(self):
+        return self._bandwidth
+
+    @property
+    def alpha(self):
+        return sympy.Float(self._latency)
+
+    @property
+    def beta(self):
+        return 1 / sympy.Float(self._bandwidth)
+
+
+class CollectiveAlgorithm:
+    ''' Base class for collective communication algorithms. Subclasses
+        model the time for allreduce and allgather collectives using the
+        alpha-beta(-gamma) model of Thakur et al., "Optimization of
+        Collective Communication Operations in MPICH".
+
+        Args:
+          link: The LinkModel between workers
+          reduce_bandwidth: The rate (bytes/s) at which workers can reduce
+              received data (gamma = 1 / reduce_bandwidth). If None,
+              reduction time is ignored
+    '''
+    name = None
+
+    def __init__(self, link, reduce_bandwidth=None):
+        self._link = link
+        self._reduce_bandwidth = reduce_bandwidth
+
+    @property
+    def link(self):
+        return self._link
+
+    @property
+    def gamma(self):
+        if self._reduce_bandwidth is None:
+            return 0
+        return 1 / sympy.Float(self._reduce_bandwidth)
+
+    def allreduceTime(self, num_bytes, num_workers):
+        ''' Time to allreduce a num_bytes buffer across num_workers.
+        '''
+        raise NotImplementedError('Allreduce time not implemented for {}'
+                                  .format(type(self).__name__))
+
+    def allgatherTime(self, num_bytes, num_workers):
+        ''' Time to allgather a num_bytes output buffer (each worker
+            contributes num_bytes / num_workers) across num_workers.
+        '''
+        raise NotImplementedError('Allgather time not implemented for {}'
+                                  .format(type(self).__name__))
+
+
+class RingCollective(CollectiveAlgorithm):
+    ''' Ring algorithms: Allreduce is a reduce-scatter followed by an
+        allgather, each taking (p - 1) steps of n / p bytes.
+    '''
+    name = 'ring'
+
+    def reduceScatterTime(self, num_bytes, num_workers):
+        steps = num_workers - 1
+        return steps * self._link.alpha + \
+               steps * num_bytes / num_workers * \
+               (self._link.beta + self.gamma)
+
+    def allgatherTime(self, num_bytes, num_workers):
+        steps = num_workers - 1
+        return steps * self._link.alpha + \
+               steps * num_bytes / num_workers * self._link.beta
+
+    def allreduceTime(self, num_bytes, num_workers):
+        return self.reduceScatterTime(num_bytes, num_workers) + \
+               self.allgatherTime(num_bytes, num_workers)
+
+
+class RecursiveHalvingDoublingCollective(CollectiveAlgorithm):
+    ''' Rabenseifner's algorithm: Allreduce is a recursive-halving
+        reduce-scatter followed by a recursive-doubling allgather, each
+        taking log2(p) steps and moving (p - 1) / p * n bytes.
+    '''
+    name = 'halving_doubling'
+
+    def allgatherTime(self, num_bytes, num_workers):
+        return _log2_ceil(num_workers) * self._link.alpha + \
+               (num_workers - 1) * num_bytes / num_workers * self._link.beta
+
+    def allreduceTime(self, num_bytes, num_workers):
+        return 2 * _log2_ceil(num_workers) * self._link.alpha + \
+               (num_workers - 1) * num_bytes / num_workers * \
+               (2 * self._link.beta + self.gamma)
+
+
+class TreeCollective(CollectiveAlgorithm):
+    ''' Binomial tree algorithms: Allreduce is a reduce to a root followed
+        by a broadcast, each taking log2(p) steps of n bytes.
+    '''
+    name = 'tree'
+
+    def allgatherTime(self, num_bytes, num_workers):
+        # Gather to the root, then broadcast the full buffer
+        log_steps = _log2_ceil(num_workers)
+        return log_steps * self._link.alpha + \
+               (num_workers - 1) * num_bytes / num_workers * \
+               self._link.beta + \
+               log_steps * (self._link.alpha + num_bytes * self._link.beta)
+
+    def allreduceTime(self, num_bytes, num_workers):
+        log_steps = _log2_ceil(num_workers)
+        return log_steps * (2 * self._link.alpha +
+                            num_bytes * (2 * self._link.beta + self.gamma))
+
+
+class HierarchicalCollective(CollectiveAlgorithm):
+    ''' Two-level algorithms for clusters of multi-device nodes. Allreduce
+        is an intra-node ring reduce-scatter, an inter-node allreduce of the
+        n / k byte shards across nodes, and an intra-node ring allgather,
+        where k is the number of workers per node.
+
+        Args:
+          intra_link: The LinkModel between workers in a node
+          inter_algorithm: The CollectiveAlgorithm between nodes
+          workers_per_node: The number of workers in each node
+          reduce_bandwidth: See CollectiveAlgorithm
+    '''
+    name = 'hierarchical'
+
+    def __init__(self, intra_link, inter_algorithm, workers_per_node,
+                 reduce_bandwidth=None):
+        super(HierarchicalCollective, self).__init__(intra_link,
+                                                     reduce_bandwidth)
+        self._intra_algorithm = RingCollective(intra_link, reduce_bandwidth)
+        self._inter_algorithm = inter_algorithm
+        self._workers_per_node = workers_per_node
+
+    @property
+    def workersPerNode(self):
+        return self._workers_per_node
+
+    def _getNodeCounts(self, num_workers):
+        local = self._workers_per_node
+        if isinstance(num_workers, int) and num_workers < local:
+            local = num_workers
+        return local, num_workers / local
+
+    def allreduceTime(self, num_bytes, num_workers):
+        local, num_nodes = self._getNodeCounts(num_workers)
+        return self._intra_algorithm.reduceScatterTime(num_bytes, local) + \
+               self._inter_algorithm.allreduceTime(num_bytes / local,
+                                                   num_nodes) + \
+               self._intra_algorithm.allgatherTime(num_bytes, local)
+
+    def allgatherTime(self, num_bytes, num_workers):
+        # Gather each node's shards, allgather across nodes, and then
+        # broadcast the full buffer within each node
+        local, num_nodes = self._getNodeCounts(num_workers)
+        node_bytes = num_bytes / num_nodes
+        return self._intra_algorithm.allgatherTime(node_bytes, local) + \
+               self._inter_algorithm.allgatherTime(num_bytes, num_nodes) + \
+               _log2_ceil(local) * (self._link.alpha +
+                                    num_bytes * self._link.beta)
+
+
+COLLECTIVE_ALGORITHMS = {
+    RingCollective.name: RingCollective,
+    RecursiveHalvingDoublingCollective.name:
+        RecursiveHalvingDoublingCollective,
+    TreeCollective.name: TreeCollective,
+}
+
+
+class CommunicationModel:
+    ''' Estimates the time for collective communication ops in a graph.
+
+        Args:
+          algorithm: The CollectiveAlgorithm to use for all collectives
+          num_workers: The number of data-parallel workers. If None, each
+              collective op uses its own '{op_name}::num_workers' symbol
+    '''
+    def __init__(self, algorithm, num_workers=None):
+        self._algorithm = algorithm
+        self._num_workers = num_workers
+
+    @staticmethod
+    def fromHardware(hardware, algorithm='ring', num_workers=None,
+                     hierarchical=False):
+        ''' Build a communication model from a HardwareProfile's 'links'
+            ('intra_node' and 'inter_node') and 'devices_per_node' entries.
+            Reductions run at one third of memory bandwidth (each reduced
+            byte requires two reads and a write).
+
+            Args:
+              hardware: The HardwareProfile
+              algorithm: Name of the collective algorithm (see
+                  COLLECTIVE_ALGORITHMS). For hierarchical models, the
+                  algorithm used between nodes
+              num_workers: See CommunicationModel
+              hierarchical: Whether to model intra- and inter-node
+                  communication separately
+        '''
+        if algorithm not in COLLECTIVE_ALGORITHMS:
+            raise ValueError('Unknown collective algorithm: {} (available: '
+                             '{})'.format(algorithm,
+                                          sorted(COLLECTIVE_ALGORITHMS)))
+        links = hardware.extra.get('links', None)
+        if links is None:
+            raise ValueError('Hardware profile {} does not specify links'
+                             .format(hardware.name))
+        reduce_bandwidth = hardware.memBandwidth / 3
+        inter_link = LinkModel.fromDict(links['inter_node'])
+        inter_algorithm = COLLECTIVE_ALGORITHMS[algorithm](inter_link,
+                                                          reduce_bandwidth)
+        if not hierarchical:
+            return CommunicationModel(inter_algorithm, num_workers)
+        intra_link = LinkModel.fromDict(links['intra_node'])
+        hier_algorithm = HierarchicalCollective(
+            intra_link, inter_algorithm, hardware.extra['devices_per_node'],
+            reduce_bandwidth)
+        return CommunicationModel(hier_algorithm, num_workers)
+
+    @property
+    def algorithm(self):
+        return self._algorithm
+
+    @property
+    def numWorkers(self):
+        return self._num_workers
+
+    def getNumWorkers(self, op):
+        if self._num_workers is not None:
+            return self._num_workers
+        return utils.getIntSymbolFromString(
+            '{}::num_workers'.format(op.name))
+
+    def isCollectiveOp(self, op):
+        return isinstance(op, (AllreduceOp, AllgatherOp))
+
+    def calcOpCommTime(self, op):
+        ''' Return the communication time for a collective op (AllreduceOp
+            or AllgatherOp), or None if the op is not a collective.
+        '''
+        num_workers = self.getNumWorkers(op)
+        if isinstance(op, AllreduceOp):
+            return self._algorithm.allreduceTime(op.bytesAccessInput(),
+                                                 num_workers)
+        if isinstance(op, AllgatherOp):
+            # The output size contains the op's own num_workers symbol, so
+            # size the gathered buffer from the input shard instead
+            gathered_bytes = op.inputs[0].size * num_workers
+            return self._algorithm.allgatherTime(gathered_bytes, num_workers)
+        return None
+
+    def calcGradientAllreduceTime(self, graph, num_workers=None):
+        ''' Return the time to allreduce one gradient per trainable variable
+            in the graph, for graphs that do not contain explicit allreduce
+            ops (i.e., single-worker training graphs). Optimizer slot
+            variables and integer counters (e.g., the global step) have no
+            gradients (see is_trainable_variable).
+        '''
+        if num_workers is None:
+            num_workers = self._num_workers
+        if num_workers is None:
+            num_workers = utils.getIntSymbolFromString('num_workers')
+        roles = classify_tensor_roles(graph)
+        total_time = []
+        for op_name in sorted(graph.opsByName.keys()):
+            op = graph.opsByName[op_name]
+            if is_trainable_variable(op, roles):
+                total_time.append(self._algorithm.allreduceTime(
+                    op.outputs[0].size, num_workers))
+        return sympy.Add(*total_time)
+
+    def calcBucketedAllreduceTime(self, message_bytes, bucket_bytes,
+                                  num_workers=None):
+        ''' Return the total (non-overlapped) time to allreduce messages
+            when they are fused into buckets of at most bucket_bytes.
+
+            Args:
+              message_bytes: A list of message sizes in communication order
+              bucket_bytes: The maximum bucket size (bytes)
+              num_workers: The number of workers (default: the model's)
+        '''
+        if num_workers is None:
+            num_workers = self._num_workers
+        if num_workers is None:
+            num_workers = utils.getIntSymbolFromString('num_workers')
+        named_bytes = list(enumerate(message_bytes))
+        total_time = []
+        for bucket in bucket_messages(named_bytes, bucket_bytes):
+            bucket_size = sum(message_bytes[idx] for idx in bucket)
+            total_time.append(self._algorithm.allreduceTime(bucket_size,
+                                                            num_workers))
+        return sympy.Add(*total_time)
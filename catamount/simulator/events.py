@@ -0,0 +1,317 @@
+import heapq
+import json
+
+from catamount.ops.subgraph_op import SubgraphOp
+from .roofline import RooflineSimulator
+
+
+# Resource names. Compute streams are named 'compute:{idx}'
+COMPUTE_RESOURCE = 'compute'
+MEMORY_RESOURCE = 'memory'
+NETWORK_RESOURCE = 'network'
+
+
+class OpEvent:
+    ''' The simulated execution of an op: When it started and finished, and
+        which resources it held.
+    '''
+    def __init__(self, name, start, end, resources, bound):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.resources = resources
+        self.bound = bound
+        # The event that determined this event's start time (the latest
+        # dependency or the previous holder of a resource), if any
+        self.critical_pred = None
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def __str__(self):
+        return 'OpEvent(name: {}, start: {}, end: {}, resources: {})' \
+               .format(self.name, self.start, self.end, self.resources)
+
+
+class SimulationResult:
+    ''' The timeline produced by an EventSimulator run.
+    '''
+    def __init__(self, events, resource_names):
+        self._events = events
+        self._resource_names = resource_names
+        self._step_time = max([event.end for event in events.values()],
+                              default=0.0)
+
+    @property
+    def events(self):
+        return self._events
+
+    @property
+    def stepTime(self):
+        return self._step_time
+
+    def getUtilization(self):
+        ''' Return a dictionary of resource name -> fraction of the step
+            time that the resource was busy.
+        '''
+        busy = {name: 0.0 for name in self._resource_names}
+        for event in self._events.values():
+            for resource in event.resources:
+                busy[resource] += event.duration
+        if self._step_time == 0:
+            return {name: 0.0 for name in self._resource_names}
+        return {name: busy[name] / self._step_time
+                for name in self._resource_names}
+
+    def getCriticalPath(self):
+        ''' Return the list of op events on the critical path (in execution
+            order): The chain of dependencies and resource conflicts that
+            determined the step time.
+        '''
+        if len(self._events) == 0:
+            return []
+        event = max(self._events.values(),
+                    key=lambda event: (event.end, event.name))
+        path = []
+        while event is not None:
+            path.append(event)
+            event = event.critical_pred
+        return list(reversed(path))
+
+    def toChromeTrace(self):
+        ''' Return the timeline as a Chrome trace (chrome://tracing or
+            Perfetto) JSON object. Each resource is a thread, and times are
+            in microseconds.
+        '''
+        tids = {name: idx for idx, name in enumerate(self._resource_names)}
+        trace_events = []
+        for name, tid in tids.items():
+            trace_events.append({'name': 'thread_name', 'ph': 'M',
+                                 'pid': 0, 'tid': tid,
+                                 'args': {'name': name}})
+        for event in sorted(self._events.values(),
+                            key=lambda event: (event.start, event.name)):
+            for resource in event.resources:
+                trace_events.append({
+                    'name': event.name,
+                    'cat': event.bound if event.bound is not None else 'op',
+                    'ph': 'X',
+                    'pid': 0,
+                    'tid': tids[resource],
+                    'ts': event.start * 1e6,
+                    'dur': event.duration * 1e6,
+                })
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def writeChromeTrace(self, filename):
+        with open(filename, 'w') as trace_file:
+            json.dump(self.toChromeTrace(), trace_file)
+
+
+class EventSimulator:
+    ''' A discrete-event simulator that schedules graph ops onto modeled
+        device resources, respecting graph dependencies, to simulate overlap
+        of compute and communication. Op durations come from the roofline
+        model (including loop iterations) for concrete symbol bindings.
+
+        Resources are exclusive units:
+          - num_compute_streams compute streams: Every non-collective op
+            executes on one stream
+          - memory: Memory-bound ops also hold the memory bandwidth, so they
+            do not overlap with each other across streams
+          - network: Collective ops execute on the network link
+
+        When multiple ops are ready, ops are dispatched in topological order.
+
+        Args:
+          graph: The Catamount graph to simulate
+          hardware: A HardwareProfile
+          comm_model: A CommunicationModel for collective ops (optional)
+          num_compute_streams: The number of concurrent compute streams
+          transfer_link: A LinkModel for cross-device tensor transfers
+              (optional, see RooflineSimulator)
+    '''
+    def __init__(self, graph, hardware, comm_model=None,
+                 num_compute_streams=1, transfer_link=None):
+        assert num_compute_streams >= 1
+        self._graph = graph
+        self._roofline = RooflineSimulator(graph, hardware, comm_model,
+                                           transfer_link=transfer_link)
+        self._num_compute_streams = num_compute_streams
+
+    @property
+    def roofline(self):
+        return self._roofline
+
+    def getResourceNames(self):
+        return ['{}:{}'.format(COMPUTE_RESOURCE, idx)
+                for idx in range(self._num_compute_streams)] + \
+               [MEMORY_RESOURCE, NETWORK_RESOURCE]
+
+    def _getOpOrderAndDeps(self):
+        ops = [op for op in self._graph.getTopologicalOpOrder()
+               if not isinstance(op, SubgraphOp)]
+        op_index = {op.name: idx for idx, op in enumerate(ops)}
+        deps = []
+        for idx, op in enumerate(ops):
+            op_deps = set()
+            for in_tensor in op.inputs:
+                producer = in_tensor.producer
+                # Ignore loop back-edges (producers later in the order)
+                if producer is not None and producer.name in op_index and \
+                   op_index[producer.name] < idx:
+                    op_deps.add(op_index[producer.name])
+            deps.append(sorted(op_deps))
+        return ops, deps
+
+    def getOpDurations(self, bindings):
+        ''' Return dictionaries of op name -> duration and op name -> bound
+            type ('compute', 'memory', 'communication', or None) for
+            concrete symbol bindings.
+        '''
+        op_times = self._roofline.calcOpTimes()
+        results = self._roofline.evaluate(bindings)
+        durations = {}
+        bounds = {}
+        for op_name, op_time in op_times.items():
+            durations[op_name] = float(results['op_times'][op_name][0])
+            bound = op_time['bound']
+            if bound not in (None, 'communication'):
+                if results['compute_bound'][op_name][0]:
+                    bound = 'compute'
+                else:
+                    bound = 'memory'
+            bounds[op_name] = bound
+        return durations, bounds
+
+    def simulate(self, bindings, durations=None, fused_ops=None):
+        ''' Simulate one graph execution.
+
+            Args:
+              bindings: A dictionary of symbol (or symbol name) -> value
+              durations: Optional dictionary of op name -> duration that
+                  overrides the roofline duration of those ops
+              fused_ops: Optional list of (fused name, list of op names,
+                  duration, bound) that replace groups of ops with single
+                  fused ops (e.g., allreduce buckets). A fused op starts
+                  when the dependencies of all of its ops are satisfied
+
+            Returns:
+              A SimulationResult
+        '''
+        ops, deps = self._getOpOrderAndDeps()
+        op_durations, op_bounds = self.getOpDurations(bindings)
+        if durations is not None:
+            op_durations.update(durations)
+
+        # Build the tasks to schedule: One per op, except that each group of
+        # fused ops becomes a single task at the position of its last op
+        op_index = {op.name: idx for idx, op in enumerate(ops)}
+        op_to_task = list(range(len(ops)))
+        task_names = [op.name for op in ops]
+        if fused_ops is not None:
+            for fused_name, member_names, duration, bound in fused_ops:
+                members = [op_index[name] for name in member_names]
+                task_idx = max(members)
+                for member in members:
+                    op_to_task[member] = task_idx
+                task_names[task_idx] = fused_name
+                op_durations[fused_name] = duration
+                op_bounds[fused_name] = bound
+        task_ids = sorted(set(op_to_task))
+        task_deps = {task_idx: set() for task_idx in task_ids}
+        for idx, op_deps in enumerate(deps):
+            task_idx = op_to_task[idx]
+            for dep_idx in op_deps:
+                if op_to_task[dep_idx] != task_idx:
+                    task_deps[task_idx].add(op_to_task[dep_idx])
+        events = self._schedule(task_ids, task_names, task_deps,
+                                op_durations, op_bounds)
+        assert len(events) == len(task_ids), \
+            'Simulation deadlock: {} of {} ops executed' \
+            .format(len(events), len(task_ids))
+        return SimulationResult(events, self.getResourceNames())
+
+    def _schedule(self, task_ids, task_names, task_deps, durations, bounds):
+        succs = {task_idx: [] for task_idx in task_ids}
+        num_deps_left = {}
+        for task_idx in task_ids:
+            num_deps_left[task_idx] = len(task_deps[task_idx])
+            for dep_idx in task_deps[task_idx]:
+                succs[dep_idx].append(task_idx)
+
+        compute_streams = ['{}:{}'.format(COMPUTE_RESOURCE, idx)
+                           for idx in range(self._num_compute_streams)]
+        # Resource name -> event that last held it (None if never held)
+        resource_holder = {name: None for name in self.getResourceNames()}
+        resource_busy = {name: False for name in self.getResourceNames()}
+        events = {}
+        ready = []
+        finish_heap = []
+        for task_idx in task_ids:
+            if num_deps_left[task_idx] == 0:
+                heapq.heappush(ready, task_idx)
+
+        def requiredResources(name):
+            bound = bounds.get(name, None)
+            if bound == 'communication':
+                return [[NETWORK_RESOURCE]]
+            if durations.get(name, 0.0) == 0.0:
+                # Non-executing ops do not hold resources
+                return [[]]
+            stream_choices = [[stream] for stream in compute_streams]
+            if bound == 'memory':
+                return [choice + [MEMORY_RESOURCE]
+                        for choice in stream_choices]
+            return stream_choices
+
+        curr_time = 0.0
+        while len(ready) > 0 or len(finish_heap) > 0:
+            # Dispatch all ready tasks that can acquire their resources
+            blocked = []
+            while len(ready) > 0:
+                task_idx = heapq.heappop(ready)
+                name = task_names[task_idx]
+                acquired = None
+                for choice in requiredResources(name):
+                    if not any(resource_busy[res] for res in choice):
+                        acquired = choice
+                        break
+                if acquired is None:
+                    blocked.append(task_idx)
+                    continue
+                duration = durations.get(name, 0.0)
+                event = OpEvent(name, curr_time, curr_time + duration,
+                                acquired, bounds.get(name, None))
+                # Find what determined the start time: The latest finishing
+                # dependency or previous resource holder
+                preds = [events[task_names[dep_idx]]
+                         for dep_idx in task_deps[task_idx]]
+                preds.extend(resource_holder[res] for res in acquired
+                             if resource_holder[res] is not None)
+                if len(preds) > 0:
+                    event.critical_pred = max(preds, key=lambda pred:
+                                              (pred.end, pred.name))
+                events[name] = event
+                for res in acquired:
+                    resource_busy[res] = True
+                    resource_holder[res] = event
+                heapq.heappush(finish_heap, (event.end, task_idx))
+            for task_idx in blocked:
+                heapq.heappush(ready, task_idx)
+            if len(finish_heap) == 0:
+                break
+            # Advance to the next task completion(s)
+            curr_time, task_idx = heapq.heappop(finish_heap)
+            finished = [task_idx]
+            while len(finish_heap) > 0 and finish_heap[0][0] == curr_time:
+                finished.append(heapq.heappop(finish_heap)[1])
+            for task_idx in finished:
+                for res in events[task_names[task_idx]].resources:
+                    resource_busy[res] = False
+                for succ_idx in succs[task_idx]:
+                    num_deps_left[succ_idx] -= 1
+                    if num_deps_left[succ_idx] == 0:
+                        heapq.heappush(ready, succ_idx)
+        return events
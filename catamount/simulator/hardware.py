@@ -0,0 +1,141 @@
+import json
+import os
+
+from catamount.tensors.tensor import DataType
+
+
+_PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'profiles')
+
+
+class HardwareProfile:
+    ''' Performance characteristics of a compute device for simulation.
+
+        Args:
+          name: The name of the profile (e.g., 'v100')
+          peak_flops: A dictionary of data type name -> peak Flop/s. The
+              'default' entry is used for data types without an entry
+          mem_bandwidth: Main memory bandwidth (bytes/s)
+          onchip_capacity: On-chip (cache/scratchpad) capacity (bytes)
+          launch_overhead: Fixed overhead to launch each op (seconds)
+          description: A human-readable description
+          extra: Other profile data (e.g., 'memory_capacity' in bytes, or
+              interconnect parameters)
+    '''
+    def __init__(self, name, peak_flops, mem_bandwidth, onchip_capacity,
+                 launch_overhead, description='', extra=None):
+        assert 'default' in peak_flops, \
+            'Profile {} must specify default peak_flops'.format(name)
+        assert mem_bandwidth > 0
+        self._name = name
+        self._peak_flops = dict(peak_flops)
+        self._mem_bandwidth = mem_bandwidth
+        self._onchip_capacity = onchip_capacity
+        self._launch_overhead = launch_overhead
+        self._description = description
+        self._extra = dict(extra) if extra is not None else {}
+
+    def __str__(self):
+        return 'HardwareProfile(name: {}, peak_flops: {}, mem_bw: {}, ' \
+               'onchip: {}, overhead: {})'.format(self._name,
+               self._peak_flops, self._mem_bandwidth, self._onchip_capacity,
+               self._launch_overhead)
+
+    _REQUIRED_KEYS = ['name', 'peak_flops', 'mem_bandwidth',
+                      'onchip_capacity', 'launch_overhead']
+
+    @staticmethod
+    def fromDict(profile_dict):
+        for key in HardwareProfile._REQUIRED_KEYS:
+            if key not in profile_dict:
+                raise ValueError('Hardware profile missing key: {}'
+                                 .format(key))
+        extra = {key: value for key, value in profile_dict.items()
+                 if key not in HardwareProfile._REQUIRED_KEYS and
+                    key != 'description'}
+        return HardwareProfile(profile_dict['name'],
+                               profile_dict['peak_flops'],
+                               profile_dict['mem_bandwidth'],
+                               profile_dict['onchip_capacity'],
+                               profile_dict['launch_overhead'],
+                               description=profile_dict.get('description',
+                                                            ''),
+                               extra=extra)
+
+    @staticmethod
+    def fromFile(filename):
+        with open(filename, 'r') as profile_file:
+            return HardwareProfile.fromDict(json.load(profile_file))
+
+    def toDict(self):
+        profile_dict = dict(self._extra)
+        profile_dict.update({
+            'name': self._name,
+            'description': self._description,
+            'peak_flops': dict(self._peak_flops),
+            'mem_bandwidth': self._mem_bandwidth,
+            'onchip_capacity': self._onchip_capacity,
+            'launch_overhead': self._launch_overhead,
+        })
+        return profile_dict
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def description(self):
+        return self._description
+
+    @property
+    def memBandwidth(self):
+        return self._mem_bandwidth
+
+    @property
+    def memoryCapacity(self):
+        ''' Device memory capacity (bytes), or None if not specified '''
+        return self._extra.get('memory_capacity', None)
+
+    @property
+    def onchipCapacity(self):
+        return self._onchip_capacity
+
+    @property
+    def launchOverhead(self):
+        return self._launch_overhead
+
+    @property
+    def extra(self):
+        return self._extra
+
+    def getPeakFlops(self, dtype=None):
+        ''' Return the peak Flop/s for the data type (a DataType or name).
+            Reference types (e.g., float32_ref) use their base type's peak.
+        '''
+        if dtype is None:
+            return self._peak_flops['default']
+        if isinstance(dtype, DataType):
+            dtype = dtype.name
+        if dtype.endswith('_ref'):
+            dtype = dtype[:-len('_ref')]
+        return self._peak_flops.get(dtype, self._peak_flops['default'])
+
+
+def list_hardware_profiles():
+    ''' Return the names of the hardware profiles packaged with Catamount.
+    '''
+    return sorted(os.path.splitext(filename)[0]
+                  for filename in os.listdir(_PROFILES_DIR)
+                  if filename.endswith('.json'))
+
+def load_hardware_profile(name_or_path):
+    ''' Load a hardware profile by packaged profile name (e.g., 'v100') or
+        from a JSON file path.
+    '''
+    if os.path.isfile(name_or_path):
+        return HardwareProfile.fromFile(name_or_path)
+    filename = os.path.join(_PROFILES_DIR, '{}.json'.format(name_or_path))
+    if not os.path.isfile(filename):
+        raise ValueError('Unknown hardware profile: {} (available: {})'
+                         .format(name_or_path, list_hardware_profiles()))
+    return HardwareProfile.fromFile(filename)
@@ -0,0 +1,299 @@
+import numpy as np
+
+from catamount.api import utils
+from catamount.ops.subgraph_op import SubgraphOp
+from catamount.ops.variable import VariableOp
+from .collectives import LinkModel
+from .roofline import RooflineSimulator
+
+
+def get_top_level_op(graph, op):
+    ''' Return the op's ancestor (or the op itself) whose parent is the
+        graph. Pipeline stages never split ControlBlockOps.
+    '''
+    while op.parent is not None and op.parent is not graph:
+        op = op.parent
+    return op
+
+
+class PipelinePartition:
+    ''' The result of partitioning a graph into pipeline stages.
+
+        Attributes:
+          stages: List of lists of top-level op names in each stage
+          stage_times: Per-micro-batch time of each stage, including sending
+              activations to later stages (seconds)
+          stage_memory: Memory required by each stage (bytes)
+          transfer_bytes: Activation bytes each stage sends to later stages
+          num_micro_batches: The number of micro-batches per step
+    '''
+    def __init__(self, stages, stage_times, stage_memory, transfer_bytes,
+                 num_micro_batches):
+        self.stages = stages
+        self.stage_times = stage_times
+        self.stage_memory = stage_memory
+        self.transfer_bytes = transfer_bytes
+        self.num_micro_batches = num_micro_batches
+
+    def __str__(self):
+        return 'PipelinePartition(stages: {}, max_stage_time: {}, ' \
+               'step_time: {}, stage_memory: {})'.format(len(self.stages),
+               self.maxStageTime, self.stepTime, self.stage_memory)
+
+    @property
+    def numStages(self):
+        return len(self.stages)
+
+    @property
+    def maxStageTime(self):
+        return max(self.stage_times)
+
+    @property
+    def stepTime(self):
+        ''' Time to execute all micro-batches through the pipeline: The
+            slowest stage processes one micro-batch per time slot, and
+            filling and draining the pipeline takes (stages - 1) slots.
+        '''
+        return (self.num_micro_batches + self.numStages - 1) * \
+               self.maxStageTime
+
+    @property
+    def bubbleFraction(self):
+        ''' Fraction of the step time that stages are idle (bubbles) '''
+        return (self.numStages - 1) / \
+               (self.num_micro_batches + self.numStages - 1)
+
+    @property
+    def throughput(self):
+        ''' Micro-batches processed per second '''
+        if self.stepTime == 0:
+            return float('inf')
+        return self.num_micro_batches / self.stepTime
+
+    def getStageOfOp(self, op_name):
+        for stage_idx, stage in enumerate(self.stages):
+            if op_name in stage:
+                return stage_idx
+        return None
+
+
+class PipelinePartitioner:
+    ''' Partitions a graph's topological op order into contiguous pipeline
+        stages. The partitioner minimizes the maximum stage time (roofline
+        op times plus time to send activations to later stages) subject to
+        a per-device memory limit, using dynamic programming over the
+        top-level op order (ControlBlockOps stay whole), coarsened into
+        groups of ops for large graphs.
+
+        Stage memory counts each distinct tensor that stage ops read or
+        write. With a 1F1B schedule, stage s (of K) holds activations for up
+        to min(K - s, micro-batches) micro-batches in flight, while variable
+        (weight) tensors are held once.
+
+        Args:
+          graph: The Catamount graph to partition
+          hardware: A HardwareProfile for op times and memory capacity
+          link: The LinkModel between stages (default: the hardware's
+              'intra_node' link)
+    '''
+    def __init__(self, graph, hardware, link=None):
+        self._graph = graph
+        self._hardware = hardware
+        if link is None:
+            links = hardware.extra.get('links', {})
+            if 'intra_node' not in links:
+                raise ValueError('Specify a link between stages: Hardware '
+                                 'profile {} has no intra_node link'
+                                 .format(hardware.name))
+            link = LinkModel.fromDict(links['intra_node'])
+        self._link = link
+        self._roofline = RooflineSimulator(graph, hardware)
+
+    def _getItems(self, bindings):
+        ''' Evaluate the per-micro-batch time of each top-level op and the
+            tensors each touches.
+        '''
+        items = [op for op in
+                 self._graph.getTopologicalOpOrder(hierarchical=True)]
+        item_index = {op.name: idx for idx, op in enumerate(items)}
+        results = self._roofline.evaluate(bindings)
+        item_times = [0.0] * len(items)
+        for op_name, op_time in results['op_times'].items():
+            op = self._graph.opsByName[op_name]
+            top_op = get_top_level_op(self._graph, op)
+            item_times[item_index[top_op.name]] += float(op_time[0])
+
+        # Collect each tensor's touching items and producer item
+        tensors = {}
+        for op in self._graph.opsByName.values():
+            if isinstance(op, SubgraphOp):
+                continue
+            item_idx = item_index[get_top_level_op(self._graph, op).name]
+            for tensor in op.inputs + op.outputs:
+                if tensor.name not in tensors:
+                    producer_idx = item_idx
+                    if tensor.producer is not None:
+                        producer_idx = item_index[get_top_level_op(
+                            self._graph, tensor.producer).name]
+                    tensors[tensor.name] = [tensor, producer_idx, set()]
+                tensors[tensor.name][2].add(item_idx)
+        tensor_names = sorted(tensors.keys())
+        sizes = utils.evaluateExpressions(
+            [tensors[name][0].size for name in tensor_names], bindings)
+        tensor_info = []
+        for name, size in zip(tensor_names, sizes):
+            tensor, producer_idx, touches = tensors[name]
+            is_param = isinstance(tensor.producer, VariableOp)
+            tensor_info.append((float(size[0]), producer_idx,
+                                sorted(touches), is_param))
+        return items, item_times, tensor_info
+
+    @staticmethod
+    def _groupItems(item_times, max_groups):
+        ''' Split the item order into at most max_groups contiguous groups
+            (coarse layers) of approximately equal weight, counting both
+            time and number of items. Returns a list of group start
+            indices, followed by the number of items.
+        '''
+        num_items = len(item_times)
+        if num_items <= max_groups:
+            return list(range(num_items + 1))
+        total_time = sum(item_times)
+        weights = np.full(num_items, 1.0 / num_items)
+        if total_time > 0.0:
+            weights += np.asarray(item_times) / total_time
+        weight_prefix = np.cumsum(weights)
+        targets = weight_prefix[-1] * np.arange(1, max_groups) / max_groups
+        cuts = np.searchsorted(weight_prefix, targets, side='left') + 1
+        bounds = [0] + sorted(set(int(cut) for cut in cuts
+                                  if 0 < cut < num_items)) + [num_items]
+        return bounds
+
+    def partition(self, num_stages, bindings, num_micro_batches=1,
+                  memory_limit=None, max_groups=512):
+        ''' Partition the graph into num_stages contiguous stages.
+
+            Large graphs are first split into at most max_groups contiguous
+            groups of ops (coarse layers) of approximately equal time, and
+            stage boundaries are chosen between groups. The stage costs of
+            all group ranges are built as [groups, groups] matrices (from
+            prefix sums and 2D difference arrays), so each stage of the
+            dynamic program is one vectorized pass.
+
+            Args:
+              num_stages: The number of pipeline stages (devices)
+              bindings: A dictionary of symbol (or symbol name) -> value for
+                  one micro-batch
+              num_micro_batches: Micro-batches per training step
+              memory_limit: Per-device memory limit (bytes). Defaults to the
+                  hardware's memory_capacity (no limit if unspecified)
+              max_groups: The maximum number of op groups to place stage
+                  boundaries between (graphs with at most max_groups
+                  top-level ops are partitioned exactly)
+
+            Returns:
+              A PipelinePartition
+        '''
+        if memory_limit is None:
+            memory_limit = self._hardware.memoryCapacity
+        if memory_limit is None:
+            memory_limit = float('inf')
+        items, item_times, tensor_info = self._getItems(bindings)
+        num_items = len(items)
+        if num_stages < 1 or num_stages > num_items:
+            raise ValueError('Cannot partition {} ops into {} stages'
+                             .format(num_items, num_stages))
+
+        bounds = self._groupItems(item_times, max(max_groups, num_stages))
+        num_groups = len(bounds) - 1
+        item_group = np.repeat(np.arange(num_groups), np.diff(bounds))
+
+        # time[start, end]: Time of groups [start, end)
+        time_prefix = np.concatenate([[0.0], np.cumsum(item_times)])
+        group_prefix = time_prefix[bounds]
+        times = group_prefix[None, :] - group_prefix[:, None]
+
+        # Accumulate per-tensor rectangles of (start, end) group ranges into
+        # 2D difference arrays, then prefix sum them:
+        # - transfer[start, end]: Activations produced in [start, end) and
+        #   consumed at or after end (i.e., crossing the cut at end)
+        # - param/act[start, end]: Distinct parameter (activation) bytes
+        #   touched by groups [start, end). A tensor touched by groups g_0
+        #   < g_1 < ... counts in ranges with prev g < start <= g < end
+        size = num_groups + 2
+        transfer_diff = np.zeros((size, size))
+        mem_diffs = {True: np.zeros((size, size)),
+                     False: np.zeros((size, size))}
+
+        def addRect(diff, s_lo, s_hi, e_lo, e_hi, value):
+            # Add value to diff-encoded [s_lo, s_hi] x [e_lo, e_hi]
+            diff[s_lo, e_lo] += value
+            diff[s_hi + 1, e_lo] -= value
+            diff[s_lo, e_hi + 1] -= value
+            diff[s_hi + 1, e_hi + 1] += value
+
+        for tensor_size, producer_idx, touches, is_param in tensor_info:
+            touch_groups = sorted(set(item_group[touches].tolist()))
+            if not is_param:
+                producer_group = item_group[producer_idx]
+                last_group = touch_groups[-1]
+                if last_group > producer_group:
+                    addRect(transfer_diff, 0, producer_group,
+                            producer_group + 1, last_group, tensor_size)
+            prev_group = -1
+            for group in touch_groups:
+                addRect(mem_diffs[is_param], prev_group + 1, group,
+                        group + 1, num_groups, tensor_size)
+                prev_group = group
+        transfers = transfer_diff.cumsum(axis=0).cumsum(axis=1)
+        transfers = transfers[:num_groups + 1, :num_groups + 1]
+        param_mem, act_mem = [
+            mem_diffs[is_param].cumsum(axis=0).cumsum(axis=1)
+            [:num_groups + 1, :num_groups + 1] for is_param in (True, False)]
+
+        costs = times + self._link.latency * (transfers > 0) + \
+                transfers / self._link.bandwidth
+        valid = np.triu(np.ones((num_groups + 1, num_groups + 1),
+                                dtype=np.bool_), k=1)
+
+        def stageMemory(stage_idx):
+            in_flight = max(1, min(num_stages - stage_idx, num_micro_batches))
+            return param_mem + in_flight * act_mem
+
+        # best[k][end]: Max stage time for the first k stages covering
+        # groups [0, end), and the previous cut
+        inf = float('inf')
+        best = np.full(num_groups + 1, inf)
+        best[0] = 0.0
+        prev_cuts = []
+        for stage in range(1, num_stages + 1):
+            candidates = np.maximum(best[:, None], costs)
+            feasible = valid & (stageMemory(stage - 1) <= memory_limit)
+            # Leave at least one group for each remaining stage
+            feasible[:, num_groups - (num_stages - stage) + 1:] = False
+            candidates[~feasible] = inf
+            starts = np.argmin(candidates, axis=0)
+            best = candidates[starts, np.arange(num_groups + 1)]
+            prev_cuts.append(starts)
+        if best[num_groups] == inf:
+            raise ValueError('No pipeline partition into {} stages fits in '
+                             'memory limit {}'.format(num_stages,
+                                                      memory_limit))
+
+        cuts = [num_groups]
+        for stage in range(num_stages, 0, -1):
+            cuts.append(int(prev_cuts[stage - 1][cuts[-1]]))
+        cuts = list(reversed(cuts))
+        stages = []
+        stage_times = []
+        stage_memory = []
+        transfer_bytes = []
+        for stage_idx in range(num_stages):
+            start, end = cuts[stage_idx], cuts[stage_idx + 1]
+            stages.append([op.name for op in
+                           items[bounds[start]:bounds[end]]])
+            stage_times.append(float(costs[start, end]))
+            stage_memory.append(float(stageMemory(stage_idx)[start, end]))
+            transfer_bytes.append(float(transfers[start, end]))
+        return PipelinePartition(stages, stage_times, stage_memory,
+                                 transfer_bytes, num_micro_batches)
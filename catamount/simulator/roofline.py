@@ -0,0 +1,270 @@
+import numpy as np
+import sympy
+
+from catamount.api import utils
+from catamount.graph.frozen import get_op_loop_multipliers
+from catamount.graph.placement import get_device_transfers
+from catamount.ops.constant import ConstantOp
+from catamount.ops.placeholder import PlaceholderOp
+from catamount.ops.subgraph_op import SubgraphOp
+from catamount.ops.variable import VariableOp
+
+
+# Ops that provide graph inputs and state rather than executing kernels
+_NON_EXECUTING_OPS = (ConstantOp, PlaceholderOp, VariableOp)
+
+
+def get_op_dtype(op):
+    ''' Return the data type an op computes in: The type of its first
+        output (or input) tensor with a known type.
+    '''
+    for tensor in op.outputs + op.inputs:
+        if tensor.dtype is not None:
+            return tensor.dtype
+    return None
+
+def _is_zero(expr):
+    return not isinstance(expr, sympy.Expr) and expr == 0 or \
+           isinstance(expr, sympy.Expr) and expr.is_zero
+
+
+class RooflineSimulator:
+    ''' Simulate graph execution time on a device using the roofline model:
+        Each op takes time
+
+            max(flops / peak_flops(dtype), bytes / mem_bandwidth) + overhead
+
+        where flops and bytes are the op's algorithmic Flops and bytes, and
+        overhead is the device's op launch overhead. Ops with no Flops and
+        no bytes accessed (e.g., control ops) and ops that only provide
+        inputs or state (placeholders, variables, constants) take no time.
+        Ops inside loops (ControlBlockOps) execute once per loop iteration,
+        so their times are multiplied by the loop iteration symbols.
+
+        If a communication model is given, collective ops (allreduce and
+        allgather) take the model's communication time instead.
+
+        If a transfer link is given, tensors that cross device placements
+        (see catamount.graph.placement) are received over the link before
+        their consumers execute (implicit Send/Recv), adding the transfer
+        time to the receiving op's communication time.
+
+        Args:
+          graph: The Catamount graph to simulate
+          hardware: A HardwareProfile
+          comm_model: A CommunicationModel for collective ops (optional)
+          tiled_bytes: If True, use the ops' cache-aware tiled bytes with the
+              device's on-chip capacity (see Op.calcTiledBytes) rather than
+              their algorithmic bytes
+          transfer_link: A LinkModel between devices for cross-device
+              tensor transfers (optional)
+    '''
+    def __init__(self, graph, hardware, comm_model=None, tiled_bytes=False,
+                 transfer_link=None):
+        self._graph = graph
+        self._hardware = hardware
+        self._comm_model = comm_model
+        self._tiled_bytes = tiled_bytes
+        self._transfer_link = transfer_link
+        self._op_times = None
+
+    @property
+    def graph(self):
+        return self._graph
+
+    @property
+    def hardware(self):
+        return self._hardware
+
+    @property
+    def commModel(self):
+        return self._comm_model
+
+    def _calcRecvTimes(self):
+        ''' Return a dictionary of op name -> time to receive its inputs
+            from other devices over the transfer link.
+        '''
+        recv_times = {}
+        if self._transfer_link is None:
+            return recv_times
+        link = self._transfer_link
+        for tensor, _, _, consumer in get_device_transfers(self._graph):
+            recv_times[consumer.name] = recv_times.get(consumer.name, 0) + \
+                                        link.alpha + tensor.size * link.beta
+        return recv_times
+
+    def calcOpTimes(self):
+        ''' Calculate the symbolic execution time of each (non-subgraph) op.
+
+            Returns:
+              A dictionary of op name -> dictionary with keys:
+                'flops', 'bytes': The op's algorithmic Flops and bytes (or
+                    tiled bytes)
+                'compute_time', 'memory_time': Roofline time components
+                'comm_time': Collective communication and cross-device
+                    transfer time
+                'time': The time to execute the op once
+                'multiplier': The number of times the op executes (loop
+                    iterations)
+                'total_time': multiplier * time
+                'bound': 'compute' or 'memory' if one time component
+                    dominates for all symbol values, 'unknown' if neither
+                    dominates, 'communication' for modeled collectives, or
+                    None if the op does not execute
+        '''
+        if self._op_times is not None:
+            return self._op_times
+        self._op_times = {}
+        mem_bw = sympy.Float(self._hardware.memBandwidth)
+        overhead = sympy.Float(self._hardware.launchOverhead)
+        recv_times = self._calcRecvTimes()
+        for op_name in sorted(self._graph.opsByName.keys()):
+            op = self._graph.opsByName[op_name]
+            if isinstance(op, SubgraphOp):
+                continue
+            flops = op.calcAlgFlops()
+            if self._tiled_bytes:
+                op_bytes = op.calcTiledBytes(self._hardware.onchipCapacity)
+            else:
+                op_bytes = op.calcAlgBytes()
+            peak_flops = sympy.Float(
+                self._hardware.getPeakFlops(get_op_dtype(op)))
+            compute_time = flops / peak_flops
+            memory_time = op_bytes / mem_bw
+            if utils.symbolicDominates(compute_time, memory_time):
+                bound = 'compute'
+                max_time = compute_time
+            elif utils.symbolicDominates(memory_time, compute_time):
+                bound = 'memory'
+                max_time = memory_time
+            else:
+                bound = 'unknown'
+                max_time = sympy.Max(compute_time, memory_time)
+            if isinstance(op, _NON_EXECUTING_OPS) or \
+               (_is_zero(flops) and _is_zero(op_bytes)):
+                compute_time = 0
+                memory_time = 0
+                time = 0
+                op_overhead = 0
+                bound = None
+            else:
+                time = max_time + overhead
+                op_overhead = overhead
+            comm_time = 0
+            if self._comm_model is not None and \
+               self._comm_model.isCollectiveOp(op):
+                comm_time = self._comm_model.calcOpCommTime(op)
+                compute_time = 0
+                memory_time = 0
+                time = comm_time + overhead
+                op_overhead = overhead
+                bound = 'communication'
+            if op_name in recv_times:
+                comm_time += recv_times[op_name]
+                time += recv_times[op_name]
+                if bound is None:
+                    bound = 'communication'
+            multiplier, _ = get_op_loop_multipliers(op)
+            self._op_times[op_name] = {
+                'flops': flops,
+                'bytes': op_bytes,
+                'compute_time': compute_time,
+                'memory_time': memory_time,
+                'comm_time': comm_time,
+                'overhead': op_overhead,
+                'time': time,
+                'multiplier': multiplier,
+                'total_time': multiplier * time,
+                'bound': bound,
+            }
+        return self._op_times
+
+    def calcStepTime(self):
+        ''' Calculate the symbolic total time to execute the graph once.
+        '''
+        op_times = self.calcOpTimes()
+        return sympy.Add(*[op_time['total_time']
+                           for op_time in op_times.values()])
+
+    def calcDataParallelStepTime(self):
+        ''' Calculate the symbolic data-parallel step time: The graph's step
+            time plus, for graphs without explicit collective ops, the time
+            to allreduce the gradient of each variable (no overlap).
+        '''
+        if self._comm_model is None:
+            raise ValueError('Data-parallel step time requires a '
+                             'communication model')
+        step_time = self.calcStepTime()
+        has_collectives = any(self._comm_model.isCollectiveOp(op)
+                              for op in self._graph.opsByName.values())
+        if has_collectives:
+            return step_time
+        return step_time + \
+               self._comm_model.calcGradientAllreduceTime(self._graph)
+
+    def compile(self):
+        ''' Compile the op times into a CompiledRoofline for fast, repeated
+            vectorized evaluation (e.g., in configuration searches).
+        '''
+        return CompiledRoofline(self.calcOpTimes())
+
+    def evaluate(self, bindings):
+        ''' Evaluate the simulated times for vectors of symbol bindings.
+
+            Args:
+              bindings: A dictionary of symbol (or symbol name) -> value or
+                  1D array of values
+
+            Returns:
+              A dictionary with keys:
+                'op_times': op name -> array of total op times (including
+                    loop iterations)
+                'compute_bound': op name -> boolean array of whether the op
+                    is compute-bound for each binding
+                'comm_time': Array of the total communication times
+                'step_time': Array of the total step times
+        '''
+        return self.compile().evaluate(bindings)
+
+
+class CompiledRoofline:
+    ''' Roofline op time expressions compiled into one numpy function.
+        Compiled rooflines are picklable, so they can be sent to worker
+        processes without the graph.
+    '''
+    def __init__(self, op_times):
+        self._op_names = list(op_times.keys())
+        exprs = []
+        for op_name in self._op_names:
+            op_time = op_times[op_name]
+            exprs.extend([op_time['compute_time'], op_time['memory_time'],
+                          op_time['comm_time'], op_time['overhead'],
+                          op_time['multiplier']])
+        self._compiled = utils.CompiledExpressions(exprs)
+
+    @property
+    def symbols(self):
+        return self._compiled.symbols
+
+    def evaluate(self, bindings):
+        ''' See RooflineSimulator.evaluate '''
+        values = self._compiled(bindings)
+        num_bindings = len(values[0]) if len(values) > 0 else 1
+        results = {'op_times': {}, 'compute_bound': {},
+                   'comm_time': np.zeros(num_bindings),
+                   'step_time': np.zeros(num_bindings)}
+        for idx, op_name in enumerate(self._op_names):
+            compute_time, memory_time, comm_time, overhead, multiplier = \
+                values[5 * idx:5 * idx + 5]
+            total_time = multiplier * \
+                (np.maximum(compute_time, memory_time) + comm_time +
+                 overhead)
+            results['op_times'][op_name] = total_time
+            results['compute_bound'][op_name] = compute_time >= memory_time
+            results['comm_time'] += multiplier * comm_time
+            results['step_time'] += total_time
+        return results
+
+    def calcStepTime(self, bindings):
+        ''' Return the array of step times for the bindings '''
+        return self.evaluate(bindings)['step_time']
@@ -0,0 +1,394 @@
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from catamount.analysis.recompute import RecomputePlanner
+from catamount.api import utils
+from catamount.ops.math_ops import BatchMatMulOp, MatMulOp
+from catamount.ops.variable import VariableOp
+from .collectives import LinkModel, RingCollective
+from .roofline import RooflineSimulator
+from .tensor_parallel import ROW_SHARDING, TensorParallelSharding, \
+                             get_weight_source
+
+
+class ClusterSpec:
+    ''' A description of a training cluster of identical devices.
+
+        Args:
+          hardware: The HardwareProfile of each device
+          num_nodes: The number of nodes
+          devices_per_node: Devices in each node (default: the hardware's
+              'devices_per_node')
+          memory_per_device: Device memory (bytes) (default: the hardware's
+              memory_capacity)
+          intra_link: LinkModel between devices in a node (default: the
+              hardware's 'intra_node' link)
+          inter_link: LinkModel between nodes (default: the hardware's
+              'inter_node' link)
+    '''
+    def __init__(self, hardware, num_nodes, devices_per_node=None,
+                 memory_per_device=None, intra_link=None, inter_link=None):
+        links = hardware.extra.get('links', {})
+        if devices_per_node is None:
+            devices_per_node = hardware.extra.get('devices_per_node', 1)
+        if memory_per_device is None:
+            memory_per_device = hardware.memoryCapacity
+        if memory_per_device is None:
+            raise ValueError('Specify memory_per_device: Hardware profile {} '
+                             'has no memory_capacity'.format(hardware.name))
+        if intra_link is None:
+            intra_link = LinkModel.fromDict(links['intra_node'])
+        if inter_link is None:
+            inter_link = LinkModel.fromDict(links['inter_node'])
+        self.hardware = hardware
+        self.num_nodes = num_nodes
+        self.devices_per_node = devices_per_node
+        self.memory_per_device = memory_per_device
+        self.intra_link = intra_link
+        self.inter_link = inter_link
+
+    @property
+    def numDevices(self):
+        return self.num_nodes * self.devices_per_node
+
+
+class ParallelismModel:
+    ''' The analytical step time and memory model for parallelism
+        configurations, built from compiled graph cost expressions. Models
+        are picklable, so they can evaluate configurations in worker
+        processes without the graph.
+
+        For data-parallel degree d, tensor-parallel degree t, pipeline-
+        parallel degree p, micro-batch size m, and M = B / (d * m)
+        micro-batches per step (global batch B):
+          - stage time = roofline step time(m) * recompute factor / (t * p)
+            + time to allreduce tensor-parallel activations among t devices
+          - step time = (M + p - 1) * stage time (pipeline bubbles) + time
+            to allreduce the gradients of 1 / (t * p) of the parameters
+            among d devices (within a node if all devices fit in one)
+          - memory per device = parameter bytes / (t * p) * weight memory
+            factor + activation bytes(m) / (t * p) * min(p, M) in-flight
+            micro-batches (times a fraction with recomputation)
+
+        The recompute factors and tensor-parallel communication fraction
+        are ratios for the graph (see ParallelismSearch).
+    '''
+    def __init__(self, step_time, activation_bytes, param_bytes,
+                 batch_symbol, bindings, cluster, weight_memory_factor,
+                 recompute_compute_factor, recompute_memory_fraction,
+                 tp_comm_fraction):
+        self._step_time = step_time
+        self._activation_bytes = activation_bytes
+        self._param_bytes = param_bytes
+        self._batch_symbol = batch_symbol
+        self._bindings = dict(bindings)
+        self._memory_per_device = cluster.memory_per_device
+        self._devices_per_node = cluster.devices_per_node
+        self._weight_memory_factor = weight_memory_factor
+        self._recompute_compute_factor = recompute_compute_factor
+        self._recompute_memory_fraction = recompute_memory_fraction
+        self._tp_comm_fraction = tp_comm_fraction
+        # Compile collective times as functions of bytes and workers
+        comm_bytes = utils.getIntSymbolFromString('search::comm_bytes')
+        workers = utils.getIntSymbolFromString('search::workers')
+        self._comm_symbols = (comm_bytes, workers)
+        reduce_bandwidth = cluster.hardware.memBandwidth / 3
+        intra_ring = RingCollective(cluster.intra_link, reduce_bandwidth)
+        inter_ring = RingCollective(cluster.inter_link, reduce_bandwidth)
+        self._intra_allreduce = utils.CompiledExpressions(
+            [intra_ring.allreduceTime(comm_bytes, workers)])
+        self._inter_allreduce = utils.CompiledExpressions(
+            [inter_ring.allreduceTime(comm_bytes, workers)])
+
+    def _allreduceTime(self, compiled, num_bytes, num_workers):
+        comm_bytes, workers = self._comm_symbols
+        times = compiled({comm_bytes: num_bytes, workers: num_workers})[0]
+        return np.where(num_workers > 1, times, 0.0)
+
+    def evaluate(self, configs):
+        ''' Evaluate configurations.
+
+            Args:
+              configs: A dictionary of equal-length arrays: 'dp', 'tp',
+                  'pp', 'micro_batch', 'num_micro_batches', and 'recompute'
+
+            Returns:
+              A dictionary of arrays: 'step_time', 'memory', 'devices', and
+              'feasible' (memory fits on the devices)
+        '''
+        dp = np.asarray(configs['dp'], dtype=np.float64)
+        tp = np.asarray(configs['tp'], dtype=np.float64)
+        pp = np.asarray(configs['pp'], dtype=np.float64)
+        micro_batch = np.asarray(configs['micro_batch'], dtype=np.float64)
+        num_micro = np.asarray(configs['num_micro_batches'],
+                               dtype=np.float64)
+        recompute = np.asarray(configs['recompute'], dtype=np.bool_)
+
+        bindings = dict(self._bindings)
+        bindings[self._batch_symbol] = micro_batch
+        mb_time = self._step_time.calcStepTime(bindings)
+        act_bytes = self._activation_bytes(bindings)[0]
+
+        model_split = tp * pp
+        compute_factor = np.where(recompute, self._recompute_compute_factor,
+                                  1.0)
+        tp_bytes = act_bytes / pp * self._tp_comm_fraction
+        stage_time = mb_time * compute_factor / model_split + \
+                     self._allreduceTime(self._intra_allreduce, tp_bytes, tp)
+        devices = dp * tp * pp
+        grad_bytes = self._param_bytes / model_split
+        dp_comm = np.where(
+            devices <= self._devices_per_node,
+            self._allreduceTime(self._intra_allreduce, grad_bytes, dp),
+            self._allreduceTime(self._inter_allreduce, grad_bytes, dp))
+        step_time = (num_micro + pp - 1) * stage_time + dp_comm
+
+        in_flight = np.minimum(pp, num_micro)
+        act_fraction = np.where(recompute, self._recompute_memory_fraction,
+                                1.0)
+        memory = grad_bytes * self._weight_memory_factor + \
+                 act_bytes / model_split * in_flight * act_fraction
+        return {'step_time': step_time,
+                'memory': memory,
+                'devices': devices.astype(np.int64),
+                'feasible': memory <= self._memory_per_device}
+
+
+# The model that a search worker process unpickled from the parent
+_worker_model = None
+
+def _init_search_worker(model):
+    global _worker_model
+    _worker_model = model
+
+def _evaluate_chunk(configs):
+    return _worker_model.evaluate(configs)
+
+
+def _powers_of_two(max_value):
+    values = []
+    value = 1
+    while value <= max_value:
+        values.append(value)
+        value *= 2
+    return values
+
+def pareto_front(results, keys=('step_time', 'memory', 'devices')):
+    ''' Return the results that are not dominated in all keys (smaller is
+        better), sorted by the first key.
+    '''
+    front = []
+    for result in sorted(results, key=lambda res: tuple(res[key]
+                                                        for key in keys)):
+        dominated = False
+        for kept in front:
+            if all(kept[key] <= result[key] for key in keys):
+                dominated = True
+                break
+        if not dominated:
+            front.append(result)
+    return front
+
+def calc_recompute_factors(graph, bindings, act_bytes):
+    ''' Return the (compute factor, activation memory fraction) of the
+        graph's sqrt(N) recompute plan (see RecomputePlanner.planSqrtN):
+        Total Flops with recomputation relative to the graph's Flops, and
+        activation bytes with recomputation relative to act_bytes (the
+        graph's footprint less its parameters).
+    '''
+    plan = RecomputePlanner(graph).planSqrtN(bindings)
+    flops, act_bytes = [float(value[0]) for value in
+                        utils.evaluateExpressions(
+                            [graph.calcAlgFlops(), act_bytes], bindings)]
+    compute_factor = 1.0
+    if flops > 0:
+        compute_factor += plan.extra_flops / flops
+    memory_fraction = 1.0
+    if act_bytes > 0:
+        memory_fraction = max(0.0, 1.0 - plan.savedBytes / act_bytes)
+    return compute_factor, memory_fraction
+
+def calc_tp_comm_fraction(graph, bindings, act_bytes):
+    ''' Return the bytes that tensor-parallel layers allreduce relative to
+        act_bytes (the graph's footprint less its parameters), when each
+        matmul with a weight input is row-sharded (see
+        TensorParallelSharding).
+    '''
+    sharding = TensorParallelSharding(graph, 2)
+    for op_name in sorted(graph.opsByName.keys()):
+        op = graph.opsByName[op_name]
+        if isinstance(op, (MatMulOp, BatchMatMulOp)) and \
+           any(get_weight_source(in_tensor) is not None
+               for in_tensor in op.inputs):
+            sharding.shard(op_name, mode=ROW_SHARDING)
+    if len(sharding.groups) == 0:
+        return 0.0
+    comm_bytes = sharding.calcPerDeviceCosts()['comm_bytes']
+    comm_bytes, act_bytes = [float(value[0]) for value in
+                             utils.evaluateExpressions(
+                                 [comm_bytes, act_bytes], bindings)]
+    if act_bytes <= 0:
+        return 0.0
+    return comm_bytes / act_bytes
+
+
+class ParallelismSearch:
+    ''' Search over data x tensor x pipeline parallel degrees, micro-batch
+        sizes, and recomputation for a graph on a cluster. Candidates are
+        evaluated with a ParallelismModel of compiled cost expressions,
+        optionally across a process pool.
+
+        Args:
+          graph: The Catamount graph of one training step
+          cluster: A ClusterSpec
+          batch_symbol: The graph's batch size symbol (or name)
+          global_batch_size: The total batch size per step
+          bindings: Values for the graph's other symbols
+          weight_memory_factor: Bytes stored per parameter byte (weights,
+              gradients, and optimizer state; 4 for Adam)
+          recompute_compute_factor: Compute multiplier with recomputation
+              (default: from the graph's sqrt(N) recompute plan, see
+              calc_recompute_factors)
+          recompute_memory_fraction: Fraction of activation bytes stored
+              with recomputation (default: from the graph's sqrt(N)
+              recompute plan)
+          tp_comm_fraction: Fraction of a stage's activation bytes that
+              tensor-parallel layers allreduce (default: from row-sharding
+              the graph's weight matmuls, see calc_tp_comm_fraction)
+
+        Graph-derived defaults are evaluated with the batch symbol bound to
+        the global batch size (unless bindings specify it).
+    '''
+    def __init__(self, graph, cluster, batch_symbol, global_batch_size,
+                 bindings=None, weight_memory_factor=4.0,
+                 recompute_compute_factor=None,
+                 recompute_memory_fraction=None, tp_comm_fraction=None):
+        if isinstance(batch_symbol, str):
+            batch_symbol = utils.getIntSymbolFromString(batch_symbol)
+        self._cluster = cluster
+        self._global_batch_size = global_batch_size
+        if bindings is None:
+            bindings = {}
+
+        roofline = RooflineSimulator(graph, cluster.hardware)
+        param_bytes = 0
+        for op in graph.opsByName.values():
+            if isinstance(op, VariableOp):
+                param_bytes += op.outputs[0].size
+        act_bytes = graph.calcAlgFootprint() - param_bytes
+
+        ref_bindings = dict(bindings)
+        if batch_symbol not in ref_bindings and \
+           batch_symbol.name not in ref_bindings:
+            ref_bindings[batch_symbol] = global_batch_size
+        if recompute_compute_factor is None or \
+           recompute_memory_fraction is None:
+            compute_factor, memory_fraction = calc_recompute_factors(
+                graph, ref_bindings, act_bytes)
+            if recompute_compute_factor is None:
+                recompute_compute_factor = compute_factor
+            if recompute_memory_fraction is None:
+                recompute_memory_fraction = memory_fraction
+        if tp_comm_fraction is None:
+            tp_comm_fraction = calc_tp_comm_fraction(graph, ref_bindings,
+                                                     act_bytes)
+        self._recompute_compute_factor = recompute_compute_factor
+        self._recompute_memory_fraction = recompute_memory_fraction
+        self._tp_comm_fraction = tp_comm_fraction
+
+        param_bytes = float(utils.evaluateExpressions([param_bytes],
+                                                      bindings)[0][0])
+        self._model = ParallelismModel(
+            roofline.compile(), utils.CompiledExpressions([act_bytes]),
+            param_bytes, batch_symbol, bindings, cluster,
+            weight_memory_factor, recompute_compute_factor,
+            recompute_memory_fraction, tp_comm_fraction)
+
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def recomputeComputeFactor(self):
+        return self._recompute_compute_factor
+
+    @property
+    def recomputeMemoryFraction(self):
+        return self._recompute_memory_fraction
+
+    @property
+    def tpCommFraction(self):
+        return self._tp_comm_fraction
+
+    def getCandidates(self, micro_batch_sizes=None, max_tp=None,
+                      max_pp=None, recompute_options=(False, True)):
+        ''' Enumerate configurations (powers of two for parallel degrees)
+            that fit on the cluster and evenly divide the global batch.
+
+            Returns:
+              A dictionary of equal-length config arrays (see
+              ParallelismModel.evaluate)
+        '''
+        num_devices = self._cluster.numDevices
+        batch = self._global_batch_size
+        if micro_batch_sizes is None:
+            micro_batch_sizes = _powers_of_two(batch)
+        if max_tp is None:
+            max_tp = self._cluster.devices_per_node
+        if max_pp is None:
+            max_pp = num_devices
+        configs = {key: [] for key in ['dp', 'tp', 'pp', 'micro_batch',
+                                       'num_micro_batches', 'recompute']}
+        for tp in _powers_of_two(min(max_tp, num_devices)):
+            for pp in _powers_of_two(min(max_pp, num_devices // tp)):
+                for dp in _powers_of_two(num_devices // (tp * pp)):
+                    for micro_batch in micro_batch_sizes:
+                        if batch % (dp * micro_batch) != 0:
+                            continue
+                        for recompute in recompute_options:
+                            configs['dp'].append(dp)
+                            configs['tp'].append(tp)
+                            configs['pp'].append(pp)
+                            configs['micro_batch'].append(micro_batch)
+                            configs['num_micro_batches'].append(
+                                batch // (dp * micro_batch))
+                            configs['recompute'].append(recompute)
+        return {key: np.array(values) for key, values in configs.items()}
+
+    def evaluate(self, configs, num_workers=None, chunk_size=256):
+        ''' Evaluate configurations, in chunks across num_workers processes
+            if num_workers > 1.
+
+            Returns:
+              A list of result dictionaries (one per configuration)
+        '''
+        num_configs = len(configs['dp'])
+        chunks = [{key: values[start:start + chunk_size]
+                   for key, values in configs.items()}
+                  for start in range(0, num_configs, chunk_size)]
+        if num_workers is None or num_workers <= 1:
+            chunk_results = [self._model.evaluate(chunk) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers,
+                                     initializer=_init_search_worker,
+                                     initargs=(self._model,)) as executor:
+                chunk_results = list(executor.map(_evaluate_chunk, chunks))
+        results = []
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            for idx in range(len(chunk['dp'])):
+                result = {key: values[idx].item()
+                          for key, values in chunk.items()}
+                result.update({key: values[idx].item()
+                               for key, values in chunk_result.items()})
+                results.append(result)
+        return results
+
+    def search(self, num_workers=None, **candidate_kwargs):
+        ''' Return the Pareto set of feasible configurations over (step
+            time, memory per device, devices used), sorted by step time.
+        '''
+        configs = self.getCandidates(**candidate_kwargs)
+        results = self.evaluate(configs, num_workers=num_workers)
+        feasible = [result for result in results if result['feasible']]
+        return pareto_front(feasible)
@@ -0,0 +1,269 @@
+import bisect
+import heapq
+import numpy as np
+
+from catamount.api import utils
+from .roofline import RooflineSimulator
+
+
+ARRIVAL_PROCESSES = ['poisson', 'uniform']
+DEFAULT_PERCENTILES = [50, 90, 99]
+
+
+def generate_arrivals(rate, duration, process='poisson', seed=None):
+    ''' Generate request arrival times.
+
+        Args:
+          rate: The mean arrival rate (requests per second)
+          duration: The arrival period (seconds)
+          process: 'poisson' (exponential inter-arrival times) or 'uniform'
+              (evenly spaced arrivals)
+          seed: Random seed for the Poisson process
+
+        Returns:
+          A sorted array of arrival times in [0, duration)
+    '''
+    if rate <= 0 or duration <= 0:
+        raise ValueError('Arrival rate and duration must be positive')
+    if process not in ARRIVAL_PROCESSES:
+        raise ValueError('Unknown arrival process {}: Choose from {}'
+                         .format(process, ARRIVAL_PROCESSES))
+    if process == 'uniform':
+        return np.arange(0.0, duration, 1.0 / rate)
+    rng = np.random.default_rng(seed)
+    # Draw extra inter-arrival times, so one draw nearly always covers the
+    # duration
+    expected = rate * duration
+    num_draws = int(expected + 6.0 * np.sqrt(expected) + 16)
+    arrivals = np.cumsum(rng.exponential(1.0 / rate, num_draws))
+    while arrivals[-1] < duration:
+        more = arrivals[-1] + np.cumsum(
+            rng.exponential(1.0 / rate, num_draws))
+        arrivals = np.concatenate([arrivals, more])
+    return arrivals[arrivals < duration]
+
+def calc_batch_times(graph, hardware, max_batch_size, batch_symbol,
+                     bindings=None, comm_model=None):
+    ''' Evaluate the graph's roofline step time for each batch size from 1
+        to max_batch_size in one pass of the compiled expressions.
+
+        Returns:
+          An array of step times indexed by batch size (index 0 is 0.0)
+    '''
+    if isinstance(batch_symbol, str):
+        batch_symbol = utils.getIntSymbolFromString(batch_symbol)
+    batch_bindings = dict(bindings) if bindings is not None else {}
+    batch_bindings[batch_symbol] = np.arange(1, max_batch_size + 1,
+                                             dtype=np.float64)
+    compiled = RooflineSimulator(graph, hardware, comm_model).compile()
+    step_times = np.broadcast_to(compiled.calcStepTime(batch_bindings),
+                                 (max_batch_size,))
+    return np.concatenate([[0.0], step_times])
+
+
+class ServingResult:
+    ''' The outcome of a ServingSimulator run: Per-request latencies and
+        per-batch sizes.
+    '''
+    def __init__(self, arrivals, latencies, batch_sizes, busy_time,
+                 num_replicas):
+        self._arrivals = arrivals
+        self._latencies = latencies
+        self._batch_sizes = batch_sizes
+        self._busy_time = busy_time
+        self._num_replicas = num_replicas
+
+    @property
+    def latencies(self):
+        return self._latencies
+
+    @property
+    def batchSizes(self):
+        return self._batch_sizes
+
+    @property
+    def numRequests(self):
+        return len(self._latencies)
+
+    @property
+    def makespan(self):
+        ''' Time from the first arrival to the last completion '''
+        if len(self._latencies) == 0:
+            return 0.0
+        return float(np.max(self._arrivals + self._latencies) -
+                     self._arrivals[0])
+
+    @property
+    def throughput(self):
+        ''' Completed requests per second '''
+        if self.makespan == 0.0:
+            return 0.0
+        return self.numRequests / self.makespan
+
+    @property
+    def meanBatchSize(self):
+        if len(self._batch_sizes) == 0:
+            return 0.0
+        return float(np.mean(self._batch_sizes))
+
+    @property
+    def utilization(self):
+        ''' Fraction of the makespan that replicas were busy '''
+        if self.makespan == 0.0:
+            return 0.0
+        return float(self._busy_time / (self.makespan * self._num_replicas))
+
+    def getLatencyPercentiles(self, percentiles=None):
+        ''' Return a dictionary of percentile -> latency (seconds) '''
+        if percentiles is None:
+            percentiles = DEFAULT_PERCENTILES
+        if len(self._latencies) == 0:
+            return {pct: 0.0 for pct in percentiles}
+        values = np.percentile(self._latencies, percentiles)
+        return {pct: float(value)
+                for pct, value in zip(percentiles, values)}
+
+    def getSummary(self, percentiles=None):
+        ''' Return a dictionary of throughput, utilization, mean batch size,
+            and latency percentiles (keys 'p50', 'p99', etc.).
+        '''
+        summary = {'throughput': self.throughput,
+                   'utilization': self.utilization,
+                   'mean_batch_size': self.meanBatchSize,
+                   'mean_latency': float(np.mean(self._latencies))
+                                   if len(self._latencies) > 0 else 0.0}
+        for pct, latency in self.getLatencyPercentiles(percentiles).items():
+            summary['p{}'.format(pct)] = latency
+        return summary
+
+
+class ServingSimulator:
+    ''' An event-driven simulator of inference serving with dynamic
+        batching (e.g., TensorFlow Serving or Triton batchers). Requests
+        queue in arrival order. When a replica is free, it dispatches a
+        batch of the queued requests once the queue holds max_batch_size
+        requests, or once the oldest request has waited batch_timeout
+        seconds. A batch of size b takes the graph's step time with the
+        batch symbol bound to b.
+
+        Batch step times are evaluated once for all batch sizes, and the
+        simulation steps batch to batch (binary searching the arrival
+        array), so it handles millions of requests quickly.
+
+        Args:
+          batch_times: An array of step times indexed by batch size (index
+              0 is unused). See fromGraph to build it from a graph
+          num_replicas: The number of model replicas serving the queue
+    '''
+    def __init__(self, batch_times, num_replicas=1):
+        batch_times = np.asarray(batch_times, dtype=np.float64)
+        if len(batch_times) < 2:
+            raise ValueError('Specify step times for batch sizes >= 1')
+        if num_replicas < 1:
+            raise ValueError('Serving requires at least one replica')
+        self._batch_times = batch_times
+        self._num_replicas = num_replicas
+
+    @staticmethod
+    def fromGraph(graph, hardware, max_batch_size, batch_symbol,
+                  bindings=None, comm_model=None, num_replicas=1):
+        ''' Build a ServingSimulator from the graph's roofline step times
+            (see calc_batch_times).
+        '''
+        batch_times = calc_batch_times(graph, hardware, max_batch_size,
+                                       batch_symbol, bindings, comm_model)
+        return ServingSimulator(batch_times, num_replicas)
+
+    @property
+    def maxBatchSize(self):
+        return len(self._batch_times) - 1
+
+    @property
+    def batchTimes(self):
+        return self._batch_times
+
+    def simulate(self, arrivals, max_batch_size=None, batch_timeout=0.0):
+        ''' Simulate serving requests.
+
+            Args:
+              arrivals: An array of request arrival times (see
+                  generate_arrivals)
+              max_batch_size: The largest batch to dispatch (default: the
+                  largest batch size with a step time)
+              batch_timeout: The longest time (seconds) the oldest queued
+                  request waits for a batch to fill
+
+            Returns:
+              A ServingResult
+        '''
+        if max_batch_size is None:
+            max_batch_size = self.maxBatchSize
+        if max_batch_size < 1 or max_batch_size > self.maxBatchSize:
+            raise ValueError('Max batch size {} outside of [1, {}]'
+                             .format(max_batch_size, self.maxBatchSize))
+        if batch_timeout < 0:
+            raise ValueError('Batch timeout must be non-negative')
+        arrivals = np.sort(np.asarray(arrivals, dtype=np.float64))
+        # Scalar searches and indexing are faster on Python lists
+        arrival_list = arrivals.tolist()
+        batch_times = self._batch_times.tolist()
+        num_requests = len(arrival_list)
+        batch_sizes = []
+        batch_ends = []
+        busy_time = 0.0
+        # Times at which each replica is next free
+        replica_free = [0.0] * self._num_replicas
+        head = 0
+        while head < num_requests:
+            free_time = heapq.heappop(replica_free)
+            full_idx = head + max_batch_size - 1
+            close_time = arrival_list[head] + batch_timeout
+            if full_idx < num_requests:
+                close_time = min(close_time, arrival_list[full_idx])
+            dispatch = max(free_time, close_time)
+            count = bisect.bisect_right(arrival_list, dispatch, head,
+                                        min(head + max_batch_size,
+                                            num_requests)) - head
+            end = dispatch + batch_times[count]
+            batch_sizes.append(count)
+            batch_ends.append(end)
+            busy_time += batch_times[count]
+            heapq.heappush(replica_free, end)
+            head += count
+        batch_sizes = np.array(batch_sizes, dtype=np.int64)
+        latencies = np.repeat(batch_ends, batch_sizes) - arrivals
+        return ServingResult(arrivals, latencies, batch_sizes, busy_time,
+                             self._num_replicas)
+
+    def sweepArrivalRates(self, rates, duration, max_batch_size=None,
+                          batch_timeout=0.0, process='poisson', seed=None,
+                          percentiles=None):
+        ''' Simulate a throughput/latency curve over arrival rates.
+
+            Returns:
+              A dictionary of arrival rate -> ServingResult.getSummary()
+        '''
+        curve = {}
+        for rate in rates:
+            arrivals = generate_arrivals(rate, duration, process, seed)
+            result = self.simulate(arrivals, max_batch_size, batch_timeout)
+            curve[rate] = result.getSummary(percentiles)
+        return curve
+
+    def sweepBatchingParams(self, arrivals, max_batch_sizes, batch_timeouts,
+                            percentiles=None):
+        ''' Simulate each combination of max batch size and batch timeout
+            for the same arrivals, to choose batching parameters.
+
+            Returns:
+              A dictionary of (max batch size, batch timeout) ->
+              ServingResult.getSummary()
+        '''
+        sweep = {}
+        for max_batch_size in max_batch_sizes:
+            for batch_timeout in batch_timeouts:
+                result = self.simulate(arrivals, max_batch_size,
+                                       batch_timeout)
+                sweep[(max_batch_size, batch_timeout)] = \
+                    result.getSummary(percentiles)
+        return sweep
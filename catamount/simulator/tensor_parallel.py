@@ -0,0 +1,249 @@
+import sympy
+
+from catamount.graph.frozen import get_op_loop_multipliers
+from catamount.ops.collective_ops import AllgatherOp, AllreduceOp
+from catamount.ops.ctrl_ops import EnterOp
+from catamount.ops.init_ops import IdentityOp
+from catamount.ops.math_ops import BatchMatMulOp, MatMulOp
+from catamount.ops.variable import VariableOp
+from catamount.tensors.tensor import Tensor
+from catamount.tensors.tensor_shape import TensorShape
+
+
+COLUMN_SHARDING = 'column'
+ROW_SHARDING = 'row'
+# Ops that forward a weight to its consumers (e.g., TF '<var>/read'
+# IdentityOps, and EnterOps into loops)
+_WEIGHT_FORWARDING_OPS = (IdentityOp, EnterOp)
+
+
+def get_weight_source(tensor):
+    ''' Return the VariableOp that the tensor forwards (through IdentityOps
+        and EnterOps), or None if the tensor is not a forwarded weight.
+    '''
+    producer = tensor.producer
+    while isinstance(producer, _WEIGHT_FORWARDING_OPS) and \
+          len(producer.inputs) > 0:
+        producer = producer.inputs[0].producer
+    if isinstance(producer, VariableOp):
+        return producer
+    return None
+
+
+class ShardGroup:
+    ''' A MatMulOp/BatchMatMulOp and its weight VariableOp (if any) sharded
+        across devices. The weight is the matmul input at weight_idx.
+
+        Column sharding splits the weight along its output (non-contracted)
+        dimension: Each device reads the full input and computes a slice of
+        the output, which is allgathered if gather_output. Row sharding
+        splits the weight along its contracted dimension: Each device reads
+        a slice of the input and computes a full-size partial output, which
+        is allreduced.
+    '''
+    def __init__(self, matmul_op, weight_op, weight_idx, mode,
+                 gather_output):
+        self.matmul_op = matmul_op
+        self.weight_op = weight_op
+        self.weight_idx = weight_idx
+        self.mode = mode
+        self.gather_output = gather_output
+        self.collective_op = None
+
+    def getShardedWeightDim(self):
+        ''' Return the (negative) index of the weight dimension that is
+            split, accounting for transposed (adjointed) matmul inputs.
+        '''
+        transposed = self.matmul_op.isInputTransposed(self.weight_idx)
+        # The contracted dimension of the first input is its last dimension
+        # and of the second input is its second-to-last, unless transposed
+        contracted_dim = -1 if self.weight_idx == 0 else -2
+        if transposed:
+            contracted_dim = -3 - contracted_dim
+        if self.mode == ROW_SHARDING:
+            return contracted_dim
+        return -3 - contracted_dim
+
+
+class TensorParallelSharding:
+    ''' A what-if analysis of tensor (model) parallelism: Shard selected
+        MatMulOp/BatchMatMulOp and weight VariableOp groups column- or
+        row-wise across num_devices, model the collectives that the sharding
+        requires, and calculate per-device costs. The original graph is not
+        modified; collectives are modeled as AllreduceOps and AllgatherOps
+        that are outside of the graph.
+
+        Args:
+          graph: The Catamount graph
+          num_devices: The tensor-parallel degree (int or symbol)
+    '''
+    def __init__(self, graph, num_devices):
+        self._graph = graph
+        self._num_devices = num_devices
+        self._groups = []
+
+    @property
+    def numDevices(self):
+        return self._num_devices
+
+    @property
+    def groups(self):
+        return self._groups
+
+    def _findWeightInput(self, matmul_op, weight_op=None):
+        ''' Return (weight VariableOp, input index) for the matmul input
+            that forwards weight_op (or any VariableOp if None). Returns
+            (weight_op, None) if no input forwards it.
+        '''
+        for idx, in_tensor in enumerate(matmul_op.inputs):
+            source = get_weight_source(in_tensor)
+            if source is None:
+                continue
+            if weight_op is None or source is weight_op:
+                return source, idx
+        return weight_op, None
+
+    def shard(self, matmul_name, mode=COLUMN_SHARDING, weight_name=None,
+              gather_output=True):
+        ''' Shard a matmul op and its weight across the devices.
+
+            Args:
+              matmul_name: Name of the MatMulOp or BatchMatMulOp
+              mode: 'column' or 'row'
+              weight_name: Name of the weight VariableOp. If None, the
+                  VariableOp that feeds the matmul (if any, possibly through
+                  IdentityOps and EnterOps) is used. Weights that do not
+                  feed the matmul are taken to be its second input
+              gather_output: For column sharding, whether to allgather the
+                  output (set False when a row-sharded op consumes it)
+        '''
+        if mode not in (COLUMN_SHARDING, ROW_SHARDING):
+            raise ValueError('Unknown sharding mode: {}'.format(mode))
+        matmul_op = self._graph.opsByName[matmul_name]
+        if not isinstance(matmul_op, (MatMulOp, BatchMatMulOp)):
+            raise TypeError('Can only shard MatMulOps and BatchMatMulOps, '
+                            'not {} ({})'.format(matmul_name,
+                                                 type(matmul_op).__name__))
+        if weight_name is not None:
+            weight_op = self._graph.opsByName[weight_name]
+            if not isinstance(weight_op, VariableOp):
+                raise TypeError('Weight {} is not a VariableOp'
+                                .format(weight_name))
+        else:
+            weight_op = None
+        weight_op, weight_idx = self._findWeightInput(matmul_op, weight_op)
+        if weight_idx is None:
+            weight_idx = 1
+        group = ShardGroup(matmul_op, weight_op, weight_idx, mode,
+                           gather_output)
+        out_tensor = matmul_op.outputs[0]
+        if mode == ROW_SHARDING:
+            group.collective_op = self._makeCollective(
+                AllreduceOp, '{}/tp_allreduce'.format(matmul_name),
+                out_tensor)
+        elif gather_output:
+            group.collective_op = self._makeCollective(
+                AllgatherOp, '{}/tp_allgather'.format(matmul_name),
+                out_tensor)
+        self._groups.append(group)
+        return group
+
+    def _makeCollective(self, op_type, name, full_tensor):
+        ''' Build a modeled collective op (not added to the graph) whose
+            full-size tensor has the shape of full_tensor.
+        '''
+        op = op_type(name)
+        in_tensor = Tensor('{}/in'.format(name),
+                           TensorShape(full_tensor.shape),
+                           dtype=full_tensor.dtype)
+        out_tensor = Tensor(name, TensorShape(full_tensor.shape),
+                            dtype=full_tensor.dtype)
+        op.addInput(in_tensor)
+        op.addOutput(out_tensor)
+        return op
+
+    def getCollectiveOps(self):
+        return [group.collective_op for group in self._groups
+                if group.collective_op is not None]
+
+    def _shardedMatMulCosts(self, group):
+        ''' Return per-device (flops, bytes, footprint) of a sharded matmul
+        '''
+        op = group.matmul_op
+        devices = self._num_devices
+        flops = op.calcAlgFlops() / devices
+        op_bytes = 0
+        for idx, in_tensor in enumerate(op.inputs):
+            if idx == group.weight_idx or group.mode == ROW_SHARDING:
+                # Row sharding reads only a slice of the activations
+                op_bytes += in_tensor.size / devices
+            else:
+                op_bytes += in_tensor.size
+        out_bytes = op.bytesAccessOutput()
+        if group.mode == COLUMN_SHARDING:
+            out_bytes = out_bytes / devices
+        return flops, op_bytes + out_bytes, out_bytes
+
+    def calcPerDeviceCosts(self, comm_model=None):
+        ''' Calculate the symbolic per-device costs with the sharding.
+
+            Args:
+              comm_model: Optional CommunicationModel whose algorithm times
+                  the tensor-parallel collectives among the devices
+
+            Returns:
+              A dictionary with keys 'parameters', 'flops', 'bytes',
+              'footprint', 'comm_bytes' (bytes each collective moves), and
+              'comm_time' (if comm_model is specified)
+        '''
+        devices = self._num_devices
+        params = self._graph.calcModelParameters()
+        flops = self._graph.calcAlgFlops()
+        op_bytes = self._graph.calcAlgBytes()
+        footprint = self._graph.calcAlgFootprint()
+        comm_bytes = 0
+        comm_time = 0
+        sharded_weights = set()
+        for group in self._groups:
+            op = group.matmul_op
+            flops_mult, bytes_mult = get_op_loop_multipliers(op)
+            shard_flops, shard_bytes, shard_foot = \
+                self._shardedMatMulCosts(group)
+            flops += flops_mult * (shard_flops - op.calcAlgFlops())
+            op_bytes += bytes_mult * (shard_bytes - op.calcAlgBytes())
+            footprint += bytes_mult * (shard_foot - op.calcAlgFootprint())
+            weight_op = group.weight_op
+            if weight_op is not None and weight_op.name not in sharded_weights:
+                sharded_weights.add(weight_op.name)
+                weight_params = weight_op.calcModelParameters()
+                params += weight_params / devices - weight_params
+                weight_foot = weight_op.calcAlgFootprint()
+                footprint += weight_foot / devices - weight_foot
+            coll_op = group.collective_op
+            if coll_op is None:
+                continue
+            # Collectives compute (reduce) and access partial results, and
+            # execute once per loop iteration of the sharded op
+            flops += flops_mult * coll_op.calcAlgFlops()
+            op_bytes += bytes_mult * coll_op.calcAlgBytes()
+            footprint += bytes_mult * coll_op.calcAlgFootprint()
+            full_bytes = coll_op.outputs[0].size
+            comm_bytes += flops_mult * full_bytes
+            if comm_model is not None:
+                if isinstance(coll_op, AllreduceOp):
+                    coll_time = comm_model.algorithm.allreduceTime(
+                        full_bytes, devices)
+                else:
+                    coll_time = comm_model.algorithm.allgatherTime(
+                        full_bytes, devices)
+                comm_time += flops_mult * coll_time
+        costs = {
+            'parameters': sympy.expand(params),
+            'flops': sympy.expand(flops),
+            'bytes': sympy.expand(op_bytes),
+            'footprint': sympy.expand(footprint),
+            'comm_bytes': comm_bytes,
+        }
+        if comm_model is not None:
+            costs['comm_time'] = comm_time
+        return costs
@@ -22,6 +22,8 @@ class DataType(Enum):
 
     string = 12
 
+    bfloat16 = 13
+
     int8_ref = 21
     int16_ref = 22
     int32_ref = 23
@@ -42,7 +44,17 @@ class DataType(Enum):
                (type == DataType.uint64) or \
                (type == DataType.float16) or \
                (type == DataType.float32) or \
-               (type == DataType.float64)
+               (type == DataType.float64) or \
+               (type == DataType.bfloat16)
+
+    def isFloat(type):
+        return (type == DataType.float16) or \
+               (type == DataType.bfloat16) or \
+               (type == DataType.float32) or \
+               (type == DataType.float64) or \
+               (type == DataType.float16_ref) or \
+               (type == DataType.float32_ref) or \
+               (type == DataType.float64_ref)
 
     def isString(type):
         return (type == DataType.string)
@@ -61,6 +73,7 @@ class DataType(Enum):
                    DataType.float16: 2,
                    DataType.float32: 4,
                    DataType.float64: 8,
+                   DataType.bfloat16: 2,
                  }
         return sizeof[type]
 
@@ -175,6 +188,14 @@ class Tensor:
         assert self._producer is None
         self._producer = op
 
+    def setDataType(self, dtype):
+        # For analyses that evaluate alternative precisions (element sizes)
+        self._dtype = dtype
+
+    def resetProducer(self):
+        # For graph rewrites that replace the producer op
+        self._producer = None
+
     def addConsumer(self, op):
         if op.name in self._consumers.keys():
             assert self._consumers[op.name] == op
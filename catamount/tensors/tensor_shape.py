@@ -67,6 +67,7 @@ class Dimension(object):
         elif isinstance(symbol_or_name, int):
             self._value = symbol_or_name
         elif isinstance(symbol_or_name, (sympy.Symbol, sympy.Expr)):
+            utils.registerDimensionSymbols(symbol_or_name)
             self._symbol = symbol_or_name
         elif isinstance(symbol_or_name, Dimension):
             # Need to copy self._value and self._symbol if they are not None
@@ -77,6 +78,13 @@ class Dimension(object):
                        self._value == symbol_or_name.value
             # Always propagate symbols unless new symbol is None
             if symbol_or_name._symbol is not None:
+                if utils.recordDimensionAssignment(self) and \
+                   self._symbol is not None:
+                    # Both symbols name the same dimension in the current
+                    # propagation, so they are equal. Record it for the
+                    # propagating graph.
+                    utils.recordSymbolEquivalence(self._symbol,
+                                                  symbol_or_name._symbol)
                 self._symbol = symbol_or_name._symbol
         elif symbol_or_name is None:
             print('WARN: Trying to set symbol or name to None in {}'
@@ -97,6 +105,7 @@ class Dimension(object):
         # Dimensions have integer types, so specify that this symbol
         # represents an integer
         self._symbol = utils.getIntSymbolFromString(symbol_name)
+        utils.registerDimensionSymbols(self._symbol)
 
     @property
     def value(self):
@@ -221,6 +230,12 @@ class Dimension(object):
             if self._symbol != other._symbol:
                 print('WARN: Dimension symbols do not match: {} != {}'.format(
                       self._symbol, other._symbol))
+                # Broadcasting only shows the symbols are equal if both
+                # values are known (either could otherwise be 1)
+                if self._value is not None and self._value != 1 and \
+                   self._value == other._value:
+                    utils.recordSymbolEquivalence(self._symbol,
+                                                  other._symbol)
             new_symbol = self._symbol
         new_dim = Dimension(new_value)
         if new_symbol is not None:
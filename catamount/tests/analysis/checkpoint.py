@@ -0,0 +1,98 @@
+import sympy
+
+import catamount
+from catamount.analysis import StorageModel, calc_checkpoint_costs, \
+                               get_checkpoint_variables, shard_variables
+from catamount.graph import Graph
+from catamount.ops.optimizer_ops import ApplyMomentumOp
+from catamount.tensors.tensor import DataType, Tensor
+from catamount.tensors.tensor_shape import TensorShape
+
+from catamount.tests.utils.helpers import *
+
+
+def test_shard_variables():
+    sizes = {'a': 10, 'b': 40, 'c': 30, 'd': 20}
+    assert shard_variables(sizes, 1) == [['b', 'c', 'd', 'a']]
+    assert shard_variables(sizes, 2) == [['b', 'a'], ['c', 'd']]
+    assert shard_variables(sizes, 5) == [['b'], ['c'], ['d'], ['a'], []]
+    try:
+        shard_variables(sizes, 0)
+        assert False, 'Expected shard count error'
+    except ValueError:
+        pass
+
+
+def test_checkpoint_costs():
+    ''' Verify checkpoint sizes by data type, slot variables, shard layout,
+    and save and restore times for a momentum-trained layer.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        accum = variable('weights/Momentum', [None, None])
+        embedding = variable('embedding', [None, None])
+        embedding.setDataType(DataType.float16)
+        learning_rate = constant('learning_rate', [], 0.01)
+        momentum = constant('momentum', [], 0.9)
+        mm = matmul('matmul', [None, None], in_a, weights)
+        grad = matmul('gradients/matmul_grad', [None, None], in_a, mm)
+        graph.opsByName['gradients/matmul_grad'].setTransposeInput(0, True)
+        apply_op = ApplyMomentumOp('apply_momentum')
+        apply_op.addOutput(Tensor('apply_momentum',
+                                  TensorShape([None, None])))
+        graph.addOp(apply_op)
+        for in_tensor in [weights, accum, learning_rate, grad, momentum]:
+            graph.addInputToOp(apply_op, in_tensor)
+        graph.bindTensorShapeDimensions(
+            {'in_a': ['batch_size', 'hidden_dim'],
+             'weights': ['hidden_dim', 'hidden_dim'],
+             'weights/Momentum': ['hidden_dim', 'hidden_dim'],
+             'embedding': ['vocab_size', 'hidden_dim']})
+
+    assert [op.name for op in get_checkpoint_variables(graph)] == \
+           ['embedding', 'weights', 'weights/Momentum']
+    assert [op.name for op in
+            get_checkpoint_variables(graph, include_slots=False)] == \
+           ['embedding', 'weights']
+
+    # Symbolic sizes
+    hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+    vocab_size = utils.getIntSymbolFromString('vocab_size')
+    costs = calc_checkpoint_costs(graph)
+    assert sympy.simplify(costs['total_bytes'] - 8 * hidden_dim**2 -
+                          2 * vocab_size * hidden_dim) == 0
+    assert costs['bytes_by_dtype']['float16'] == 2 * vocab_size * hidden_dim
+    assert costs['slot_bytes'] == 4 * hidden_dim**2
+    assert 'shards' not in costs
+
+    # Bound sizes: weights and accumulator are 4MB each, embedding 8MB
+    bindings = {'hidden_dim': 1024, 'vocab_size': 4096}
+    storage = StorageModel(write_bandwidth=1.0e6, read_bandwidth=2.0e6,
+                           shard_bandwidth=6.0e5, latency=0.5)
+    costs = calc_checkpoint_costs(graph, num_shards=2, storage=storage,
+                                  bindings=bindings)
+    assert costs['num_parameters'] == 2 * 1024 * 1024 + 4096 * 1024
+    assert costs['total_bytes'] == 16 * 2**20
+    assert costs['bytes_by_dtype'] == {'float16': 8 * 2**20,
+                                       'float32': 8 * 2**20}
+    assert costs['slot_bytes'] == 4 * 2**20
+    assert costs['shards'] == [
+        {'variables': ['embedding'], 'bytes': 8 * 2**20},
+        {'variables': ['weights', 'weights/Momentum'], 'bytes': 8 * 2**20}]
+    # Writes split the aggregate bandwidth, reads are limited per shard
+    assert abs(costs['save_time'] - (0.5 + 8 * 2**20 / 5.0e5)) < 1e-9
+    assert abs(costs['restore_time'] - (0.5 + 8 * 2**20 / 6.0e5)) < 1e-9
+
+    # Without optimizer slots
+    costs = calc_checkpoint_costs(graph, include_slots=False,
+                                  bindings=bindings)
+    assert costs['total_bytes'] == 12 * 2**20
+    assert costs['slot_bytes'] == 0
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_shard_variables()
+    test_checkpoint_costs()
@@ -0,0 +1,88 @@
+import numpy as np
+import sympy
+
+import catamount
+from catamount.analysis import ExpectedCostAnalysis, SymbolHistogram
+from catamount.graph import Graph
+from catamount.simulator import load_hardware_profile
+
+from catamount.tests.utils.helpers import *
+
+
+def test_expected_costs():
+    ''' Verify expected costs and padding waste over sequence length and
+    subbatch size histograms against direct evaluation of each bucket.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        mm = matmul('matmul', [None, None], in_a, weights)
+        relu = pointwise('relu', catamount.ReluOp, [None, None], mm)
+        graph.bindTensorShapeDimensions(
+            {'in_a': ['seq_length', 'hidden_dim'],
+             'weights': ['hidden_dim', 'hidden_dim']})
+
+    seq_lengths = SymbolHistogram.fromSamples('seq_length',
+                                              [3, 5, 5, 9, 9, 9, 16])
+    batch_sizes = SymbolHistogram('batch_size', [1, 2], [3, 1])
+    assert np.isclose(seq_lengths.mean(), 56.0 / 7)
+    assert list(seq_lengths.getPaddedValues([8, 16])) == [8, 8, 16, 16]
+    assert list(seq_lengths.getPaddedValues([4])) == [4, 5, 9, 16]
+
+    analysis = ExpectedCostAnalysis(graph)
+    # batch_size does not appear in the graph costs: They do not change
+    results = analysis.evaluate([seq_lengths, batch_sizes],
+                                boundaries={'seq_length': [8, 16]},
+                                bindings={'hidden_dim': 32})
+    flops = graph.calcAlgFlops()
+    seq_length = utils.getIntSymbolFromString('seq_length')
+    hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+    expected = 0.0
+    useful = 0.0
+    for seq, prob in zip(seq_lengths.values, seq_lengths.probabilities):
+        padded = 8 if seq <= 8 else 16
+        expected += prob * float(flops.subs({seq_length: padded,
+                                             hidden_dim: 32}))
+        useful += prob * float(flops.subs({seq_length: int(seq),
+                                           hidden_dim: 32}))
+    assert np.isclose(results['expected']['flops'], expected)
+    assert np.isclose(results['useful']['flops'], useful)
+    assert np.isclose(results['padding_waste']['flops'],
+                      1.0 - useful / expected)
+    buckets = [(bucket['batch_size'], bucket['seq_length'])
+               for bucket, _ in results['buckets']]
+    assert buckets == [(1, 8), (1, 16), (2, 8), (2, 16)]
+    assert np.allclose([prob for _, prob in results['buckets']],
+                       [9.0 / 28, 12.0 / 28, 3.0 / 28, 4.0 / 28])
+
+    # Without padding, there is no waste, and finer buckets waste less
+    compared = analysis.compareBucketings(
+        [seq_lengths], {'none': {}, 'coarse': {'seq_length': [16]},
+                        'fine': {'seq_length': [4, 8, 12, 16]}},
+        bindings={'hidden_dim': 32})
+    for metric in ['flops', 'bytes', 'footprint']:
+        assert compared['none']['padding_waste'][metric] == 0.0
+        assert compared['fine']['padding_waste'][metric] < \
+               compared['coarse']['padding_waste'][metric]
+
+    # Expected step time with a hardware profile
+    hw_analysis = ExpectedCostAnalysis(graph, load_hardware_profile('a100'))
+    assert 'step_time' in hw_analysis.metrics
+    results = hw_analysis.evaluate([seq_lengths],
+                                   boundaries={'seq_length': [8, 16]},
+                                   bindings={'hidden_dim': 32})
+    assert results['expected']['step_time'] > \
+           results['useful']['step_time'] > 0.0
+
+    try:
+        analysis.evaluate([seq_lengths], boundaries={'hidden_dim': [64]},
+                          bindings={'hidden_dim': 32})
+        assert False, 'Expected boundaries without a histogram error'
+    except ValueError:
+        pass
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_expected_costs()
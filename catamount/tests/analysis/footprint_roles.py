@@ -0,0 +1,131 @@
+import sympy
+
+import catamount
+from catamount.analysis import calc_footprint_by_role, \
+                               classify_tensor_roles, TENSOR_ROLES
+from catamount.graph import Graph
+from catamount.ops.math_ops import LessOp
+from catamount.ops.optimizer_ops import ApplyMomentumOp
+from catamount.tensors.tensor import Tensor
+from catamount.tensors.tensor_shape import TensorShape
+
+from catamount.tests.api.loop_iters import build_counter_loop
+from catamount.tests.utils.helpers import *
+
+
+def build_training_graph():
+    ''' A matmul and relu layer, the weights gradient, and a momentum
+    update of the weights.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        accum = variable('accum', [None, None])
+        learning_rate = constant('learning_rate', [], 0.01)
+        momentum = constant('momentum', [], 0.9)
+        bind_dict = {'in_a': ['batch_size', 'hidden_dim'],
+                     'weights': ['hidden_dim', 'hidden_dim'],
+                     'accum': ['hidden_dim', 'hidden_dim']}
+        mm = matmul('matmul', [None, None], in_a, weights)
+        relu = pointwise('relu', catamount.ReluOp, [None, None], mm)
+        grad = matmul('gradients/matmul_grad', [None, None], in_a, relu)
+        graph.opsByName['gradients/matmul_grad'].setTransposeInput(0, True)
+        apply_op = ApplyMomentumOp('apply_momentum')
+        apply_op.addOutput(Tensor('apply_momentum',
+                                  TensorShape([None, None])))
+        graph.addOp(apply_op)
+        for in_tensor in [weights, accum, learning_rate, grad, momentum]:
+            graph.addInputToOp(apply_op, in_tensor)
+        graph.bindTensorShapeDimensions(bind_dict)
+    return graph
+
+
+def test_footprint_by_role():
+    ''' Verify tensor roles, and the footprint and minimal footprint of
+    each role.
+    '''
+    graph = build_training_graph()
+    roles = classify_tensor_roles(graph)
+    assert roles['weights'] == 'weights'
+    assert roles['apply_momentum'] == 'weights'
+    assert roles['accum'] == 'optimizer_state'
+    assert roles['learning_rate'] == 'constants'
+    assert roles['gradients/matmul_grad'] == 'gradients'
+    # Saved for the backward pass
+    assert roles['relu'] == 'activations'
+    assert roles['in_a'] == 'activations'
+    assert roles['matmul'] == 'workspace'
+
+    batch = utils.getIntSymbolFromString('batch_size')
+    hidden = utils.getIntSymbolFromString('hidden_dim')
+    graph_iters = graph.getLoopIters()
+    breakdown = calc_footprint_by_role(graph)
+    footprint = breakdown['footprint']
+    assert sympy.simplify(footprint['weights'] - 4 * hidden * hidden) == 0
+    assert footprint['constants'] == 8
+    assert sympy.simplify(footprint['optimizer_state'] -
+                          4 * hidden * hidden) == 0
+    assert sympy.simplify(footprint['gradients'] - 4 * hidden * hidden) == 0
+    assert sympy.simplify(footprint['activations'] - 8 * batch * hidden) == 0
+    assert sympy.simplify(footprint['workspace'] - 4 * batch * hidden) == 0
+    assert sympy.simplify(footprint['total'] - graph.calcAlgFootprint()) == 0
+    minimal = breakdown['minimal_footprint']
+    assert minimal['total'] == \
+           graph.calcMinimalFootprint(symbol_subs={graph_iters: 1})
+    assert sympy.simplify(minimal['workspace'] - 4 * batch * hidden) == 0
+
+    # Activations are 512 bytes, and weights 1024 bytes
+    bindings = {'batch_size': 8, 'hidden_dim': 16}
+    breakdown = calc_footprint_by_role(graph, bindings)
+    assert breakdown['footprint']['total'] == \
+           float(graph.calcAlgFootprint().subs({batch: 8, hidden: 16}))
+    minimal = breakdown['minimal_footprint']
+    assert minimal['weights'] == 1024
+    assert minimal['constants'] == 8
+    assert minimal['optimizer_state'] == 1024
+    assert minimal['activations'] == 1024
+    assert minimal['workspace'] == 512
+    assert minimal['gradients'] == 1024
+    # Peak while computing the gradient: Persistent tensors, relu, and the
+    # gradient
+    assert minimal['total'] == 2568 + 512 + 1024
+    assert minimal['total'] == float(graph.calcMinimalFootprint(
+        symbol_subs={batch: 8, hidden: 16, graph_iters: 1}))
+    reset_symbols()
+
+
+def test_footprint_by_role_loops():
+    ''' Verify that the minimal footprint breakdown follows the graph's own
+    minimal footprint traversal for graphs with loops.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        zero = constant('zero', [], 0)
+        bound = constant('bound', [], None)
+        block, loop_out = build_counter_loop(graph, 'while', zero, bound, 1,
+                                             LessOp, in_a)
+        relu = pointwise('relu', catamount.ReluOp, [None, None], in_a)
+        graph.bindTensorShapeDimensions({'in_a': ['batch_size',
+                                                  'hidden_dim']})
+
+    batch = utils.getIntSymbolFromString('batch_size')
+    hidden = utils.getIntSymbolFromString('hidden_dim')
+    loop_iters = utils.getIntSymbolFromString('while/LoopCond_block::iters')
+    bindings = {batch: 8, hidden: 16, loop_iters: 5}
+    minimal = calc_footprint_by_role(graph, bindings)['minimal_footprint']
+    graph_min = float(graph.calcMinimalFootprint(
+        symbol_subs={batch: 8, hidden: 16, loop_iters: 5,
+                     graph.getLoopIters(): 1}))
+    assert minimal['total'] == graph_min
+    role_peaks = [minimal[role] for role in TENSOR_ROLES]
+    assert max(role_peaks) <= minimal['total'] <= sum(role_peaks)
+    # The loop's init, bound, and step constants
+    assert minimal['constants'] == 12
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_footprint_by_role()
+    test_footprint_by_role_loops()
@@ -0,0 +1,96 @@
+import sympy
+
+import catamount
+from catamount.analysis import calc_fused_bytes, calc_fused_footprint, \
+                               collapse_fusion_groups, find_fusion_groups, \
+                               fusion_report
+from catamount.graph import Graph
+
+from catamount.tests.utils.helpers import *
+
+
+def build_gate_graph():
+    ''' A matmul with a bias-add, LSTM-like gate activations, and a
+    reduction, followed by a second matmul with a relu.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        bias = variable('bias', [None, None])
+        weights_2 = variable('weights_2', [None, None])
+        bind_dict = {'in_a': ['batch_size', 'hidden_dim'],
+                     'weights': ['hidden_dim', 'hidden_dim'],
+                     'bias': ['batch_size', 'hidden_dim'],
+                     'weights_2': ['hidden_dim', 'hidden_dim']}
+        mm = matmul('matmul', [None, None], in_a, weights)
+        biased = pointwise('bias_add', catamount.AddOp, [None, None], mm,
+                           bias)
+        sig = pointwise('sigmoid', catamount.SigmoidOp, [None, None], biased)
+        tanh = pointwise('tanh', catamount.TanhOp, [None, None], biased)
+        gate = pointwise('mul', catamount.MulOp, [None, None], sig, tanh)
+        reduce('reduce', 'sum', [None], gate, axes=1)
+        mm_2 = matmul('matmul_2', [None, None], gate, weights_2)
+        pointwise('relu', catamount.ReluOp, [None, None], mm_2)
+        graph.bindTensorShapeDimensions(bind_dict)
+    return graph
+
+
+def test_pointwise_fusion():
+    ''' Verify fusion groups, fused bytes and footprint, and collapsing
+    groups into FusedOps.
+    '''
+    graph = build_gate_graph()
+    groups = find_fusion_groups(graph)
+    assert [group.opNames for group in groups] == \
+           [['matmul', 'bias_add', 'sigmoid', 'tanh', 'mul', 'reduce'],
+            ['matmul_2', 'relu']]
+
+    batch = utils.getIntSymbolFromString('batch_size')
+    hidden = utils.getIntSymbolFromString('hidden_dim')
+    act = 4 * batch * hidden
+    weight = 4 * hidden * hidden
+    gate_group = groups[0]
+    # External inputs: in_a, weights, bias. External outputs: mul (also
+    # read by matmul_2) and reduce
+    unfused = (act + weight + act) + 3 * act + 2 * (2 * act) + \
+              3 * act + (act + 4 * batch)
+    fused = act + weight + act + act + 4 * batch
+    assert sympy.simplify(gate_group.calcUnfusedBytes() - unfused) == 0
+    assert sympy.simplify(gate_group.calcFusedBytes() - fused) == 0
+    assert sympy.simplify(gate_group.calcBytesSavings() -
+                          (unfused - fused)) == 0
+    # Intermediates: matmul, bias_add, sigmoid, and tanh outputs
+    assert sympy.simplify(gate_group.calcUnfusedFootprint() -
+                          gate_group.calcFusedFootprint() - 4 * act) == 0
+
+    relu_savings = groups[1].calcBytesSavings()
+    assert sympy.simplify(relu_savings - 2 * act) == 0
+    fused_bytes = calc_fused_bytes(graph, groups)
+    assert sympy.simplify(graph.calcAlgBytes() - fused_bytes -
+                          (unfused - fused) - 2 * act) == 0
+    fused_footprint = calc_fused_footprint(graph, groups)
+
+    report = fusion_report(groups, {'batch_size': 8, 'hidden_dim': 16})
+    assert report[0]['name'] == 'matmul/fused'
+    assert report[0]['savings'] == float(
+        (unfused - fused).subs({batch: 8, hidden: 16}))
+    assert report[1]['savings'] == 2 * 8 * 16 * 4
+
+    alg_flops = graph.calcAlgFlops()
+    fused_ops = collapse_fusion_groups(graph, groups)
+    assert [op.name for op in fused_ops] == ['matmul/fused',
+                                             'matmul_2/fused']
+    assert fused_ops[0].fusedOpNames == groups[0].opNames
+    assert graph.isValid()
+    assert 'sigmoid' not in graph.opsByName
+    assert sympy.simplify(graph.calcAlgFlops() - alg_flops) == 0
+    assert sympy.simplify(graph.calcAlgBytes() - fused_bytes) == 0
+    assert sympy.simplify(graph.calcAlgFootprint() - fused_footprint) == 0
+    # No further fusion opportunities
+    assert len(find_fusion_groups(graph)) == 0
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_pointwise_fusion()
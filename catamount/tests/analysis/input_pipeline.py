@@ -0,0 +1,90 @@
+import sympy
+
+import catamount
+from catamount.analysis import InputPipelineModel, calc_input_bytes, \
+                               calc_input_pipeline, get_input_ops
+from catamount.graph import Graph
+from catamount.ops.unknown_op import UnknownOp
+from catamount.simulator import HardwareProfile
+from catamount.tensors.tensor import Tensor
+from catamount.tensors.tensor_shape import TensorShape
+
+from catamount.tests.utils.helpers import *
+
+
+def test_input_pipeline():
+    ''' Verify input bytes from placeholders and iterator ops, pipeline
+    stage times, and input-bound detection against the roofline.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        images = placeholder('images', [None, None])
+        # Iterator ops are recognized by TF op type, not by name
+        iterator = UnknownOp('data/labels')
+        iterator.setOpType('IteratorGetNext')
+        iterator.addOutput(Tensor('data/labels', TensorShape([None])))
+        graph.addOp(iterator)
+        other = UnknownOp('data/IteratorGetNext_stats')
+        other.setOpType('IteratorToStringHandle')
+        other.addOutput(Tensor('data/IteratorGetNext_stats',
+                               TensorShape([])))
+        graph.addOp(other)
+        weights = variable('weights', [None, None])
+        mm = matmul('matmul', [None, None], images, weights)
+        graph.bindTensorShapeDimensions(
+            {'images': ['batch_size', 'image_size'],
+             'weights': ['image_size', 'hidden_dim']})
+        iterator.outputs[0].shape.mergeShape(
+            [utils.getIntSymbolFromString('batch_size')])
+
+    assert [op.name for op in get_input_ops(graph)] == \
+           ['data/labels', 'images']
+    batch_size = utils.getIntSymbolFromString('batch_size')
+    image_size = utils.getIntSymbolFromString('image_size')
+    # float32 images and labels
+    input_bytes = calc_input_bytes(graph)
+    assert sympy.simplify(input_bytes -
+                          4 * batch_size * (image_size + 1)) == 0
+
+    # Per step: 4 * 64 * 1025 bytes = 262400
+    pipeline = InputPipelineModel(storage_bandwidth=1.0e6,
+                                  host_device_bandwidth=1.0e7,
+                                  decode_bandwidth=1.0e5,
+                                  num_decode_workers=4,
+                                  storage_bytes_ratio=0.5)
+    bindings = {'batch_size': 64, 'image_size': 1024, 'hidden_dim': 256}
+    results = calc_input_pipeline(graph, pipeline, 'batch_size', bindings)
+    assert results['input_bytes'] == 262400.0
+    assert results['bytes_per_sample'] == 4100.0
+    assert abs(results['stage_times']['storage'] - 0.1312) < 1e-9
+    assert abs(results['stage_times']['decode'] - 0.656) < 1e-9
+    assert abs(results['stage_times']['transfer'] - 0.02624) < 1e-9
+    assert results['bottleneck'] == 'decode'
+    assert abs(results['max_samples_per_second'] - 64 / 0.656) < 1e-6
+    assert abs(pipeline.calcMaxSamplesPerSecond(4100.0) -
+               results['max_samples_per_second']) < 1e-6
+
+    # Symbolic results without bindings
+    symbolic = calc_input_pipeline(graph, pipeline, 'batch_size')
+    assert sympy.simplify(symbolic['bytes_per_sample'] -
+                          4 * (image_size + 1)) == 0
+
+    # Slow compute hides the input pipeline, fast compute exposes it
+    slow = HardwareProfile('slow', {'default': 1.0e6}, mem_bandwidth=1.0e9,
+                           onchip_capacity=1024, launch_overhead=0.0)
+    fast = HardwareProfile('fast', {'default': 1.0e12},
+                           mem_bandwidth=1.0e12, onchip_capacity=1024,
+                           launch_overhead=0.0)
+    results = calc_input_pipeline(graph, pipeline, 'batch_size', bindings,
+                                  hardware=slow)
+    assert not results['input_bound']
+    assert results['step_time'] == results['compute_time']
+    results = calc_input_pipeline(graph, pipeline, 'batch_size', bindings,
+                                  hardware=fast)
+    assert results['input_bound']
+    assert results['step_time'] == results['input_time']
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_input_pipeline()
@@ -0,0 +1,87 @@
+import catamount
+from catamount.analysis import MemoryPlanner
+from catamount.graph import Graph
+
+from catamount.tests.utils.helpers import *
+
+
+def build_mlp(num_layers):
+    graph = Graph()
+    with graph.asDefault():
+        layer = placeholder('in_a', [None, None])
+        bind_dict = {'in_a': ['batch_size', 'hidden_dim']}
+        for idx in range(num_layers):
+            weights = variable('weights_{}'.format(idx), [None, None])
+            bind_dict[weights.name] = ['hidden_dim', 'hidden_dim']
+            layer = matmul('matmul_{}'.format(idx), [None, None], layer,
+                           weights)
+            layer = pointwise('relu_{}'.format(idx), catamount.ReluOp,
+                              [None, None], layer)
+        graph.bindTensorShapeDimensions(bind_dict)
+    return graph
+
+
+def check_no_overlaps(plan):
+    for buffer in plan.buffers:
+        assert buffer.offset % 64 == 0
+        assert buffer.size % 64 == 0
+        for other in plan.buffers:
+            if other is buffer or not buffer.overlapsLifetime(other):
+                continue
+            assert buffer.offset + buffer.size <= other.offset or \
+                   other.offset + other.size <= buffer.offset, \
+                   'Buffers {} and {} overlap'.format(buffer.name, other.name)
+
+
+def test_memory_planner():
+    ''' Verify arena offsets, in-place reuse, and fragmentation for each
+    planning strategy.
+    '''
+    num_layers = 4
+    graph = build_mlp(num_layers)
+    # Activations are 8 * 16 * 4 = 512 bytes, and weights are 1024 bytes
+    bindings = {'batch_size': 8, 'hidden_dim': 16}
+    act_size = 512
+    persistent_bytes = act_size + num_layers * 1024
+    planner = MemoryPlanner(graph)
+
+    naive = planner.plan(bindings, strategy='naive')
+    check_no_overlaps(naive)
+    # Each relu writes in place into its matmul output
+    assert sorted(naive.inPlaceTensors) == \
+           ['relu_{}'.format(idx) for idx in range(num_layers)]
+    assert naive.tensorOffsets['relu_0'] == \
+           naive.tensorOffsets['matmul_0']
+    assert naive.arena_size == persistent_bytes + num_layers * act_size
+    # At most two layers' activations are live at once
+    assert naive.peak_live_bytes == persistent_bytes + 2 * act_size
+    assert naive.tensor_bytes == persistent_bytes + \
+                                 2 * num_layers * act_size
+
+    for strategy in ['greedy_by_size', 'best_fit']:
+        plan = planner.plan(bindings, strategy=strategy)
+        check_no_overlaps(plan)
+        assert plan.arena_size == persistent_bytes + 2 * act_size
+        assert plan.fragmentation == 0.0
+        assert naive.fragmentation > plan.fragmentation
+
+    no_in_place = MemoryPlanner(graph, in_place=False).plan(bindings)
+    check_no_overlaps(no_in_place)
+    assert len(no_in_place.inPlaceTensors) == 0
+    assert no_in_place.arena_size == persistent_bytes + 2 * act_size
+
+    activations = MemoryPlanner(graph, include_persistent=False,
+                                alignment=1024).plan(bindings)
+    check_no_overlaps(activations)
+    assert activations.arena_size == 2 * 1024
+    assert 'weights_0' not in activations.tensorOffsets
+    try:
+        planner.plan(bindings, strategy='unknown')
+        assert False, 'Expected unknown strategy error'
+    except ValueError:
+        pass
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_memory_planner()
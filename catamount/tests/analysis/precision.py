@@ -0,0 +1,110 @@
+import catamount
+from catamount.analysis import PrecisionPolicy, calc_precision_costs, \
+                               classify_tensor_roles, \
+                               compare_precision_policies
+from catamount.graph import Graph
+from catamount.ops.optimizer_ops import ApplyMomentumOp
+from catamount.simulator import load_hardware_profile
+from catamount.tensors.tensor import DataType, Tensor
+from catamount.tensors.tensor_shape import TensorShape
+
+from catamount.tests.utils.helpers import *
+
+
+def build_training_graph():
+    ''' A matmul and relu layer, the weights gradient, and a momentum
+    update of the weights.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        accum = variable('accum', [None, None])
+        learning_rate = constant('learning_rate', [], 0.01)
+        momentum = constant('momentum', [], 0.9)
+        bind_dict = {'in_a': ['batch_size', 'hidden_dim'],
+                     'weights': ['hidden_dim', 'hidden_dim'],
+                     'accum': ['hidden_dim', 'hidden_dim']}
+        mm = matmul('matmul', [None, None], in_a, weights)
+        relu = pointwise('relu', catamount.ReluOp, [None, None], mm)
+        grad = matmul('gradients/matmul_grad', [None, None], in_a, relu)
+        graph.opsByName['gradients/matmul_grad'].setTransposeInput(0, True)
+        apply_op = ApplyMomentumOp('apply_momentum')
+        apply_op.addOutput(Tensor('apply_momentum',
+                                  TensorShape([None, None])))
+        graph.addOp(apply_op)
+        for in_tensor in [weights, accum, learning_rate, grad, momentum]:
+            graph.addInputToOp(apply_op, in_tensor)
+        graph.bindTensorShapeDimensions(bind_dict)
+    return graph
+
+
+def test_precision_policy():
+    ''' Verify tensor roles, policy rule priorities, master weights, and
+    comparing precision recipes for one graph.
+    '''
+    graph = build_training_graph()
+    roles = classify_tensor_roles(graph)
+    assert roles['weights'] == 'weights'
+    assert roles['accum'] == 'optimizer_state'
+    assert roles['gradients/matmul_grad'] == 'gradients'
+    assert roles['relu'] == 'activations'
+    assert roles['in_a'] == 'activations'
+
+    batch = utils.getIntSymbolFromString('batch_size')
+    hidden = utils.getIntSymbolFromString('hidden_dim')
+    fp32 = PrecisionPolicy('fp32')
+    mixed = PrecisionPolicy('fp16_mixed', default=DataType.float16,
+                            roles={'optimizer_state': DataType.float32},
+                            master_weights=DataType.float32)
+    dtypes = mixed.getTensorDataTypes(graph)
+    assert 'accum' not in dtypes
+    assert dtypes['weights'] == DataType.float16
+    assert dtypes['learning_rate'] == DataType.float16
+    # Only variables keep master copies
+    assert mixed.calcMasterWeightBytes(graph) == 4 * hidden * hidden
+    assert fp32.calcMasterWeightBytes(graph) == 0
+
+    alg_bytes = graph.calcAlgBytes()
+    with mixed.apply(graph):
+        assert graph.opsByName['weights'].outputs[0].dtype == \
+               DataType.float16
+        mixed_bytes = graph.calcAlgBytes()
+    assert graph.opsByName['weights'].outputs[0].dtype == DataType.float32
+    assert graph.calcAlgBytes() == alg_bytes
+    assert mixed_bytes != alg_bytes
+
+    # Tensor rules take priority over scopes, then op types, then roles
+    quant = PrecisionPolicy('int8', default=DataType.float16,
+                            roles={'weights': DataType.int8},
+                            op_types={'ReluOp': DataType.bfloat16},
+                            scopes={'gradients': DataType.float32},
+                            tensors={'accum': DataType.float64})
+    dtypes = quant.getTensorDataTypes(graph)
+    assert dtypes['weights'] == DataType.int8
+    assert dtypes['relu'] == DataType.bfloat16
+    assert 'gradients/matmul_grad' not in dtypes
+    assert dtypes['accum'] == DataType.float64
+    assert dtypes['matmul'] == DataType.float16
+
+    bindings = {'batch_size': 32, 'hidden_dim': 1024}
+    results = compare_precision_policies(graph, [fp32, mixed], bindings,
+                                         load_hardware_profile('a100'))
+    assert [result['policy'] for result in results] == ['fp32',
+                                                         'fp16_mixed']
+    fp32_costs, mixed_costs = results
+    assert mixed_costs['flops'] == fp32_costs['flops']
+    assert mixed_costs['bytes'] < fp32_costs['bytes']
+    assert mixed_costs['master_weight_bytes'] == 4 * 1024 * 1024
+    # Half-size weights plus master weights equal fp32 weights footprint
+    assert mixed_costs['footprint'] < fp32_costs['footprint']
+    assert mixed_costs['step_time'] < fp32_costs['step_time']
+    symbolic = calc_precision_costs(graph, mixed)
+    assert symbolic['master_weight_bytes'] == 4 * hidden * hidden
+    assert float(symbolic['bytes'].subs({batch: 32, hidden: 1024})) == \
+           mixed_costs['bytes']
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_precision_policy()
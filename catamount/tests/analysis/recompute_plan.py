@@ -0,0 +1,136 @@
+import numpy as np
+import time
+
+import catamount
+from catamount.analysis import RecomputePlanner
+from catamount.graph import Graph
+
+from catamount.tests.utils.helpers import *
+
+
+def build_training_mlp(num_layers):
+    ''' A chain of matmul-relu layers and a backward pass that reads each
+    relu activation.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        layer = placeholder('in_a', [None, None])
+        bind_dict = {'in_a': ['batch_size', 'hidden_dim']}
+        activations = []
+        for idx in range(num_layers):
+            weights = variable('weights_{}'.format(idx), [None, None])
+            bind_dict[weights.name] = ['hidden_dim', 'hidden_dim']
+            layer = matmul('matmul_{}'.format(idx), [None, None], layer,
+                           weights)
+            layer = pointwise('relu_{}'.format(idx), catamount.ReluOp,
+                              [None, None], layer)
+            activations.append(layer)
+        grad = activations[-1]
+        for idx in reversed(range(num_layers)):
+            grad = pointwise('gradients/mul_{}'.format(idx),
+                             catamount.MulOp, [None, None], grad,
+                             activations[idx])
+        graph.bindTensorShapeDimensions(bind_dict)
+    return graph
+
+
+def test_recompute_planner():
+    ''' Verify sqrt(N) and memory-budgeted recomputation plans.
+    '''
+    num_layers = 16
+    graph = build_training_mlp(num_layers)
+    bindings = {'batch_size': 32, 'hidden_dim': 64}
+    act_size = 32 * 64 * 4
+    param_bytes = num_layers * 64 * 64 * 4
+    matmul_flops = 2 * 32 * 64 * 64
+    relu_flops = 32 * 64
+    planner = RecomputePlanner(graph)
+
+    keep_all = planner.planNoRecompute(bindings)
+    assert keep_all.baseline_activation_bytes == num_layers * act_size
+    assert keep_all.param_bytes == param_bytes
+    assert keep_all.extra_flops == 0
+    assert keep_all.peakFootprint == keep_all.baselineFootprint
+    assert len(keep_all.checkpoints) == num_layers
+
+    # 32 forward ops: ceil(sqrt(32)) = 6 segments
+    sqrt_plan = planner.planSqrtN(bindings)
+    assert len(sqrt_plan.checkpoints) == 5
+    assert len(sqrt_plan.segments) == 6
+    assert sqrt_plan.peakFootprint < keep_all.peakFootprint
+
+    # 4 segments of 4 layers, checkpointing relu_3, relu_7, and relu_11
+    sqrt_plan = planner.planSqrtN(bindings, num_segments=4)
+    assert sqrt_plan.checkpoints == ['relu_3', 'relu_7', 'relu_11']
+    assert len(sqrt_plan.segments) == 4
+    assert sqrt_plan.stored_bytes == 3 * act_size
+    assert sqrt_plan.max_segment_bytes == 4 * act_size
+    assert sqrt_plan.peakActivationBytes == 7 * act_size
+    assert sqrt_plan.savedBytes == 9 * act_size
+    assert np.isclose(sqrt_plan.extra_flops,
+                      13 * (matmul_flops + relu_flops))
+
+    # A large budget needs no recomputation
+    budget_plan = planner.planMemoryBudget(bindings,
+                                           keep_all.baselineFootprint)
+    assert budget_plan.extra_flops == 0
+    # Tighter budgets trade memory for recomputation
+    loose_plan = planner.plan(bindings, param_bytes + 10 * act_size)
+    assert loose_plan.peakFootprint <= param_bytes + 10 * act_size
+    assert loose_plan.extra_flops > 0
+    # The minimum with 16 layers is 7 activations (e.g., as in sqrt(N))
+    tight_plan = planner.planMemoryBudget(bindings,
+                                          param_bytes + 7 * act_size)
+    assert tight_plan.peakFootprint <= param_bytes + 7 * act_size
+    assert tight_plan.extra_flops > loose_plan.extra_flops
+    assert tight_plan.extra_flops <= sqrt_plan.extra_flops
+    try:
+        planner.planMemoryBudget(bindings, param_bytes + 6 * act_size)
+        assert False, 'Expected infeasible memory budget'
+    except ValueError:
+        pass
+    reset_symbols()
+
+def test_recompute_planner_scaling():
+    ''' Verify that memory-budgeted planning of thousands of forward ops
+    restricts candidate checkpoints, so it runs quickly, and still nearly
+    matches the sqrt(N) plan's recomputation with the same memory.
+    '''
+    num_layers = 1000
+    graph = Graph()
+    with graph.asDefault():
+        # Static shapes keep graph construction fast
+        layer = catamount.placeholder('in_a', [32, 64])
+        activations = []
+        for idx in range(num_layers):
+            weights = catamount.variable('weights_{}'.format(idx), [64, 64])
+            layer = catamount.matmul('matmul_{}'.format(idx), [32, 64],
+                                     layer, weights)
+            layer = catamount.pointwise('relu_{}'.format(idx),
+                                        catamount.ReluOp, [32, 64], layer)
+            activations.append(layer)
+        grad = activations[-1]
+        for idx in reversed(range(num_layers)):
+            grad = catamount.pointwise('gradients/mul_{}'.format(idx),
+                                       catamount.MulOp, [32, 64], grad,
+                                       activations[idx])
+    planner = RecomputePlanner(graph)
+    sqrt_plan = planner.planSqrtN({})
+
+    start_time = time.time()
+    budget_plan = planner.planMemoryBudget({}, sqrt_plan.peakFootprint)
+    elapsed = time.time() - start_time
+    print('Planned {} forward ops in {:.2f}s'.format(2 * num_layers,
+                                                     elapsed))
+    assert elapsed < 30.0
+    assert len(budget_plan.checkpoints) <= 128
+    assert budget_plan.peakFootprint <= sqrt_plan.peakFootprint
+    # Checkpoints are restricted to 128 candidates, so they cannot align
+    # exactly with the sqrt(N) plan's 44 checkpoints
+    assert budget_plan.extra_flops <= 1.05 * sqrt_plan.extra_flops
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_recompute_planner()
+    test_recompute_planner_scaling()
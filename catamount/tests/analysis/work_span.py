@@ -0,0 +1,76 @@
+import numpy as np
+
+import catamount
+from catamount.analysis import calc_work_span
+from catamount.graph import Graph
+from catamount.simulator import HardwareProfile, RooflineSimulator
+
+from catamount.tests.utils.helpers import *
+
+
+def build_diamond_graph():
+    ''' Two parallel matmul branches (the second followed by a relu) that
+    are added together.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights_1 = variable('weights_1', [None, None])
+        weights_2 = variable('weights_2', [None, None])
+        bind_dict = {'in_a': ['batch_size', 'hidden_dim'],
+                     'weights_1': ['hidden_dim', 'hidden_dim'],
+                     'weights_2': ['hidden_dim', 'hidden_dim']}
+        mm_1 = matmul('matmul_1', [None, None], in_a, weights_1)
+        mm_2 = matmul('matmul_2', [None, None], in_a, weights_2)
+        relu = pointwise('relu', catamount.ReluOp, [None, None], mm_2)
+        pointwise('add', catamount.AddOp, [None, None], mm_1, relu)
+        graph.bindTensorShapeDimensions(bind_dict)
+    return graph
+
+
+def test_work_span():
+    ''' Verify work, span, parallelism, and critical path for Flops and
+    simulated op times.
+    '''
+    graph = build_diamond_graph()
+    bindings = {'batch_size': 8, 'hidden_dim': 16}
+    matmul_flops = 2 * 8 * 16 * 16
+    pointwise_flops = 8 * 16
+
+    result = calc_work_span(graph, 'flops', bindings)
+    assert result.work == 2 * matmul_flops + 2 * pointwise_flops
+    assert result.span == matmul_flops + 2 * pointwise_flops
+    assert np.isclose(result.parallelism, result.work / result.span)
+    assert result.parallelism > 1.0
+    assert result.critical_path == ['in_a', 'matmul_2', 'relu', 'add']
+    assert graph.calcAlgFlops().subs(
+        {utils.getIntSymbolFromString(name): value
+         for name, value in bindings.items()}) == result.work
+
+    # Op costs from a dictionary, e.g., simulated op times
+    hardware = HardwareProfile('test_hw', {'default': 1.0e9},
+                               mem_bandwidth=1.0e12, onchip_capacity=1024,
+                               launch_overhead=0.0)
+    sim_results = RooflineSimulator(graph, hardware).evaluate(bindings)
+    op_times = {name: float(times[0])
+                for name, times in sim_results['op_times'].items()}
+    times = calc_work_span(graph, op_times)
+    assert np.isclose(times.work, sum(op_times.values()))
+    assert np.isclose(times.span, op_times['matmul_2'] + op_times['relu'] +
+                                  op_times['add'])
+    assert times.critical_path[-3:] == ['matmul_2', 'relu', 'add']
+
+    # Custom cost functions
+    unit = calc_work_span(graph, lambda op: 1)
+    assert unit.work == len(graph.opsByName)
+    assert unit.span == 4
+    try:
+        calc_work_span(graph, 'unknown')
+        assert False, 'Expected unknown cost metric error'
+    except ValueError:
+        pass
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_work_span()
@@ -0,0 +1,134 @@
+import sympy
+
+import catamount
+from catamount.graph import Graph
+from catamount.graph.placement import canonicalize_device, \
+                                      get_device_transfers, get_op_device
+from catamount.ops.ctrl_ops import ControlBlockOp, LoopConditionOp
+from catamount.tensors.tensor import Tensor
+from catamount.tensors.tensor_shape import TensorShape
+from catamount.simulator import HardwareProfile, LinkModel, \
+                                RooflineSimulator
+
+from catamount.tests.utils.helpers import *
+
+
+def test_canonicalize_device():
+    assert canonicalize_device('') is None
+    assert canonicalize_device('/gpu:1') == '/device:GPU:1'
+    assert canonicalize_device('/device:GPU:1') == '/device:GPU:1'
+    assert canonicalize_device('/job:worker/task:2/device:cpu:0') == \
+           '/job:worker/task:2/device:CPU:0'
+    assert canonicalize_device('/replica:0/job:localhost/gpu:0') == \
+           '/job:localhost/replica:0/device:GPU:0'
+
+
+def test_device_placement():
+    ''' Verify per-device cost aggregation and cross-device transfers for a
+    two-GPU model-parallel graph, and transfer times in the roofline.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights_0 = variable('weights_0', [None, None])
+        weights_1 = variable('weights_1', [None, None])
+        mm_0 = matmul('tower_0/matmul', [None, None], in_a, weights_0)
+        relu_0 = pointwise('tower_0/relu', catamount.ReluOp, [None, None],
+                           mm_0)
+        mm_1 = matmul('tower_1/matmul', [None, None], relu_0, weights_1)
+        relu_1 = pointwise('tower_1/relu', catamount.ReluOp, [None, None],
+                           mm_1)
+        # A second consumer on GPU:1 shares the transfer of relu_0
+        add = pointwise('tower_1/add', catamount.AddOp, [None, None], relu_0,
+                        relu_1)
+        graph.bindTensorShapeDimensions(
+            {'in_a': ['batch_size', 'hidden_dim'],
+             'weights_0': ['hidden_dim', 'hidden_dim'],
+             'weights_1': ['hidden_dim', 'hidden_dim']})
+    for name in ['weights_0', 'tower_0/matmul', 'tower_0/relu']:
+        graph.opsByName[name].setDevice('/device:GPU:0')
+    for name in ['weights_1', 'tower_1/matmul', 'tower_1/relu',
+                 'tower_1/add']:
+        graph.opsByName[name].setDevice('/device:GPU:1')
+
+    batch_size = utils.getIntSymbolFromString('batch_size')
+    hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+    assert graph.getDevices() == ['/device:GPU:0', '/device:GPU:1',
+                                  'unplaced']
+    assert graph.getDevices('/device:CPU:0') == \
+           ['/device:CPU:0', '/device:GPU:0', '/device:GPU:1']
+    costs = graph.calcDeviceCosts(default_device='/device:CPU:0')
+    assert costs['/device:CPU:0']['flops'] == 0
+    assert costs['/device:CPU:0']['parameters'] == 0
+    assert costs['/device:GPU:0']['parameters'] == hidden_dim**2
+    assert costs['/device:GPU:1']['parameters'] == hidden_dim**2
+    graph_totals = {'flops': graph.calcAlgFlops(),
+                    'bytes': graph.calcAlgBytes(),
+                    'footprint': graph.calcAlgFootprint()}
+    for metric, graph_total in graph_totals.items():
+        total = sum(device_costs[metric] for device_costs in costs.values())
+        assert sympy.simplify(total - graph_total) == 0
+    assert sympy.simplify(costs['/device:GPU:1']['flops'] -
+                          costs['/device:GPU:0']['flops'] -
+                          batch_size * hidden_dim) == 0
+
+    # in_a to GPU:0, and relu_0 to GPU:1 once for both consumers
+    transfers = get_device_transfers(graph, '/device:CPU:0')
+    assert [(tensor.name, src, dst, consumer.name)
+            for tensor, src, dst, consumer in transfers] == \
+           [('in_a', '/device:CPU:0', '/device:GPU:0', 'tower_0/matmul'),
+            ('tower_0/relu', '/device:GPU:0', '/device:GPU:1',
+             'tower_1/add')]
+    transfer_bytes = graph.calcDeviceTransferBytes('/device:CPU:0')
+    assert transfer_bytes == {
+        ('/device:CPU:0', '/device:GPU:0'): 4 * batch_size * hidden_dim,
+        ('/device:GPU:0', '/device:GPU:1'): 4 * batch_size * hidden_dim}
+
+    # Transfers add link time to the receiving ops
+    hardware = HardwareProfile('test_hw', {'default': 100.0},
+                               mem_bandwidth=10.0, onchip_capacity=1024,
+                               launch_overhead=1.0)
+    link = LinkModel(latency=2.0, bandwidth=4.0)
+    base = RooflineSimulator(graph, hardware)
+    placed = RooflineSimulator(graph, hardware, transfer_link=link)
+    diff = placed.calcStepTime() - base.calcStepTime()
+    assert sympy.simplify(diff - 2 * (2.0 + batch_size * hidden_dim)) == 0
+    op_times = placed.calcOpTimes()
+    assert sympy.simplify(op_times['tower_1/add']['comm_time'] - 2.0 -
+                          batch_size * hidden_dim) == 0
+    assert op_times['tower_1/matmul']['comm_time'] == 0
+    reset_symbols()
+
+
+def test_loop_block_device():
+    ''' Unplaced ops in a loop should execute on the device of the loop's
+    condition op, which the loop's ControlBlockOp takes on creation.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [4, 8])
+        pred = constant('pred', [], True)
+        cond = LoopConditionOp('while/LoopCond')
+        cond.addOutput(Tensor('while/LoopCond', TensorShape([])))
+        graph.addOp(cond)
+        graph.addInputToOp(cond, pred)
+        cond.setDevice('/device:GPU:1')
+        relu = pointwise('while/relu', catamount.ReluOp, [4, 8], in_a)
+        block = ControlBlockOp('while/LoopCond_block', cond,
+                               [cond, relu.producer])
+        graph.addOp(block)
+
+    assert block.device == '/device:GPU:1'
+    assert get_op_device(relu.producer) == '/device:GPU:1'
+    assert get_op_device(in_a.producer) == 'unplaced'
+    block_iters = utils.getIntSymbolFromString('while/LoopCond_block::iters')
+    costs = graph.calcDeviceCosts()
+    assert costs['/device:GPU:1']['flops'] == 32 * block_iters
+    assert costs['unplaced']['flops'] == 0
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_canonicalize_device()
+    test_device_placement()
+    test_loop_block_device()
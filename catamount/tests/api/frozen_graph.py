@@ -0,0 +1,76 @@
+import numpy as np
+import sympy
+
+from concurrent.futures import ProcessPoolExecutor
+
+import catamount
+from catamount.api import utils
+from catamount.graph import Graph
+
+from catamount.tests.utils.helpers import *
+
+
+def _worker_flops(handle, batch_sizes):
+    frozen = handle.attach()
+    assert not frozen.arrays['flops_coeffs'].flags.writeable
+    flops = frozen.evaluate('flops', {'batch_size': batch_sizes,
+                                      'hidden_dim': 64})
+    del frozen
+    handle.close()
+    return flops
+
+
+def test_frozen_graph():
+    ''' Verify that frozen graph cost tables evaluate to the same costs as
+    the symbolic graph, both locally and in workers attached to shared
+    memory.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        out = matmul('matmul', [None, None], in_a, weights)
+        out = pointwise('relu', catamount.ReluOp, [None, None], out)
+        out = pointwise('mul', catamount.MulOp, [None, None], out, in_a)
+        graph.bindTensorShapeDimensions(
+            { 'in_a': ['batch_size', 'hidden_dim'],
+              'weights': ['hidden_dim', 'hidden_dim'] })
+
+        frozen = graph.freeze()
+        assert frozen.numOps == len(graph.opsByName)
+        batch_size = utils.getIntSymbolFromString('batch_size')
+        hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+        batch_sizes = np.array([1, 16, 128])
+        for table, cost_func in [('flops', graph.calcAlgFlops),
+                                 ('bytes', graph.calcAlgBytes),
+                                 ('footprint', graph.calcAlgFootprint)]:
+            cost = cost_func()
+            frozen_costs = frozen.evaluate(table,
+                                           {batch_size: batch_sizes,
+                                            hidden_dim: 64})
+            for idx, bs in enumerate(batch_sizes):
+                correct = cost.subs({batch_size: int(bs), hidden_dim: 64})
+                assert frozen_costs[idx] == float(correct), \
+                    '{}: {} != {}'.format(table, frozen_costs[idx], correct)
+            per_op = frozen.evaluate(table, {batch_size: 16,
+                                             hidden_dim: 64}, per_row=True)
+            assert per_op.shape == (frozen.numOps, 1)
+            assert np.isclose(per_op.sum(), frozen_costs[1])
+
+        # Workers attach to one shared copy of the frozen graph
+        handle = frozen.toSharedMemory()
+        try:
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                worker_flops = executor.submit(_worker_flops, handle,
+                                               batch_sizes).result()
+            local_flops = frozen.evaluate('flops',
+                                          {batch_size: batch_sizes,
+                                           hidden_dim: 64})
+            assert np.array_equal(worker_flops, local_flops)
+        finally:
+            handle.unlink()
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_frozen_graph()
@@ -0,0 +1,187 @@
+import sympy
+
+import catamount
+from catamount.graph import Graph
+from catamount.ops.ctrl_ops import ControlBlockOp, EnterOp, ExitOp, \
+                                   LoopConditionOp, MergeOp, \
+                                   NextIterationOp, SwitchOp
+from catamount.ops.init_ops import IdentityOp
+from catamount.ops.math_ops import AddOp, GreaterEqualOp, LessEqualOp, \
+                                   LessOp, MulOp, SubOp
+from catamount.ops.tensor_array_ops import TensorArrayOp
+from catamount.ops.unknown_op import UnknownOp
+from catamount.tensors.tensor import Tensor
+from catamount.tensors.tensor_shape import TensorShape
+
+from catamount.tests.utils.helpers import *
+
+
+def add_op(graph, op, out_shapes):
+    for idx, out_shape in enumerate(out_shapes):
+        name = op.name if idx == 0 else '{}:{}'.format(op.name, idx)
+        op.addOutput(Tensor(name, TensorShape(out_shape)))
+    graph.addOp(op)
+    return op
+
+def add_inputs(graph, op, in_tensors):
+    for in_tensor in in_tensors:
+        graph.addInputToOp(op, in_tensor)
+
+def build_counter_loop(graph, scope, init, bound, step, comparison,
+                       body_input, counter_first=True):
+    ''' Build a TF-style while loop with a counter from init, updated by
+    step (AddOp, or SubOp if step < 0) while comparison(counter, bound), or
+    comparison(bound, counter) if not counter_first. The body multiplies
+    body_input by itself.
+    '''
+    ops = []
+    def loop_op(op, out_shapes):
+        ops.append(add_op(graph, op, out_shapes))
+        return ops[-1]
+    enter = loop_op(EnterOp('{}/Enter'.format(scope)), [[]])
+    merge = loop_op(MergeOp('{}/Merge'.format(scope)), [[], []])
+    bound_enter = loop_op(EnterOp('{}/cond/Enter'.format(scope)), [[]])
+    compare = loop_op(comparison('{}/cond/compare'.format(scope)), [[]])
+    cond = loop_op(LoopConditionOp('{}/LoopCond'.format(scope)), [[]])
+    switch = loop_op(SwitchOp('{}/Switch'.format(scope)), [[], []])
+    ident = loop_op(IdentityOp('{}/Identity'.format(scope)), [[]])
+    if step > 0:
+        update = loop_op(AddOp('{}/update'.format(scope)), [[]])
+    else:
+        update = loop_op(SubOp('{}/update'.format(scope)), [[]])
+    next_iter = loop_op(NextIterationOp('{}/NextIteration'.format(scope)),
+                        [[]])
+    exit_op = loop_op(ExitOp('{}/Exit'.format(scope)), [[]])
+    body_enter = loop_op(EnterOp('{}/body/Enter'.format(scope)),
+                         [body_input.shape.dims])
+    body_mul = loop_op(MulOp('{}/body/mul'.format(scope)),
+                       [body_input.shape.dims])
+    step_const = constant('{}/step'.format(scope), [], abs(step))
+
+    add_inputs(graph, enter, [init])
+    add_inputs(graph, merge, [enter.outputs[0], next_iter.outputs[0]])
+    add_inputs(graph, bound_enter, [bound])
+    compare_inputs = [merge.outputs[0], bound_enter.outputs[0]]
+    if not counter_first:
+        compare_inputs.reverse()
+    add_inputs(graph, compare, compare_inputs)
+    add_inputs(graph, cond, [compare.outputs[0]])
+    add_inputs(graph, switch, [merge.outputs[0], cond.outputs[0]])
+    add_inputs(graph, ident, [switch.outputs[1]])
+    add_inputs(graph, update, [ident.outputs[0], step_const])
+    add_inputs(graph, next_iter, [update.outputs[0]])
+    add_inputs(graph, exit_op, [switch.outputs[0]])
+    add_inputs(graph, body_enter, [body_input])
+    add_inputs(graph, body_mul, [body_enter.outputs[0],
+                                 body_enter.outputs[0]])
+    block = ControlBlockOp('{}/LoopCond_block'.format(scope), cond, ops)
+    graph.addOp(block)
+    return block, exit_op.outputs[0]
+
+
+def test_loop_iters():
+    ''' Verify trip count inference for a forward loop bounded by a
+    TensorArray size and a gradient loop that counts down the forward
+    loop's iterations, and iteration overrides.
+    '''
+    seq_length = utils.getIntSymbolFromString('seq_length')
+    graph = Graph()
+    with graph.asDefault():
+        # Sequences are non-empty, so trip counts need not be clamped
+        utils.registerSymbol(seq_length, lower=1)
+        in_a = placeholder('in_a', [3, 5])
+        zero = constant('zero', [], 0)
+        length = constant('length', [], seq_length)
+        tensor_array = add_op(graph, TensorArrayOp('TensorArray'), [[2]])
+        add_inputs(graph, tensor_array, [length])
+        # Match the size op by its TF op type rather than its name
+        size_op = UnknownOp('rnn/TensorArrayStack/size')
+        size_op.setOpType('TensorArraySizeV3')
+        array_size = add_op(graph, size_op, [[]])
+        add_inputs(graph, array_size, [tensor_array.outputs[0]])
+        fwd_block, fwd_exit = build_counter_loop(
+            graph, 'rnn/while', zero, array_size.outputs[0], 1, LessOp,
+            in_a)
+        one = constant('one', [], 1)
+        bwd_block, _ = build_counter_loop(
+            graph, 'gradients/while', fwd_exit, one, -1, GreaterEqualOp,
+            in_a)
+
+    fwd_iters = utils.getIntSymbolFromString('rnn/while/LoopCond_block::iters')
+    bwd_iters = utils.getIntSymbolFromString(
+                    'gradients/while/LoopCond_block::iters')
+    # Each iteration: 15 body Flops, and the counter compare and update
+    assert graph.calcAlgFlops() == 17 * fwd_iters + 17 * bwd_iters
+
+    trip_count = seq_length
+    iters = graph.bindLoopIterations()
+    assert iters == {'gradients/while/LoopCond_block': trip_count,
+                     'rnn/while/LoopCond_block': trip_count}
+    assert fwd_block.getLoopIters() == trip_count
+    assert sympy.simplify(graph.calcAlgFlops() - 34 * trip_count) == 0
+
+    # Overrides take priority, and dependent loops use them. The range of
+    # num_steps is unknown, so the gradient loop's trip count is clamped
+    num_steps = utils.getIntSymbolFromString('num_steps')
+    iters = graph.bindLoopIterations(
+                {'rnn/while/LoopCond_block::iters': 2 * num_steps})
+    assert iters['gradients/while/LoopCond_block'] == \
+           sympy.Max(0, 2 * num_steps)
+    assert sympy.simplify(graph.calcAlgFlops() - 17 * 2 * num_steps -
+                          17 * sympy.Max(0, 2 * num_steps)) == 0
+    try:
+        graph.bindLoopIterations({'unknown_block': 4})
+        assert False, 'Expected unknown loop error'
+    except ValueError:
+        pass
+
+    # Unbind to restore the '::iters' symbols
+    fwd_block.setLoopIters(None)
+    bwd_block.setLoopIters(None)
+    assert graph.calcAlgFlops() == 17 * fwd_iters + 17 * bwd_iters
+    reset_symbols()
+
+def test_loop_iters_comparisons():
+    ''' Verify trip counts of LessEqualOp loops, loops with the counter as
+    the right operand, loops that never iterate, and that loops whose trip
+    counts cannot be inferred keep manually set iterations.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [3, 5])
+        zero = constant('zero', [], 0)
+        ten = constant('ten', [], 10)
+        le_block, _ = build_counter_loop(graph, 'le_while', zero, ten, 2,
+                                         LessEqualOp, in_a)
+        # 10 >= counter, counting up from 0 in steps of 3
+        ge_block, _ = build_counter_loop(graph, 'ge_while', zero, ten, 3,
+                                         GreaterEqualOp, in_a,
+                                         counter_first=False)
+        # Counting up from 10 while counter < 0 never iterates
+        empty_block, _ = build_counter_loop(graph, 'empty_while', ten, zero,
+                                            1, LessOp, in_a)
+        # The bound is unknown, so the trip count cannot be inferred
+        unknown_bound = placeholder('unknown_bound', [])
+        unknown_block, _ = build_counter_loop(graph, 'unknown_while', zero,
+                                              unknown_bound, 1, LessOp, in_a)
+    unknown_block.setLoopIters(7)
+
+    iters = graph.bindLoopIterations()
+    assert iters == {'empty_while/LoopCond_block': 0,
+                     'ge_while/LoopCond_block': 4,
+                     'le_while/LoopCond_block': 6,
+                     'unknown_while/LoopCond_block': 7}
+    assert empty_block.getLoopIters() == 0
+    assert unknown_block.getLoopIters() == 7
+
+    # Without set iterations, the loop remains unbound
+    unknown_block.setLoopIters(None)
+    iters = graph.bindLoopIterations()
+    assert iters['unknown_while/LoopCond_block'] is None
+    assert not unknown_block.isLoopItersBound()
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_loop_iters()
+    test_loop_iters_comparisons()
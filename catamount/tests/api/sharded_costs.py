@@ -0,0 +1,116 @@
+import sympy
+
+import catamount
+from catamount.graph import Graph
+from catamount.graph.parallel import SHARDED_COST_FUNCS, partition_op_order
+from catamount.ops.math_ops import LessOp
+from catamount.ops.subgraph_op import SubgraphOp
+
+from catamount.tests.api.loop_iters import build_counter_loop
+
+from catamount.tests.api.lstm_cell import lstm_cell
+from catamount.tests.utils.helpers import *
+
+
+def test_sharded_costs():
+    ''' Verify that costs calculated in parallel worker processes from graph
+    shards match the serially calculated costs.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        input_ph = placeholder('input', [None, None])
+        state_c_ph = placeholder('c_state', [None, None])
+        state_h_ph = placeholder('h_state', [None, None])
+        out_t, state_t = lstm_cell('lstm_cell', input_ph,
+                                   [state_c_ph, state_h_ph])
+        graph.bindTensorShapeDimensions(
+            { 'input': ['batch_size', 'hidden_dim'],
+              'c_state': ['batch_size', 'hidden_dim'],
+              'h_state': ['batch_size', 'hidden_dim'] })
+
+        ops = graph.getTopologicalOpOrder(hierarchical=True)
+        shards = partition_op_order(ops, 3)
+        assert len(shards) == 3
+        assert sum(len(shard) for shard in shards) == len(ops)
+
+        cost_funcs = ['calcAlgFlops', 'calcAlgBytes', 'calcAlgFootprint']
+        sharded_costs = graph.calcShardedCosts(cost_funcs, num_workers=2,
+                                               num_shards=4)
+        for cost_func in cost_funcs:
+            serial_cost = getattr(graph, cost_func)()
+            print('{}: serial {}, sharded {}'
+                  .format(cost_func, serial_cost, sharded_costs[cost_func]))
+            assert sympy.simplify(serial_cost -
+                                  sharded_costs[cost_func]) == 0
+        parallel_flops = graph.calcAlgFlops(num_workers=2, verbose=True)
+        assert sympy.simplify(parallel_flops - graph.calcAlgFlops()) == 0
+
+        # Feeds and fetches pass through to the topological op order, as
+        # for serial cost calculations
+        for num_workers in [None, 2]:
+            try:
+                graph.calcAlgBytes(feed_dict={'input': None},
+                                   num_workers=num_workers)
+                assert False, 'Expected feeds to be unsupported'
+            except NotImplementedError:
+                pass
+        try:
+            graph.calcShardedCosts(['calcModelParameters'], num_workers=2)
+            assert False, 'Expected unsupported cost function error'
+        except ValueError:
+            pass
+    reset_symbols()
+
+
+def test_sharded_costs_in_workers():
+    ''' Verify that op costs are calculated in the worker processes rather
+    than in the parent, including the costs of ops in loops.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        zero = constant('zero', [], 0)
+        bound = constant('bound', [], None)
+        block, loop_out = build_counter_loop(graph, 'while', zero, bound, 1,
+                                             LessOp, in_a)
+        relu = pointwise('relu', catamount.ReluOp, [None, None], in_a)
+        graph.bindTensorShapeDimensions({'in_a': ['batch_size',
+                                                  'hidden_dim']})
+
+    cost_funcs = sorted(SHARDED_COST_FUNCS)
+    serial_costs = {cost_func: getattr(graph, cost_func)()
+                    for cost_func in cost_funcs}
+    # Count op cost function calls in this (parent) process. Workers
+    # count in their own copies of the counter
+    parent_calls = []
+    op_classes = set(type(op) for op in graph.opsByName.values()
+                     if not isinstance(op, SubgraphOp))
+    orig_funcs = {}
+    for op_class in op_classes:
+        for cost_func in cost_funcs:
+            orig_funcs[(op_class, cost_func)] = \
+                op_class.__dict__.get(cost_func, None)
+            def counted_func(self, orig_func=getattr(op_class, cost_func)):
+                parent_calls.append(self.name)
+                return orig_func(self)
+            setattr(op_class, cost_func, counted_func)
+    try:
+        sharded_costs = graph.calcShardedCosts(cost_funcs, num_workers=2)
+    finally:
+        for (op_class, cost_func), orig_func in orig_funcs.items():
+            if orig_func is None:
+                delattr(op_class, cost_func)
+            else:
+                setattr(op_class, cost_func, orig_func)
+    assert parent_calls == []
+    while_iters = utils.getIntSymbolFromString('while/LoopCond_block::iters')
+    assert serial_costs['calcAlgFlops'].has(while_iters)
+    for cost_func in cost_funcs:
+        assert sympy.simplify(serial_costs[cost_func] -
+                              sharded_costs[cost_func]) == 0
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_sharded_costs()
+    test_sharded_costs_in_workers()
@@ -0,0 +1,96 @@
+import sympy
+
+import catamount
+from catamount.api import utils
+from catamount.graph import Graph
+from catamount.tensors.tensor_shape import Dimension
+
+from catamount.tests.utils.helpers import *
+
+
+def test_symbol_equivalence():
+    ''' Verify that rebinding names during shape propagation does not record
+    symbol equivalences, that broadcasting dimensions of unknown values does
+    not merge their symbols, and that user symbols are never substituted.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_x = placeholder('in_x', [None, None])
+        in_y = placeholder('in_y', [None, None])
+        weights = variable('weights', [None, None])
+        proj = matmul('proj', [None, None], in_x, weights)
+        # First propagate without any names bound, so the MatMul output
+        # gets automatically named dimension symbols
+        graph.propagateTensorShapeNames()
+        in_x_dim_0 = utils.getIntSymbolFromString('in_x::dim_0')
+        assert in_x_dim_0 in graph.calcAlgFlops().free_symbols
+
+        # Binding names replaces the automatically named symbols, but
+        # the replaced symbols are not equal to the new ones
+        out = pointwise('add', catamount.AddOp, [None, None], proj, in_y)
+        bind_dict = { 'in_x': ['batch_size', 'hidden_dim'],
+                      'in_y': ['batch', 'hidden_dim'],
+                      'weights': ['hidden_dim', 'hidden_dim'] }
+        graph.bindTensorShapeDimensions(bind_dict)
+
+        batch_size = utils.getIntSymbolFromString('batch_size')
+        batch = utils.getIntSymbolFromString('batch')
+        hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+        equivalences = graph.symbolEquivalences
+        assert equivalences.find(in_x_dim_0) == in_x_dim_0
+        # The AddOp broadcast does not show batch_size == batch, since
+        # either could be 1
+        assert equivalences.find(batch) != equivalences.find(batch_size)
+        assert graph.canonicalizeSymbols(batch_size) == batch_size
+
+        for cost in [graph.calcAlgFlops(), graph.calcAlgBytes(),
+                     graph.calcAlgFootprint()]:
+            print('Cost: {}'.format(cost))
+            assert in_x_dim_0 not in cost.free_symbols
+        flops_symbols = graph.calcAlgFlops().free_symbols
+        flops_symbols.discard(utils.getIntSymbolFromString('graph::iters'))
+        assert flops_symbols == {batch_size, hidden_dim}
+    reset_symbols()
+
+def test_broadcast_equivalence():
+    ''' Verify that broadcasting dimensions of equal known values records
+    their symbols as equal, with user symbols as canonical representatives.
+    '''
+    table = utils.SymbolEquivalenceTable()
+    prev_table = utils.setActiveEquivalenceTable(table)
+    try:
+        user_dim = Dimension(32)
+        user_dim.setSymbolName('batch_size')
+        auto_dim = Dimension(32)
+        auto_dim.setSymbolName('in_y::dim_0')
+        other_user_dim = Dimension(32)
+        other_user_dim.setSymbolName('batch')
+        unknown_0 = Dimension(None)
+        unknown_0.setSymbolName('seq_0')
+        unknown_1 = Dimension(None)
+        unknown_1.setSymbolName('seq_1')
+        auto_dim.getBroadcastDimension(user_dim)
+        user_dim.getBroadcastDimension(other_user_dim)
+        unknown_0.getBroadcastDimension(unknown_1)
+    finally:
+        utils.setActiveEquivalenceTable(prev_table)
+
+    batch_size = utils.getIntSymbolFromString('batch_size')
+    batch = utils.getIntSymbolFromString('batch')
+    auto_symbol = utils.getIntSymbolFromString('in_y::dim_0')
+    seq_0 = utils.getIntSymbolFromString('seq_0')
+    seq_1 = utils.getIntSymbolFromString('seq_1')
+    assert table.find(auto_symbol) == table.find(batch_size)
+    assert table.find(batch) == table.find(batch_size)
+    assert table.find(seq_0) != table.find(seq_1)
+    # Only the automatically named symbol gets substituted, so bindings
+    # of either user symbol still apply
+    subs = table.getSubstitutions()
+    assert list(subs.keys()) == [auto_symbol]
+    assert subs[auto_symbol] in [batch, batch_size]
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_symbol_equivalence()
+    test_broadcast_equivalence()
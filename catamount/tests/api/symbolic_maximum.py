@@ -0,0 +1,90 @@
+import sympy
+
+import catamount
+from catamount.api import utils
+from catamount.graph import Graph
+
+from catamount.tests.utils.helpers import *
+
+
+def test_symbolic_maximum():
+    ''' Verify that symbolic maximums collapse when one side dominates the
+    other given symbol range metadata, and otherwise produce a flat,
+    deduplicated Max.
+    '''
+    hidden_dim = utils.getIntSymbolFromString('test_max::hidden_dim')
+    batch_size = utils.getIntSymbolFromString('test_max::batch_size')
+    loop_iters = utils.getIntSymbolFromString('test_max_block::iters')
+    utils.registerSymbol(hidden_dim, lower=1)
+    utils.registerSymbol(batch_size, lower=1)
+
+    # Dominated sides collapse
+    assert utils.getSymbolicMaximum(hidden_dim ** 2, hidden_dim) == \
+           hidden_dim ** 2
+    assert utils.getSymbolicMaximum(0, batch_size * hidden_dim) == \
+           batch_size * hidden_dim
+    assert utils.getSymbolicMaximum(loop_iters * hidden_dim, hidden_dim) == \
+           loop_iters * hidden_dim
+    # Numeric values collapse if dominated by the positive symbols
+    assert utils.getSymbolicMaximum(1, hidden_dim) == hidden_dim
+
+    # Non-comparable candidates are kept in a flat Max, and dominated
+    # candidates get pruned as new candidates arrive
+    max_expr = utils.getSymbolicMaximum(hidden_dim ** 2, 3 * batch_size)
+    assert isinstance(max_expr, sympy.Max)
+    max_expr = utils.getSymbolicMaximum(max_expr, 4 * batch_size)
+    max_expr = utils.getSymbolicMaximum(max_expr, hidden_dim ** 2)
+    assert isinstance(max_expr, sympy.Max)
+    assert set(max_expr.args) == {hidden_dim ** 2, 4 * batch_size}
+
+    # Upper bounds also allow comparisons
+    upper_sym = utils.getIntSymbolFromString('test_max::upper')
+    assert isinstance(utils.getSymbolicMaximum(upper_sym, 16), sympy.Max)
+    utils.registerSymbol(upper_sym, upper=8)
+    assert utils.getSymbolicMaximum(upper_sym, 16) == 16
+
+
+def test_minimal_footprint_no_max():
+    ''' Symbolic minimal footprints of straight-line graphs should not
+    contain Max terms when the footprint grows monotonically.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        out = matmul('matmul', [None, None], in_a, weights)
+        out = pointwise('relu', catamount.ReluOp, [None, None], out)
+        graph.bindTensorShapeDimensions({'in_a': ['batch', 'hidden'],
+                                         'weights': ['hidden', 'hidden']})
+        graph_iters = utils.getIntSymbolFromString('graph::iters')
+        min_foot = graph.calcMinimalFootprint(symbol_subs={graph_iters: 1})
+        print('Minimal footprint: {}'.format(min_foot))
+        assert not min_foot.has(sympy.Max)
+    reset_symbols()
+
+def test_graph_symbol_registry():
+    ''' Symbol ranges registered for one graph should not apply to another
+    graph, and activating a graph restores its ranges.
+    '''
+    dim = utils.getIntSymbolFromString('test_registry::dim')
+    graph_a = Graph()
+    with graph_a.asDefault():
+        utils.registerSymbol(dim, lower=1)
+        assert utils.getSymbolRange(dim) == (1, None)
+        assert utils.getSymbolicMaximum(dim, 1) == dim
+
+    graph_b = Graph()
+    with graph_b.asDefault():
+        assert utils.getActiveSymbolRegistry() is graph_b.symbolRegistry
+        assert utils.getSymbolRange(dim) == (None, None)
+        assert isinstance(utils.getSymbolicMaximum(dim, 1), sympy.Max)
+
+    with graph_a.asDefault():
+        assert utils.getSymbolRange(dim) == (1, None)
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_symbolic_maximum()
+    test_minimal_footprint_no_max()
+    test_graph_symbol_registry()
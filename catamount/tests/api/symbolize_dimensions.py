@@ -0,0 +1,102 @@
+import numpy as np
+import sympy
+
+import catamount
+from catamount.api import utils
+from catamount.graph import Graph
+from catamount.graph.symbolize import DimensionValueMatcher
+
+
+def test_dimension_value_matcher():
+    ''' Verify that integer values match the simplest polynomial combination
+    of hyperparameter base values.
+    '''
+    hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+    vocab_size = utils.getIntSymbolFromString('vocab_size')
+    matcher = DimensionValueMatcher({hidden_dim: 2004, vocab_size: 10004})
+    assert matcher.match(2004) == hidden_dim
+    assert matcher.match(8016) == 4 * hidden_dim
+    assert matcher.match(256 * 2004) == 256 * hidden_dim
+    assert matcher.match(2004 * 10004) == hidden_dim * vocab_size
+    assert matcher.match(2004 + 10004) == hidden_dim + vocab_size
+    assert matcher.match(2004 ** 2) == hidden_dim ** 2
+    # Non-matching and non-dimension values
+    assert matcher.match(2005) is None
+    assert matcher.match(-1) is None
+    assert matcher.match(1) is None
+    assert matcher.match(True) is None
+
+
+def test_symbolize_dimensions_by_value():
+    ''' Build a small LSTM-like projection with static shapes and verify that
+    the symbolization pass makes its costs symbolic.
+    '''
+    hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+    batch_size = utils.getIntSymbolFromString('batch_size')
+    graph = Graph()
+    with graph.asDefault():
+        in_ph = catamount.placeholder('input', [None, 2 * 20])
+        weights = catamount.variable('weights', [2 * 20, 4 * 20])
+        bias_acc = catamount.constant('bias_acc', [4 * 20],
+                                      value=np.zeros(4 * 20, dtype=np.int64))
+        proj = catamount.matmul('proj', [None, 4 * 20], in_ph, weights)
+        out = catamount.pointwise('bias_add', catamount.AddOp,
+                                  [None, 4 * 20], proj, bias_acc)
+        shape_const = catamount.constant('out_shape', [2], value=[-1, 80])
+        shape_const.producer.outputs[0]._dtype = \
+            catamount.DataType.int64
+        reshape = catamount.pointwise('reshape', catamount.ReshapeOp,
+                                      [None, 4 * 20], out, shape_const)
+        # Index constants with matching values are not shapes or sizes
+        index_const = catamount.constant('index', [2], value=[0, 80])
+        index_const.producer.outputs[0]._dtype = \
+            catamount.DataType.int64
+        gather = catamount.pointwise('gather', catamount.GatherOp,
+                                     [2, 4 * 20], proj, index_const)
+
+        rewrites = graph.symbolizeDimensionsByValue({hidden_dim: 10})
+        assert rewrites['weights'] == [(40, 4 * hidden_dim),
+                                       (80, 8 * hidden_dim)]
+        # Constants keep their values (and hence static shapes)
+        assert 'bias_acc' not in rewrites
+        assert list(bias_acc.value) == [0] * 80
+        assert list(shape_const.value) == [-1, 8 * hidden_dim]
+        assert list(index_const.value) == [0, 80]
+
+        # The batch dimension is unknown, so bind it
+        graph.bindTensorShapeDimensions({'input': [batch_size, None]},
+                                        make_symbolic=True)
+        flops = graph.calcAlgFlops()
+        print('Flops: {}'.format(flops))
+        correct_flops = 2 * batch_size * (4 * hidden_dim) * \
+                        (8 * hidden_dim) + batch_size * 8 * hidden_dim
+        assert sympy.simplify(flops - correct_flops) == 0
+        params = graph.calcModelParameters()
+        assert sympy.simplify(params - 32 * hidden_dim ** 2) == 0
+
+
+def test_symbolize_min_value():
+    ''' Verify that values smaller than min_value are not symbolized.
+    '''
+    hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+    graph = Graph()
+    with graph.asDefault():
+        dims = catamount.constant('dims', [2], value=[10, 20])
+        dims.producer.outputs[0]._dtype = catamount.DataType.int32
+        fill_value = catamount.constant('fill_value', [], value=0)
+        fill = catamount.pointwise('fill', catamount.FillOp, [10, 20],
+                                   dims, fill_value)
+
+        rewrites = graph.symbolizeDimensionsByValue({hidden_dim: 10},
+                                                    min_value=32)
+        assert rewrites == {}
+        assert list(dims.value) == [10, 20]
+        rewrites = graph.symbolizeDimensionsByValue({hidden_dim: 10})
+        assert rewrites == {'dims': [(20, 2 * hidden_dim)]}
+        assert list(dims.value) == [10, 2 * hidden_dim]
+
+
+if __name__ == "__main__":
+    test_dimension_value_matcher()
+    test_symbolize_dimensions_by_value()
+    test_symbolize_min_value()
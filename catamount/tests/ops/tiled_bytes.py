@@ -0,0 +1,97 @@
+import catamount
+from catamount.graph import Graph
+from catamount.ops.math_ops import Conv2DOp
+from catamount.tensors.tensor import Tensor
+from catamount.tensors.tensor_shape import TensorShape
+
+from catamount.tests.utils.helpers import *
+
+
+def conv2d(name, out_shape, in_tensor, filter_tensor, data_format):
+    graph = catamount.get_default_graph()
+    conv_op = Conv2DOp(name)
+    conv_op.setDataFormat(data_format)
+    conv_op.setStrides([1, 1, 1, 1])
+    out_tensor = Tensor(name, TensorShape(out_shape))
+    conv_op.addOutput(out_tensor)
+    graph.addOp(conv_op)
+    graph.addInputToOp(conv_op, in_tensor)
+    graph.addInputToOp(conv_op, filter_tensor)
+    return conv_op
+
+
+def test_matmul_tiled_bytes():
+    ''' Verify tiled bytes of MatMulOps for caches smaller and larger than
+    the operands, and the effect of transposes on cache line over-fetch.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [256, 256])
+        weights = variable('weights', [256, 256])
+        matmul('matmul', [256, 256], in_a, weights)
+    mm_op = graph.opsByName['matmul']
+    size = 256 * 256 * 4
+    assert mm_op.calcAlgBytes() == 3 * size
+    # A cache of three 64x64 tiles: A and B are each read 4 times
+    assert mm_op.calcTiledBytes(3 * 64 * 64 * 4) == 9 * size
+    # All operands fit in cache: Only compulsory bytes
+    assert mm_op.calcTiledBytes(2**30) == mm_op.calcAlgBytes()
+    # Other ops access their algorithmic bytes
+    assert graph.calcTiledBytes(3 * 64 * 64 * 4) - graph.calcAlgBytes() == \
+           6 * size
+    try:
+        mm_op.calcTiledBytes(2**30, tile_strategy='unknown')
+        assert False, 'Expected unknown tile strategy error'
+    except ValueError:
+        pass
+    reset_symbols()
+
+    # Output-stationary tiles read A in cache-line slivers along K = 8. A
+    # 32B row of A (not transposed) occupies a whole 64B cache line, while
+    # transposed A (stored [K, M]) is read without over-fetch
+    cache_bytes = 64 * 64 * 4
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [256, 8])
+        in_a_t = placeholder('in_a_t', [8, 256])
+        weights = variable('weights', [8, 256])
+        matmul('matmul', [256, 256], in_a, weights)
+        matmul('matmul_t', [256, 256], in_a_t, weights)
+    graph.opsByName['matmul_t'].setTransposeInput(0, True)
+    out_bytes = 256 * 256 * 4
+    b_bytes = 4 * (8 * 256 * 4)
+    for op_name, a_bytes in [('matmul', 4 * (256 * 64)),
+                             ('matmul_t', 4 * (8 * 256 * 4))]:
+        op = graph.opsByName[op_name]
+        assert op.calcTiledBytes(cache_bytes, 'output_stationary') == \
+               a_bytes + b_bytes + out_bytes
+    reset_symbols()
+
+
+def test_conv2d_tiled_bytes():
+    ''' Verify that NCHW convolutions with narrow images over-fetch cache
+    lines, while NHWC convolutions read compulsory bytes in a large cache.
+    '''
+    filter_bytes = 3 * 3 * 64 * 64 * 4
+    image_bytes = 8 * 8 * 64 * 4
+    graph = Graph()
+    with graph.asDefault():
+        filters = variable('filters', [3, 3, 64, 64])
+        in_nchw = placeholder('in_nchw', [1, 64, 8, 8])
+        in_nhwc = placeholder('in_nhwc', [1, 8, 8, 64])
+        conv_nchw = conv2d('conv_nchw', [1, 64, 8, 8], in_nchw, filters,
+                           'NCHW')
+        conv_nhwc = conv2d('conv_nhwc', [1, 8, 8, 64], in_nhwc, filters,
+                           'NHWC')
+    assert conv_nhwc.calcAlgBytes() == conv_nchw.calcAlgBytes()
+    assert conv_nhwc.calcTiledBytes(2**30) == conv_nhwc.calcAlgBytes()
+    # 32B image rows each occupy a 64B cache line
+    assert conv_nchw.calcTiledBytes(2**30) == \
+           2 * image_bytes + filter_bytes + 2 * image_bytes
+    assert conv_nchw.calcTiledBytes(2**30) > conv_nhwc.calcTiledBytes(2**30)
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_matmul_tiled_bytes()
+    test_conv2d_tiled_bytes()
@@ -21,3 +21,17 @@ do
 	echo Running test: $testfile
 	python -m pytest $testfile
 done
+
+echo -e "\n\n------------ Running simulator tests ---------------\n\n"
+for testfile in `ls catamount/tests/simulator/*.py`
+do
+	echo Running test: $testfile
+	python -m pytest $testfile
+done
+
+echo -e "\n\n------------ Running analysis tests ---------------\n\n"
+for testfile in `ls catamount/tests/analysis/*.py`
+do
+	echo Running test: $testfile
+	python -m pytest $testfile
+done
@@ -0,0 +1,74 @@
+import numpy as np
+
+import catamount
+from catamount.graph import Graph
+from catamount.ops.collective_ops import AllreduceOp
+from catamount.simulator import CommunicationModel, EventSimulator, \
+                                HardwareProfile, LinkModel, RingCollective, \
+                                bucket_allreduce_ops, bucket_messages, \
+                                sweep_bucket_sizes
+
+from catamount.tests.utils.helpers import *
+
+
+def test_bucket_messages():
+    messages = [('a', 10), ('b', 20), ('c', 50), ('d', 5), ('e', 5)]
+    assert bucket_messages(messages, 30) == [['a', 'b'], ['c'], ['d', 'e']]
+    assert bucket_messages(messages, None) == [['a'], ['b'], ['c'], ['d'],
+                                               ['e']]
+    assert bucket_messages(messages, 1000) == [['a', 'b', 'c', 'd', 'e']]
+
+
+def test_bucketed_allreduce():
+    ''' Verify that fusing small allreduces into buckets reduces simulated
+    latency-dominated communication time.
+    '''
+    hardware = HardwareProfile('test_hw', {'default': 1.0e9},
+                               mem_bandwidth=1.0e9, onchip_capacity=1024,
+                               launch_overhead=0.0)
+    comm_model = CommunicationModel(
+        RingCollective(LinkModel(latency=1.0e-3, bandwidth=1.0e9)),
+        num_workers=8)
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        layer = in_a
+        bind_dict = {'in_a': ['batch_size', 'hidden_dim']}
+        for idx in range(4):
+            weights = variable('weights_{}'.format(idx), [None, None])
+            bind_dict[weights.name] = ['hidden_dim', 'hidden_dim']
+            layer = matmul('matmul_{}'.format(idx), [None, None], layer,
+                           weights)
+            pointwise('grad_allreduce_{}'.format(idx), AllreduceOp,
+                      [None, None], layer)
+        graph.bindTensorShapeDimensions(bind_dict)
+        bindings = {'batch_size': 8, 'hidden_dim': 64}
+
+        # Reverse topological order, 8 * 64 * 4 = 2KB per message
+        buckets = bucket_allreduce_ops(graph, 4096, bindings)
+        assert [bucket[1] for bucket in buckets] == \
+               [['grad_allreduce_3', 'grad_allreduce_2'],
+                ['grad_allreduce_1', 'grad_allreduce_0']]
+        assert buckets[0][2] == 4096
+
+        simulator = EventSimulator(graph, hardware, comm_model)
+        sweep = sweep_bucket_sizes(simulator, bindings, [0, 4096, 8192])
+        assert sweep[0]['num_buckets'] == 4
+        assert sweep[8192]['num_buckets'] == 1
+        assert sweep[8192]['comm_time'] < sweep[4096]['comm_time'] < \
+               sweep[0]['comm_time']
+        unbucketed = simulator.simulate(bindings)
+        assert np.isclose(sweep[0]['step_time'], unbucketed.stepTime)
+
+        # Communication model reports non-overlapped bucketed time
+        bucketed_time = comm_model.calcBucketedAllreduceTime([2048] * 4,
+                                                             4096)
+        assert np.isclose(float(bucketed_time),
+                          2 * float(comm_model.algorithm.allreduceTime(4096,
+                                                                       8)))
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_bucket_messages()
+    test_bucketed_allreduce()
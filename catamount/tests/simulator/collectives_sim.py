@@ -0,0 +1,171 @@
+import numpy as np
+import sympy
+
+import catamount
+from catamount.api import utils
+from catamount.graph import Graph
+from catamount.ops.collective_ops import AllgatherOp, AllreduceOp
+from catamount.ops.optimizer_ops import ApplyMomentumOp
+from catamount.simulator import CommunicationModel, HierarchicalCollective, \
+                                LinkModel, RecursiveHalvingDoublingCollective, \
+                                RingCollective, RooflineSimulator, \
+                                TreeCollective, load_hardware_profile
+from catamount.tensors.tensor import DataType, Tensor
+from catamount.tensors.tensor_shape import TensorShape
+
+from catamount.tests.utils.helpers import *
+
+
+def test_collective_algorithms():
+    ''' Verify alpha-beta collective times against closed-form values.
+    '''
+    link = LinkModel(latency=1.0, bandwidth=100.0)
+    num_bytes = 800
+    ring = RingCollective(link)
+    # 2 * (p - 1) * alpha + 2 * (p - 1) / p * n * beta
+    assert np.isclose(float(ring.allreduceTime(num_bytes, 8)),
+                      2 * 7 + 2 * 7 / 8 * 800 / 100)
+    assert np.isclose(float(ring.allgatherTime(num_bytes, 8)),
+                      7 + 7 / 8 * 800 / 100)
+    rhd = RecursiveHalvingDoublingCollective(link)
+    assert np.isclose(float(rhd.allreduceTime(num_bytes, 8)),
+                      2 * 3 + 2 * 7 / 8 * 800 / 100)
+    tree = TreeCollective(link)
+    assert np.isclose(float(tree.allreduceTime(num_bytes, 8)),
+                      3 * (2 + 2 * 800 / 100))
+    # Reduction costs add gamma terms
+    ring_gamma = RingCollective(link, reduce_bandwidth=50.0)
+    assert np.isclose(float(ring_gamma.allreduceTime(num_bytes, 8) -
+                            ring.allreduceTime(num_bytes, 8)),
+                      7 / 8 * 800 / 50)
+    # Hierarchical: 2 nodes of 4 workers with a slow inter-node link
+    fast_link = LinkModel(latency=0.1, bandwidth=1000.0)
+    hier = HierarchicalCollective(fast_link, RingCollective(link), 4)
+    assert np.isclose(float(hier.allreduceTime(num_bytes, 8)),
+                      2 * (3 * 0.1 + 3 / 4 * 800 / 1000) +
+                      2 * 1 + 2 * 1 / 2 * 200 / 100)
+    assert float(hier.allreduceTime(num_bytes, 8)) < \
+           float(ring.allreduceTime(num_bytes, 8))
+    # Symbolic worker counts
+    num_workers = utils.getIntSymbolFromString('num_workers')
+    sym_time = ring.allreduceTime(num_bytes, num_workers)
+    assert np.isclose(float(sym_time.subs({num_workers: 8})),
+                      float(ring.allreduceTime(num_bytes, 8)))
+
+
+def test_data_parallel_step_time():
+    ''' Verify that the roofline simulator uses the communication model for
+    allreduce ops and for data-parallel gradient allreduces.
+    '''
+    hardware = load_hardware_profile('v100')
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        out = matmul('matmul', [None, None], in_a, weights)
+        graph.bindTensorShapeDimensions(
+            { 'in_a': ['batch_size', 'hidden_dim'],
+              'weights': ['hidden_dim', 'hidden_dim'] })
+        batch_size = utils.getIntSymbolFromString('batch_size')
+        hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+        bindings = {batch_size: 32, hidden_dim: 1024}
+
+        comm_model = CommunicationModel.fromHardware(hardware,
+                                                     algorithm='ring',
+                                                     num_workers=16)
+        simulator = RooflineSimulator(graph, hardware, comm_model)
+        dp_time = simulator.calcDataParallelStepTime()
+        grad_time = comm_model.algorithm.allreduceTime(1024 * 1024 * 4, 16)
+        assert np.isclose(float((dp_time - simulator.calcStepTime())
+                                .subs(bindings)), float(grad_time))
+
+        # Explicit allreduce ops use the communication model
+        grads = pointwise('grad_allreduce', AllreduceOp, [None, None],
+                          weights)
+        graph.bindTensorShapeDimensions({'weights':
+                                         ['hidden_dim', 'hidden_dim']})
+        simulator = RooflineSimulator(graph, hardware, comm_model)
+        op_times = simulator.calcOpTimes()
+        assert op_times['grad_allreduce']['bound'] == 'communication'
+        results = simulator.evaluate(bindings)
+        assert np.isclose(results['comm_time'][0], float(grad_time))
+        assert np.isclose(results['step_time'][0],
+                          float(simulator.calcDataParallelStepTime()
+                                .subs(bindings)))
+    reset_symbols()
+
+def test_allgather_comm_time():
+    ''' Verify that allgather times use the communication model's number of
+    workers rather than the op's own num_workers symbol.
+    '''
+    link = LinkModel(latency=1.0, bandwidth=100.0)
+    ring = RingCollective(link, reduce_bandwidth=1000.0)
+    graph = Graph()
+    with graph.asDefault():
+        shard = placeholder('shard', [None, None])
+        axis = constant('gather_axis', [], 0)
+        gathered = pointwise('gather', AllgatherOp, [None, None], shard, axis)
+        graph.bindTensorShapeDimensions({'shard': ['batch_size', 'hidden']})
+        gather_op = gathered.producer
+        op_symbol = utils.getIntSymbolFromString('gather::num_workers')
+        assert op_symbol in gather_op.bytesAccessOutput().free_symbols
+
+        comm_model = CommunicationModel(ring, num_workers=8)
+        comm_time = comm_model.calcOpCommTime(gather_op)
+        assert op_symbol not in comm_time.free_symbols
+        batch_size = utils.getIntSymbolFromString('batch_size')
+        hidden = utils.getIntSymbolFromString('hidden')
+        bindings = {batch_size: 4, hidden: 100}
+        # Each worker contributes a 1600 byte shard
+        assert np.isclose(float(comm_time.subs(bindings)),
+                          float(ring.allgatherTime(1600 * 8, 8)))
+
+        # Without a model-wide worker count, the op's symbol remains
+        symbolic_model = CommunicationModel(ring)
+        symbolic_time = symbolic_model.calcOpCommTime(gather_op)
+        assert symbolic_time.free_symbols == {op_symbol, batch_size, hidden}
+    reset_symbols()
+
+def test_gradient_allreduce_variables():
+    ''' Verify that data-parallel gradient allreduces skip optimizer slot
+    variables and integer step counters, which have no gradients.
+    '''
+    link = LinkModel(latency=1.0, bandwidth=100.0)
+    ring = RingCollective(link)
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        # Named without a slot suffix, but an optimizer state input
+        accum = variable('weights/accumulator', [None, None])
+        global_step = variable('global_step', [])
+        global_step.setDataType(DataType.int64)
+        learning_rate = constant('learning_rate', [], 0.01)
+        momentum = constant('momentum', [], 0.9)
+        mm = matmul('matmul', [None, None], in_a, weights)
+        grad = matmul('gradients/matmul_grad', [None, None], in_a, mm)
+        graph.opsByName['gradients/matmul_grad'].setTransposeInput(0, True)
+        apply_op = ApplyMomentumOp('apply_momentum')
+        apply_op.addOutput(Tensor('apply_momentum',
+                                  TensorShape([None, None])))
+        graph.addOp(apply_op)
+        for in_tensor in [weights, accum, learning_rate, grad, momentum]:
+            graph.addInputToOp(apply_op, in_tensor)
+        graph.bindTensorShapeDimensions(
+            {'in_a': ['batch_size', 'hidden_dim'],
+             'weights': ['hidden_dim', 'hidden_dim'],
+             'weights/accumulator': ['hidden_dim', 'hidden_dim']})
+
+    comm_model = CommunicationModel(ring, num_workers=8)
+    hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+    grad_time = comm_model.calcGradientAllreduceTime(graph)
+    assert sympy.simplify(grad_time - ring.allreduceTime(
+                              4 * hidden_dim**2, 8)) == 0
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_collective_algorithms()
+    test_data_parallel_step_time()
+    test_allgather_comm_time()
+    test_gradient_allreduce_variables()
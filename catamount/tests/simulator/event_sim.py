@@ -0,0 +1,73 @@
+import json
+import numpy as np
+
+import catamount
+from catamount.api import utils
+from catamount.graph import Graph
+from catamount.ops.collective_ops import AllreduceOp
+from catamount.simulator import CommunicationModel, EventSimulator, \
+                                HardwareProfile, LinkModel, RingCollective
+
+from catamount.tests.utils.helpers import *
+
+
+def test_event_simulator():
+    ''' Verify that the event simulator overlaps communication with compute,
+    respects dependencies, and exports a Chrome trace.
+    '''
+    hardware = HardwareProfile('test_hw', {'default': 100.0},
+                               mem_bandwidth=1.0e6, onchip_capacity=1024,
+                               launch_overhead=0.0)
+    comm_model = CommunicationModel(
+        RingCollective(LinkModel(latency=0.0, bandwidth=1.0e6)),
+        num_workers=2)
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights_0 = variable('weights_0', [None, None])
+        weights_1 = variable('weights_1', [None, None])
+        hidden = matmul('matmul_0', [None, None], in_a, weights_0)
+        out = matmul('matmul_1', [None, None], hidden, weights_1)
+        # Gradient allreduce that only depends on a weight, so it can
+        # overlap with the matmuls
+        grad = pointwise('grad_allreduce', AllreduceOp, [None, None],
+                         weights_0)
+        graph.bindTensorShapeDimensions(
+            { 'in_a': ['batch_size', 'hidden_dim'],
+              'weights_0': ['hidden_dim', 'hidden_dim'],
+              'weights_1': ['hidden_dim', 'hidden_dim'] })
+        bindings = {'batch_size': 4, 'hidden_dim': 16}
+
+        simulator = EventSimulator(graph, hardware, comm_model)
+        durations, bounds = simulator.getOpDurations(bindings)
+        assert bounds['matmul_0'] == 'compute'
+        assert bounds['grad_allreduce'] == 'communication'
+        result = simulator.simulate(bindings)
+        events = result.events
+        # Dependencies are respected
+        assert events['matmul_1'].start >= events['matmul_0'].end
+        # Communication overlaps compute
+        serial_time = sum(durations.values())
+        assert result.stepTime < serial_time
+        assert np.isclose(result.stepTime,
+                          max(durations['matmul_0'] + durations['matmul_1'],
+                              durations['grad_allreduce']))
+        utilization = result.getUtilization()
+        assert 0.0 < utilization['network'] <= 1.0
+        assert 0.0 < utilization['compute:0'] <= 1.0
+
+        path = [event.name for event in result.getCriticalPath()]
+        assert path[-1] in ['matmul_1', 'grad_allreduce']
+        if path[-1] == 'matmul_1':
+            assert 'matmul_0' in path
+
+        trace = json.loads(json.dumps(result.toChromeTrace()))
+        op_events = [event for event in trace['traceEvents']
+                     if event['ph'] == 'X']
+        assert set(event['name'] for event in op_events) == \
+               {'matmul_0', 'matmul_1', 'grad_allreduce'}
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_event_simulator()
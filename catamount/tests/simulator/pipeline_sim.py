@@ -0,0 +1,103 @@
+import numpy as np
+import time
+
+import catamount
+from catamount.graph import Graph
+from catamount.simulator import HardwareProfile, LinkModel, \
+                                PipelinePartitioner
+
+from catamount.tests.utils.helpers import *
+
+
+def build_mlp(num_layers):
+    graph = Graph()
+    with graph.asDefault():
+        layer = placeholder('in_a', [None, None])
+        bind_dict = {'in_a': ['batch_size', 'hidden_dim']}
+        for idx in range(num_layers):
+            weights = variable('weights_{}'.format(idx), [None, None])
+            bind_dict[weights.name] = ['hidden_dim', 'hidden_dim']
+            layer = matmul('matmul_{}'.format(idx), [None, None], layer,
+                           weights)
+        graph.bindTensorShapeDimensions(bind_dict)
+    return graph
+
+
+def test_pipeline_partitioner():
+    ''' Verify that the partitioner balances stage times, respects memory
+    limits, and accounts for activation transfers and pipeline bubbles.
+    '''
+    hardware = HardwareProfile('test_hw', {'default': 1.0e6},
+                               mem_bandwidth=1.0e12, onchip_capacity=1024,
+                               launch_overhead=0.0)
+    link = LinkModel(latency=0.0, bandwidth=1.0e12)
+    graph = build_mlp(4)
+    bindings = {'batch_size': 8, 'hidden_dim': 64}
+    partitioner = PipelinePartitioner(graph, hardware, link)
+
+    partition = partitioner.partition(2, bindings, num_micro_batches=4)
+    matmul_stages = [partition.getStageOfOp('matmul_{}'.format(idx))
+                     for idx in range(4)]
+    assert matmul_stages == [0, 0, 1, 1]
+    assert np.isclose(partition.stage_times[0], partition.stage_times[1],
+                      rtol=1e-3)
+    # Stage 0 sends the matmul_1 activations to stage 1
+    assert partition.transfer_bytes[0] == 8 * 64 * 4
+    assert partition.transfer_bytes[1] == 0
+    assert np.isclose(partition.bubbleFraction, 1 / 5)
+    assert np.isclose(partition.stepTime, 5 * partition.maxStageTime)
+    assert np.isclose(partition.throughput, 4 / partition.stepTime)
+
+    # Balanced stages require too much memory: Weights are 16KB each, and
+    # stage 0 holds activations for 2 micro-batches in flight
+    unlimited = partition.stage_memory[0]
+    limited = partitioner.partition(2, bindings, num_micro_batches=4,
+                                    memory_limit=unlimited - 1)
+    assert limited.maxStageTime > partition.maxStageTime
+    assert max(limited.stage_memory) <= unlimited - 1
+    try:
+        partitioner.partition(2, bindings, memory_limit=1024)
+        assert False, 'Expected infeasible partition'
+    except ValueError:
+        pass
+    reset_symbols()
+
+def test_pipeline_partitioner_scaling():
+    ''' Verify that partitioning a graph with thousands of ops coarsens the
+    op order into groups, runs quickly, and still balances stage times.
+    '''
+    hardware = HardwareProfile('test_hw', {'default': 1.0e6},
+                               mem_bandwidth=1.0e12, onchip_capacity=1024,
+                               launch_overhead=0.0)
+    link = LinkModel(latency=0.0, bandwidth=1.0e12)
+    num_layers = 2000
+    graph = Graph()
+    with graph.asDefault():
+        # Static shapes keep graph construction fast
+        layer = catamount.placeholder('in_a', [8, 64])
+        for idx in range(num_layers):
+            weights = catamount.variable('weights_{}'.format(idx), [64, 64])
+            layer = catamount.matmul('matmul_{}'.format(idx), [8, 64],
+                                     layer, weights)
+    partitioner = PipelinePartitioner(graph, hardware, link)
+
+    start_time = time.time()
+    partition = partitioner.partition(8, {}, num_micro_batches=8,
+                                      max_groups=256)
+    elapsed = time.time() - start_time
+    print('Partitioned {} ops in {:.2f}s'.format(len(graph.opsByName),
+                                                 elapsed))
+    assert elapsed < 30.0
+    assert sum(len(stage) for stage in partition.stages) == \
+           2 * num_layers + 1
+    # Each stage holds 250 matmuls (up to group granularity)
+    assert max(partition.stage_times) <= \
+           1.02 * min(partition.stage_times)
+    assert np.isclose(partition.maxStageTime,
+                      sum(partition.stage_times) / 8, rtol=0.02)
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_pipeline_partitioner()
+    test_pipeline_partitioner_scaling()
@@ -0,0 +1,79 @@
+import numpy as np
+import sympy
+
+import catamount
+from catamount.api import utils
+from catamount.graph import Graph
+from catamount.simulator import HardwareProfile, RooflineSimulator, \
+                                list_hardware_profiles, load_hardware_profile
+
+from catamount.tests.utils.helpers import *
+
+
+def test_hardware_profiles():
+    ''' Verify that packaged hardware profiles load from their data files.
+    '''
+    names = list_hardware_profiles()
+    assert 'v100' in names
+    v100 = load_hardware_profile('v100')
+    assert v100.getPeakFlops('float16') > v100.getPeakFlops('float32')
+    assert v100.getPeakFlops(catamount.DataType.float32_ref) == \
+           v100.getPeakFlops('float32')
+    assert v100.getPeakFlops('int8') == v100.getPeakFlops()
+    round_trip = HardwareProfile.fromDict(v100.toDict())
+    assert round_trip.memBandwidth == v100.memBandwidth
+
+
+def test_roofline_simulator():
+    ''' Verify roofline op times, bound classification, and vectorized step
+    times for a small graph on a simple hardware profile.
+    '''
+    hardware = HardwareProfile('test_hw', {'default': 100.0},
+                               mem_bandwidth=10.0, onchip_capacity=1024,
+                               launch_overhead=1.0)
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        out = matmul('matmul', [None, None], in_a, weights)
+        out = pointwise('relu', catamount.ReluOp, [None, None], out)
+        graph.bindTensorShapeDimensions(
+            { 'in_a': ['batch_size', 'hidden_dim'],
+              'weights': ['hidden_dim', 'hidden_dim'] })
+        batch_size = utils.getIntSymbolFromString('batch_size')
+        hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+        utils.registerSymbol(batch_size, lower=1)
+        utils.registerSymbol(hidden_dim, lower=1)
+
+        simulator = RooflineSimulator(graph, hardware)
+        op_times = simulator.calcOpTimes()
+        # Placeholders and variables do not execute
+        assert op_times['in_a']['time'] == 0
+        # Pointwise ops read and write each element: memory-bound
+        assert op_times['relu']['bound'] == 'memory'
+        # Matmul compute- vs. memory-bound depends on the dimensions
+        assert op_times['matmul']['bound'] == 'unknown'
+
+        step_time = simulator.calcStepTime()
+        batch_sizes = np.array([1, 4, 64])
+        results = simulator.evaluate({batch_size: batch_sizes,
+                                      hidden_dim: 128})
+        for idx, bs in enumerate(batch_sizes):
+            subs = {batch_size: int(bs), hidden_dim: 128}
+            flops = float(graph.opsByName['matmul'].calcAlgFlops()
+                          .subs(subs))
+            mm_bytes = float(graph.opsByName['matmul'].calcAlgBytes()
+                             .subs(subs))
+            correct_mm = max(flops / 100.0, mm_bytes / 10.0) + 1.0
+            assert np.isclose(results['op_times']['matmul'][idx],
+                              correct_mm)
+            assert np.isclose(results['step_time'][idx],
+                              float(step_time.subs(subs)))
+        assert not results['compute_bound']['relu'].any()
+    reset_symbols()
+    utils.clearSymbolRegistry()
+
+
+if __name__ == "__main__":
+    test_hardware_profiles()
+    test_roofline_simulator()
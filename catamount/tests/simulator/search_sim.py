@@ -0,0 +1,127 @@
+import numpy as np
+
+import catamount
+from catamount.graph import Graph
+from catamount.simulator import ClusterSpec, HardwareProfile, LinkModel, \
+                                ParallelismSearch, pareto_front
+
+from catamount.tests.utils.helpers import *
+
+
+def build_mlp(num_layers):
+    ''' Build a training graph of an MLP: Forward matmuls, and backward
+    weight gradient matmuls that read the forward activations.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        layer = placeholder('in_a', [None, None])
+        bind_dict = {'in_a': ['batch_size', 'hidden_dim']}
+        layers = []
+        weights_list = []
+        for idx in range(num_layers):
+            weights = variable('weights_{}'.format(idx), [None, None])
+            bind_dict[weights.name] = ['hidden_dim', 'hidden_dim']
+            layers.append(layer)
+            weights_list.append(weights)
+            layer = matmul('matmul_{}'.format(idx), [None, None], layer,
+                           weights)
+        grad = layer
+        for idx in reversed(range(num_layers)):
+            scope = 'gradients/matmul_{}_grad'.format(idx)
+            matmul('{}/weights'.format(scope), [None, None], layers[idx],
+                   grad)
+            graph.opsByName['{}/weights'.format(scope)].setTransposeInput(
+                0, True)
+            grad = matmul('{}/inputs'.format(scope), [None, None], grad,
+                          weights_list[idx])
+            graph.opsByName['{}/inputs'.format(scope)].setTransposeInput(
+                1, True)
+        graph.bindTensorShapeDimensions(bind_dict)
+    return graph
+
+
+def test_pareto_front():
+    ''' Verify that the Pareto front keeps only non-dominated results.
+    '''
+    results = [{'step_time': 1.0, 'memory': 4.0, 'devices': 1},
+               {'step_time': 2.0, 'memory': 2.0, 'devices': 1},
+               {'step_time': 2.0, 'memory': 4.0, 'devices': 1},
+               {'step_time': 0.5, 'memory': 4.0, 'devices': 4}]
+    front = pareto_front(results)
+    assert front == [results[3], results[0], results[1]]
+
+
+def test_parallelism_search():
+    ''' Verify that the search returns feasible, non-dominated configurations
+    and that serial and process pool evaluation agree.
+    '''
+    hardware = HardwareProfile('test_hw', {'default': 1.0e9},
+                               mem_bandwidth=1.0e10, onchip_capacity=1024,
+                               launch_overhead=1.0e-6)
+    cluster = ClusterSpec(hardware, num_nodes=2, devices_per_node=4,
+                          memory_per_device=4.0e6,
+                          intra_link=LinkModel(1.0e-6, 1.0e10),
+                          inter_link=LinkModel(1.0e-5, 1.0e9))
+    assert cluster.numDevices == 8
+    graph = build_mlp(4)
+    search = ParallelismSearch(graph, cluster, 'batch_size',
+                               global_batch_size=64,
+                               bindings={'hidden_dim': 256})
+
+    # Recompute and tensor-parallel factors are derived from the graph
+    assert 1.0 < search.recomputeComputeFactor < 2.0
+    assert 0.0 < search.recomputeMemoryFraction < 1.0
+    assert search.tpCommFraction > 0.0
+    fixed = ParallelismSearch(graph, cluster, 'batch_size',
+                              global_batch_size=64,
+                              bindings={'hidden_dim': 256},
+                              recompute_compute_factor=1.5,
+                              tp_comm_fraction=0.5)
+    assert fixed.recomputeComputeFactor == 1.5
+    assert fixed.recomputeMemoryFraction == search.recomputeMemoryFraction
+    assert fixed.tpCommFraction == 0.5
+
+    configs = search.getCandidates()
+    num_configs = len(configs['dp'])
+    assert num_configs > 100
+    devices = configs['dp'] * configs['tp'] * configs['pp']
+    assert np.all(devices <= 8)
+    assert np.all(configs['tp'] <= 4)
+    assert np.all(configs['dp'] * configs['micro_batch'] *
+                  configs['num_micro_batches'] == 64)
+
+    serial = search.evaluate(configs)
+    pooled = search.evaluate(configs, num_workers=2, chunk_size=32)
+    assert len(serial) == num_configs
+    for serial_result, pooled_result in zip(serial, pooled):
+        assert serial_result.keys() == pooled_result.keys()
+        for key in serial_result.keys():
+            assert np.isclose(serial_result[key], pooled_result[key])
+
+    # Recomputation trades time for memory
+    plain = [res for res in serial if not res['recompute']]
+    recomputed = [res for res in serial if res['recompute']]
+    for plain_res, recomp_res in zip(plain, recomputed):
+        assert recomp_res['step_time'] > plain_res['step_time']
+        assert recomp_res['memory'] < plain_res['memory']
+
+    front = search.search(num_workers=2)
+    assert len(front) > 0
+    assert any(not res['feasible'] for res in serial)
+    for res in front:
+        assert res['feasible']
+        assert res['memory'] <= cluster.memory_per_device
+        for other in front:
+            if other is res:
+                continue
+            assert not (other['step_time'] <= res['step_time'] and
+                        other['memory'] <= res['memory'] and
+                        other['devices'] <= res['devices'])
+    step_times = [res['step_time'] for res in front]
+    assert step_times == sorted(step_times)
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_pareto_front()
+    test_parallelism_search()
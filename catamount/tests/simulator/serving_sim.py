@@ -0,0 +1,107 @@
+import numpy as np
+
+import catamount
+from catamount.graph import Graph
+from catamount.simulator import HardwareProfile, ServingSimulator, \
+                                calc_batch_times, generate_arrivals
+
+from catamount.tests.utils.helpers import *
+
+
+def test_dynamic_batching():
+    ''' Verify batch dispatch with a max batch size and timeout against hand
+    calculated latencies, and that batching increases throughput.
+    '''
+    # Batch of size b takes 1 + b seconds
+    simulator = ServingSimulator([0.0] + [1.0 + b for b in range(1, 5)])
+    arrivals = [0.0, 0.1, 0.2, 0.3, 0.4, 5.0]
+
+    # No batching: Requests serve one at a time, 2 seconds each
+    result = simulator.simulate(arrivals, max_batch_size=1)
+    assert list(result.batchSizes) == [1, 1, 1, 1, 1, 1]
+    assert np.allclose(result.latencies, [2.0, 3.9, 5.8, 7.7, 9.6, 7.0])
+
+    # Batch up to 4 with no timeout: The first request dispatches alone,
+    # and the others queue while the replica is busy
+    result = simulator.simulate(arrivals, max_batch_size=4)
+    assert list(result.batchSizes) == [1, 4, 1]
+    assert np.allclose(result.latencies, [2.0, 6.9, 6.8, 6.7, 6.6, 4.0])
+
+    # A timeout waits for the batch to fill, and the remaining requests
+    # batch together once the replica is free
+    result = simulator.simulate(arrivals, max_batch_size=4,
+                                batch_timeout=0.5)
+    assert list(result.batchSizes) == [4, 2]
+    assert np.allclose(result.latencies, [5.3, 5.2, 5.1, 5.0, 7.9, 3.3])
+    assert result.getLatencyPercentiles([50])[50] == \
+           float(np.percentile(result.latencies, 50))
+
+    # Two replicas serve batches concurrently
+    replicas = ServingSimulator(simulator.batchTimes, num_replicas=2)
+    result = replicas.simulate(arrivals, max_batch_size=1)
+    assert np.allclose(result.latencies, [2.0, 2.0, 3.8, 3.8, 5.6, 2.0])
+
+    try:
+        simulator.simulate(arrivals, max_batch_size=8)
+        assert False, 'Expected max batch size error'
+    except ValueError:
+        pass
+
+
+def test_serving_from_graph():
+    ''' Verify graph batch times, Poisson arrivals, and throughput curves.
+    '''
+    hardware = HardwareProfile('test_hw', {'default': 1.0e9},
+                               mem_bandwidth=1.0e9, onchip_capacity=1024,
+                               launch_overhead=1.0e-4)
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights = variable('weights', [None, None])
+        mm = matmul('matmul', [None, None], in_a, weights)
+        relu = pointwise('relu', catamount.ReluOp, [None, None], mm)
+        graph.bindTensorShapeDimensions(
+            {'in_a': ['batch_size', 'hidden_dim'],
+             'weights': ['hidden_dim', 'hidden_dim']})
+    bindings = {'hidden_dim': 256}
+    batch_times = calc_batch_times(graph, hardware, 16, 'batch_size',
+                                   bindings)
+    assert len(batch_times) == 17 and batch_times[0] == 0.0
+    # Weights dominate bytes: Larger batches amortize them
+    per_request = batch_times[1:] / np.arange(1, 17)
+    assert np.all(np.diff(batch_times[1:]) > 0)
+    assert np.all(np.diff(per_request) < 0)
+
+    arrivals = generate_arrivals(100.0, 10.0, seed=0)
+    assert np.all(np.diff(arrivals) >= 0) and arrivals[-1] < 10.0
+    assert abs(len(arrivals) - 1000) < 150
+    assert len(generate_arrivals(100.0, 10.0, process='uniform')) == 1000
+
+    simulator = ServingSimulator.fromGraph(graph, hardware, 16,
+                                           'batch_size', bindings)
+    # Overloaded at batch size 1, but dynamic batching keeps up
+    rate = 1.5 / batch_times[1]
+    arrivals = generate_arrivals(rate, 2000 * batch_times[1], seed=1)
+    unbatched = simulator.simulate(arrivals, max_batch_size=1).getSummary()
+    batched = simulator.simulate(arrivals, max_batch_size=16,
+                                 batch_timeout=batch_times[1]).getSummary()
+    assert batched['throughput'] > unbatched['throughput']
+    assert batched['p99'] < unbatched['p99']
+    assert batched['mean_batch_size'] > 1.0
+    assert unbatched['utilization'] > 0.99
+
+    curve = simulator.sweepArrivalRates([rate / 4, rate], 500 *
+                                        batch_times[1], batch_timeout=0.0,
+                                        seed=2)
+    assert curve[rate / 4]['mean_batch_size'] < \
+           curve[rate]['mean_batch_size']
+    sweep = simulator.sweepBatchingParams(arrivals, [1, 8],
+                                          [0.0, batch_times[1]])
+    assert sorted(sweep.keys()) == [(1, 0.0), (1, batch_times[1]),
+                                    (8, 0.0), (8, batch_times[1])]
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_dynamic_batching()
+    test_serving_from_graph()
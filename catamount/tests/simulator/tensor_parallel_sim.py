@@ -0,0 +1,133 @@
+import numpy as np
+import sympy
+
+import catamount
+from catamount.api import utils
+from catamount.graph import Graph
+from catamount.ops.init_ops import IdentityOp
+from catamount.simulator import CommunicationModel, LinkModel, \
+                                RingCollective, TensorParallelSharding
+from catamount.tensors.tensor import Tensor
+from catamount.tensors.tensor_shape import TensorShape
+
+from catamount.tests.utils.helpers import *
+
+
+def test_tensor_parallel_sharding():
+    ''' Verify per-device costs for Megatron-style sharding: A column-
+    sharded matmul followed by a row-sharded matmul and an allreduce.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights_0 = variable('weights_0', [None, None])
+        weights_1 = variable('weights_1', [None, None])
+        hidden = matmul('matmul_0', [None, None], in_a, weights_0)
+        out = matmul('matmul_1', [None, None], hidden, weights_1)
+        graph.bindTensorShapeDimensions(
+            { 'in_a': ['batch_size', 'hidden_dim'],
+              'weights_0': ['hidden_dim', 'ffn_dim'],
+              'weights_1': ['ffn_dim', 'hidden_dim'] })
+        batch_size = utils.getIntSymbolFromString('batch_size')
+        hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+        ffn_dim = utils.getIntSymbolFromString('ffn_dim')
+        num_devices = utils.getIntSymbolFromString('tp_degree')
+
+        sharding = TensorParallelSharding(graph, num_devices)
+        sharding.shard('matmul_0', mode='column', gather_output=False)
+        sharding.shard('matmul_1', mode='row')
+        assert [op.name for op in sharding.getCollectiveOps()] == \
+               ['matmul_1/tp_allreduce']
+
+        link = LinkModel(latency=1.0e-6, bandwidth=1.0e9)
+        comm_model = CommunicationModel(RingCollective(link))
+        costs = sharding.calcPerDeviceCosts(comm_model)
+        correct_params = 2 * hidden_dim * ffn_dim / num_devices
+        assert sympy.simplify(costs['parameters'] - correct_params) == 0
+        # Matmul Flops are split, plus one Flop per allreduced element
+        correct_flops = 4 * batch_size * hidden_dim * ffn_dim / num_devices + \
+                        batch_size * hidden_dim
+        assert sympy.simplify(costs['flops'] - correct_flops) == 0
+        out_bytes = 4 * batch_size * hidden_dim
+        assert sympy.simplify(costs['comm_bytes'] - out_bytes) == 0
+        subs = {batch_size: 16, hidden_dim: 1024, ffn_dim: 4096,
+                num_devices: 4}
+        correct_time = comm_model.algorithm.allreduceTime(16 * 1024 * 4, 4)
+        assert np.isclose(float(costs['comm_time'].subs(subs)),
+                          float(correct_time))
+        # One device matches the unsharded graph Flops (apart from the
+        # modeled allreduce)
+        one_dev = costs['flops'].subs({num_devices: 1}) - batch_size * hidden_dim
+        assert sympy.simplify(one_dev - graph.calcAlgFlops()) == 0
+        # Sharding reduces per-device footprint
+        assert float(costs['footprint'].subs(subs)) < \
+               float(graph.calcAlgFootprint().subs(subs))
+    reset_symbols()
+
+
+def test_sharding_through_identity():
+    ''' Verify that weights read through TF-style '<var>/read' IdentityOps
+    are found, sharded, and sized by input index, including a weight that
+    is the transposed first matmul input.
+    '''
+    graph = Graph()
+    with graph.asDefault():
+        in_a = placeholder('in_a', [None, None])
+        weights_0 = variable('weights_0', [None, None])
+        weights_1 = variable('weights_1', [None, None])
+        reads = []
+        for weights in [weights_0, weights_1]:
+            read_op = IdentityOp('{}/read'.format(weights.name))
+            read_op.addOutput(Tensor('{}/read'.format(weights.name),
+                                     TensorShape([None, None])))
+            graph.addOp(read_op)
+            graph.addInputToOp(read_op, weights)
+            reads.append(read_op.outputs[0])
+        hidden = catamount.matmul('matmul_0', [None, None], in_a, reads[0])
+        # out = weights_1^T x hidden^T: The weight is input 0, transposed
+        out = catamount.matmul('matmul_1', [None, None], reads[1], hidden)
+        graph.opsByName['matmul_1'].setTransposeInput(0, True)
+        graph.opsByName['matmul_1'].setTransposeInput(1, True)
+        graph.bindTensorShapeDimensions(
+            { 'in_a': ['batch_size', 'hidden_dim'],
+              'weights_0': ['hidden_dim', 'ffn_dim'],
+              'weights_1': ['ffn_dim', 'hidden_dim'] })
+    batch_size = utils.getIntSymbolFromString('batch_size')
+    hidden_dim = utils.getIntSymbolFromString('hidden_dim')
+    ffn_dim = utils.getIntSymbolFromString('ffn_dim')
+    num_devices = utils.getIntSymbolFromString('tp_degree')
+
+    sharding = TensorParallelSharding(graph, num_devices)
+    group_0 = sharding.shard('matmul_0', mode='column', gather_output=False)
+    group_1 = sharding.shard('matmul_1', mode='row',
+                             weight_name='weights_1')
+    assert group_0.weight_op.name == 'weights_0' and group_0.weight_idx == 1
+    assert group_1.weight_op.name == 'weights_1' and group_1.weight_idx == 0
+    # Column sharding splits weights_0 output columns. Row sharding splits
+    # the contracted dimension of weights_1, its rows (transposed input)
+    assert group_0.getShardedWeightDim() == -1
+    assert group_1.getShardedWeightDim() == -2
+
+    costs = sharding.calcPerDeviceCosts()
+    correct_params = 2 * hidden_dim * ffn_dim / num_devices
+    assert sympy.simplify(costs['parameters'] - correct_params) == 0
+    # Column matmul reads the full input, a weight shard, and writes an
+    # output shard. Row matmul reads input and weight shards and writes the
+    # full partial output, which the allreduce reads and writes
+    mm_0_bytes = 4 * (batch_size * hidden_dim +
+                      (hidden_dim * ffn_dim + batch_size * ffn_dim) /
+                      num_devices)
+    mm_1_bytes = 4 * ((ffn_dim * hidden_dim + batch_size * ffn_dim) /
+                      num_devices + batch_size * hidden_dim)
+    allreduce = sharding.getCollectiveOps()[0]
+    correct_bytes = graph.calcAlgBytes() - \
+                    graph.opsByName['matmul_0'].calcAlgBytes() - \
+                    graph.opsByName['matmul_1'].calcAlgBytes() + \
+                    mm_0_bytes + mm_1_bytes + allreduce.calcAlgBytes()
+    assert sympy.simplify(costs['bytes'] - correct_bytes) == 0
+    reset_symbols()
+
+
+if __name__ == "__main__":
+    test_tensor_parallel_sharding()
+    test_sharding_through_identity()
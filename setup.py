@@ -7,6 +7,9 @@ setup(
     author='Catamount Developers',
     author_email='joel@baidu.com',
     packages=find_packages(),
+    package_data={
+        'catamount.simulator': ['profiles/*.json'],
+    },
     install_requires=[
         'numpy',
         'sympy',